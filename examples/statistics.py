@@ -1,6 +1,6 @@
 import time
 
-from mijiaAPI import mijiaAPI
+from mijiaAPI import mijiaAPI, parse_stat_value
 
 
 api = mijiaAPI(".mijia-api-data/auth.json")
@@ -29,7 +29,12 @@ ret = api.get_statistics({
 """
 
 for item in ret:
-    value = eval(item['value'])[0]
+    value = parse_stat_value(item['value'])
     ts = item['time']
     date = time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(ts))
     print(f'{date}: {value}')
+
+# 使用本地统计数据存储，重复运行时只请求本地缺失的时间窗口，数据保存在认证文件所在目录的 statistics 子目录
+times, values = api.statistics_store.fetch(api, did, "7.1", "stat_month_v3", int(time.time() - 24 * 3600 * 30 * 6))
+for ts, value in zip(times, values):
+    print(f"{time.strftime('%Y-%m', time.localtime(ts))}: {value}")
@@ -1,5 +1,6 @@
-from .apis import mijiaAPI
-from .devices import get_device_info, mijiaDevice
+import importlib
+from typing import TYPE_CHECKING
+
 from .errors import (
     APIError,
     DeviceActionError,
@@ -10,14 +11,107 @@ from .errors import (
     LoginError,
     MultipleDevicesFoundError,
 )
-from .miutils import decrypt
 from .version import version as __version__
 
 
+if TYPE_CHECKING:
+    from .apis import mijiaAPI
+    from .backfill import BackfillRunner, backfill_statistics
+    from .batch import run_batch
+    from .bulk import BulkRejection, BulkSetPlan, bulk_set_devices_prop, prepare_bulk_set
+    from .cache import PropertyCache
+    from .devices import get_device_info, mijiaDevice, prefetch_device_info
+    from .frame import StatisticsFrame
+    from .freshness import FRESHNESS_CLOUD, FRESHNESS_DEVICE
+    from .gateway import GatewayClient, RemoteAPI
+    from .miutils import decrypt
+    from .resolve import ResolutionIndex, resolve_device, resolve_room, resolve_scene
+    from .specbundle import SpecBundle, export_spec_bundle
+    from .specsync import SpecRevalidator, revalidate_specs
+    from .statistics import StatisticsStore, parse_stat_value
+    from .watch import PropertyChange, PropertyWatcher, WatchSubscription
+
+
+# 名称 -> 所在子模块，首次访问时才导入，让 `import mijiaAPI` 和简短的命令行调用保持快速
+_LAZY_ATTRS = {
+    "mijiaAPI": "apis",
+    "BackfillRunner": "backfill",
+    "backfill_statistics": "backfill",
+    "run_batch": "batch",
+    "BulkRejection": "bulk",
+    "BulkSetPlan": "bulk",
+    "bulk_set_devices_prop": "bulk",
+    "prepare_bulk_set": "bulk",
+    "PropertyCache": "cache",
+    "get_device_info": "devices",
+    "mijiaDevice": "devices",
+    "prefetch_device_info": "devices",
+    "StatisticsFrame": "frame",
+    "FRESHNESS_CLOUD": "freshness",
+    "FRESHNESS_DEVICE": "freshness",
+    "GatewayClient": "gateway",
+    "RemoteAPI": "gateway",
+    "decrypt": "miutils",
+    "ResolutionIndex": "resolve",
+    "resolve_device": "resolve",
+    "resolve_room": "resolve",
+    "resolve_scene": "resolve",
+    "SpecBundle": "specbundle",
+    "export_spec_bundle": "specbundle",
+    "SpecRevalidator": "specsync",
+    "revalidate_specs": "specsync",
+    "StatisticsStore": "statistics",
+    "parse_stat_value": "statistics",
+    "PropertyChange": "watch",
+    "PropertyWatcher": "watch",
+    "WatchSubscription": "watch",
+}
+
+
+def __getattr__(name: str):
+    module = _LAZY_ATTRS.get(name)
+    if module is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(importlib.import_module(f".{module}", __name__), name)
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    return sorted(set(globals()) | set(_LAZY_ATTRS))
+
+
 __all__ = [
     "mijiaAPI",
     "mijiaDevice",
+    "PropertyCache",
+    "FRESHNESS_CLOUD",
+    "FRESHNESS_DEVICE",
     "get_device_info",
+    "prefetch_device_info",
+    "export_spec_bundle",
+    "SpecBundle",
+    "revalidate_specs",
+    "SpecRevalidator",
+    "prepare_bulk_set",
+    "bulk_set_devices_prop",
+    "BulkSetPlan",
+    "BulkRejection",
+    "run_batch",
+    "GatewayClient",
+    "RemoteAPI",
+    "ResolutionIndex",
+    "resolve_device",
+    "resolve_scene",
+    "resolve_room",
+    "StatisticsStore",
+    "parse_stat_value",
+    "StatisticsFrame",
+    "BackfillRunner",
+    "backfill_statistics",
+    "PropertyWatcher",
+    "PropertyChange",
+    "WatchSubscription",
     "APIError",
     "DeviceActionError",
     "DeviceGetError",
@@ -5,13 +5,17 @@ import os
 import sys
 import time
 from pathlib import Path
-from typing import Optional
+from typing import TYPE_CHECKING, Optional
 
-from .apis import mijiaAPI
-from .devices import get_device_info, mijiaDevice
 from .version import version
 
 
+if TYPE_CHECKING:
+    from .apis import mijiaAPI
+
+# 各子命令用到的模块在执行时才导入，--version、--help 等简短调用不加载网络和加密依赖
+
+
 log_level_name = os.getenv('MIJIA_LOG_LEVEL', 'INFO').upper()
 if log_level_name not in ['DEBUG', 'INFO', 'WARNING', 'ERROR', 'CRITICAL']:
     raise ValueError(f"无效的日志级别: {log_level_name}, 可选值为 DEBUG, INFO, WARNING, ERROR, CRITICAL")
@@ -66,6 +70,19 @@ def parse_args(args):
         help="获取设备信息，指定设备model，先使用 --list_devices 获取",
         metavar='DEVICE_MODEL',
     )
+    parser.add_argument(
+        '--export_spec_bundle',
+        type=Path,
+        help="导出设备规格包，默认打包认证文件所在目录中已缓存的设备信息",
+        metavar='BUNDLE_PATH',
+    )
+    parser.add_argument(
+        '--spec_models',
+        type=str,
+        nargs='+',
+        help="与 --export_spec_bundle 一起使用，指定需要打包的设备model",
+        metavar='DEVICE_MODEL',
+    )
     parser.add_argument(
         '--run',
         type=str,
@@ -84,8 +101,20 @@ def parse_args(args):
         help="小爱音箱静默执行",
     )
 
+    # get/set/batch/watch 共用的网关参数
+    gateway_parent = argparse.ArgumentParser(add_help=False)
+    gateway_parent.add_argument(
+        '--gateway',
+        type=str,
+        default=os.getenv('MIJIA_GATEWAY'),
+        help="通过常驻网关执行 (见 mijiaAPI serve)，例如 http://127.0.0.1:8751 或 unix:///path/to.sock，"
+             "默认读取环境变量 MIJIA_GATEWAY，网关令牌从认证文件所在目录读取",
+        metavar='ADDRESS',
+    )
+
     get = subparsers.add_parser(
         'get',
+        parents=[gateway_parent],
         help="获取设备属性",
     )
     get.set_defaults(func='get')
@@ -114,6 +143,7 @@ def parse_args(args):
 
     set = subparsers.add_parser(
         'set',
+        parents=[gateway_parent],
         help="设置设备属性",
     )
     set.set_defaults(func='set')
@@ -145,9 +175,138 @@ def parse_args(args):
         help="需要设定的属性值",
         required=True,
     )
+
+    batch = subparsers.add_parser(
+        'batch',
+        parents=[gateway_parent],
+        help="批量执行 JSONL 格式的 get/set/action/scene 命令",
+        description="每行一个 JSON 命令，例如 "
+                    '{"op": "get", "dev_name": "台灯", "prop_name": ["on", "brightness"]}、'
+                    '{"op": "set", "did": "123", "prop_name": "on", "value": true}、'
+                    '{"op": "action", "dev_name": "台灯", "action": "toggle"}、'
+                    '{"op": "scene", "scene": "回家"}，'
+                    "每个命令完成后输出一行 JSON 结果",
+    )
+    batch.set_defaults(func='batch')
+    batch.add_argument(
+        '-p', '--auth_path',
+        type=Path,
+        default=Path.home() / ".config" / "mijia-api" / "auth.json",
+        help="认证文件保存路径，默认保存在 ~/.config/mijia-api/auth.json",
+    )
+    batch.add_argument(
+        'file',
+        type=str,
+        nargs='?',
+        default='-',
+        help="命令文件路径，默认从标准输入读取",
+    )
+    batch.add_argument(
+        '--workers',
+        type=int,
+        default=4,
+        help="并发请求数，默认 4",
+    )
+    batch.add_argument(
+        '--chunk_size',
+        type=int,
+        default=100,
+        help="每次请求包含的最大属性数量，默认 100",
+    )
+
+    watch = subparsers.add_parser(
+        'watch',
+        parents=[gateway_parent],
+        help="持续轮询多个设备的属性，只输出发生变化的值",
+        description="所有设备的属性合并为批量请求按固定节奏读取，首次读取的值和之后每次变化各输出一行",
+    )
+    watch.set_defaults(func='watch')
+    watch.add_argument(
+        '-p', '--auth_path',
+        type=Path,
+        default=Path.home() / ".config" / "mijia-api" / "auth.json",
+        help="认证文件保存路径，默认保存在 ~/.config/mijia-api/auth.json",
+    )
+    watch.add_argument(
+        '-d', '--device',
+        type=str,
+        nargs='+',
+        required=True,
+        help="设备did或名称，可指定多个",
+        metavar='DEVICE',
+    )
+    watch.add_argument(
+        '--prop_name',
+        type=str,
+        nargs='+',
+        required=True,
+        help="属性名称，可指定多个，设备不支持的属性会被跳过",
+    )
+    watch.add_argument(
+        '-i', '--interval',
+        type=float,
+        default=5,
+        help="轮询间隔（秒），默认 5，按固定节奏轮询，不受请求耗时影响",
+    )
+    watch.add_argument(
+        '--format',
+        choices=['jsonl', 'csv'],
+        default='jsonl',
+        help="输出格式，默认 jsonl",
+    )
+    watch.add_argument(
+        '--duration',
+        type=float,
+        default=None,
+        help="运行时长（秒），默认一直运行直到 Ctrl+C",
+    )
+
+    serve_parser = subparsers.add_parser(
+        'serve',
+        help="启动常驻网关，保持登录状态、设备索引、设备规格和属性缓存，供命令行和其他工具使用",
+    )
+    serve_parser.set_defaults(func='serve')
+    serve_parser.add_argument(
+        '-p', '--auth_path',
+        type=Path,
+        default=Path.home() / ".config" / "mijia-api" / "auth.json",
+        help="认证文件保存路径，默认保存在 ~/.config/mijia-api/auth.json",
+    )
+    serve_parser.add_argument(
+        '--host',
+        type=str,
+        default='127.0.0.1',
+        help="监听地址，默认 127.0.0.1",
+    )
+    serve_parser.add_argument(
+        '--port',
+        type=int,
+        default=8751,
+        help="监听端口，默认 8751",
+    )
+    serve_parser.add_argument(
+        '--socket',
+        type=Path,
+        default=None,
+        help="监听 Unix socket 而不是 TCP 端口",
+        metavar='SOCKET_PATH',
+    )
+    serve_parser.add_argument(
+        '--index_ttl',
+        type=float,
+        default=300,
+        help="设备列表和场景列表的刷新间隔（秒），默认 300",
+    )
+    serve_parser.add_argument(
+        '--revalidate_specs',
+        action='store_true',
+        help="在后台每天检查一次已缓存的设备规格是否有更新，只重新获取变化的型号",
+    )
     return parser.parse_args(args)
 
-def init_api(auth_path: Path) -> mijiaAPI:
+def init_api(auth_path: Path) -> 'mijiaAPI':
+    from .apis import mijiaAPI
+
     class APIUnavailableError(Exception):
         pass
 
@@ -170,7 +329,7 @@ def init_api(auth_path: Path) -> mijiaAPI:
         api.login()
     return api
 
-def get_homes_list(api: mijiaAPI, verbose: bool = True, device_mapping: Optional[dict] = None) -> dict:
+def get_homes_list(api: 'mijiaAPI', verbose: bool = True, device_mapping: Optional[dict] = None) -> dict:
     if verbose:
         if device_mapping is None:
             device_mapping = get_devices_list(api, verbose=False)
@@ -200,7 +359,7 @@ def get_homes_list(api: mijiaAPI, verbose: bool = True, device_mapping: Optional
     home_mapping = {home['id']: home for home in homes}
     return home_mapping
 
-def get_devices_list(api: mijiaAPI, verbose: bool = True) -> dict:
+def get_devices_list(api: 'mijiaAPI', verbose: bool = True) -> dict:
     devices = api.get_devices_list() + api.get_shared_devices_list()
     if verbose:
         print("设备列表:")
@@ -212,7 +371,7 @@ def get_devices_list(api: mijiaAPI, verbose: bool = True) -> dict:
     device_mapping = {device['did']: device for device in devices}
     return device_mapping
 
-def get_scenes_list(api: mijiaAPI, verbose: bool = True, home_mapping: Optional[dict] = None) -> dict:
+def get_scenes_list(api: 'mijiaAPI', verbose: bool = True, home_mapping: Optional[dict] = None) -> dict:
     if home_mapping is None:
         home_mapping = get_homes_list(api, verbose=False)
     scene_mapping = {}
@@ -227,7 +386,7 @@ def get_scenes_list(api: mijiaAPI, verbose: bool = True, home_mapping: Optional[
         scene_mapping.update({scene['scene_id']: scene for scene in scenes})
     return scene_mapping
 
-def get_consumable_items(api: mijiaAPI, home_mapping: Optional[dict] = None):
+def get_consumable_items(api: 'mijiaAPI', home_mapping: Optional[dict] = None):
     if home_mapping is None:
         home_mapping = get_homes_list(api, verbose=False)
     for home_id, home in home_mapping.items():
@@ -237,23 +396,26 @@ def get_consumable_items(api: mijiaAPI, home_mapping: Optional[dict] = None):
             print(f"  - {item['name']}({item['did']}) 中的 {item['details']['description']}\n"
                   f"    值: {item['details']['value']}")
 
-def run_scene(api: mijiaAPI, scene_id: str, scene_mapping: Optional[dict] = None) -> bool:
+def run_scene(api: 'mijiaAPI', scene_id: str, scene_mapping: Optional[dict] = None) -> bool:
     if scene_mapping is None:
-        scene_mapping = get_scenes_list(api, verbose=False)
-    if scene_id not in scene_mapping:
-        scene_name_to_find = scene_id
-        found = False
-        for sid, scene in scene_mapping.items():
-            if scene['name'] == scene_name_to_find:
-                scene_id = sid
-                found = True
-                break
-        if not found:
-            print(f"场景 {scene_name_to_find} 未找到")
+        from .resolve import resolve_scene
+
+        # 通过名称索引查找场景，未命中时才获取场景列表
+        try:
+            scene = resolve_scene(api, scene_id)
+        except ValueError as e:
+            print(e)
             return False
-    scene_name = scene_mapping[scene_id]['name']
-    scence_home_id = scene_mapping[scene_id]['home_id']
-    ret = api.run_scene(scene_id, scence_home_id)
+    elif scene_id in scene_mapping:
+        scene = scene_mapping[scene_id]
+    else:
+        scene = next((s for s in scene_mapping.values() if s['name'] == scene_id), None)
+    if scene is None:
+        print(f"场景 {scene_id} 未找到")
+        return False
+    scene_id = scene['scene_id']
+    scene_name = scene['name']
+    ret = api.run_scene(scene_id, scene['home_id'])
     if ret:
         print(f"场景 {scene_name}({scene_id}) 运行成功")
         return True
@@ -261,7 +423,26 @@ def run_scene(api: mijiaAPI, scene_id: str, scene_mapping: Optional[dict] = None
         print(f"运行场景 {scene_name}({scene_id}) 失败")
         return False
 
+def gateway_command(address: str, command: dict, auth_path: Path) -> Optional[dict]:
+    from .gateway import GatewayClient, gateway_token_path
+
+    result = next(GatewayClient(address, token_path=gateway_token_path(auth_path)).batch([command]))
+    if not result["ok"]:
+        errors = result.get("errors") or {}
+        print(f"执行失败: {result.get('error') or '; '.join(f'{k}: {v}' for k, v in errors.items())}")
+        return None
+    return result
+
 def get(args):
+    if args.gateway:
+        result = gateway_command(args.gateway, {
+            "op": "get", "did": args.did, "dev_name": args.dev_name, "prop_name": args.prop_name,
+        }, args.auth_path)
+        if result is not None:
+            print(f"{result['name']} ({result['did']}) 的 {args.prop_name} 值为 {result['values'][args.prop_name]}")
+        return
+    from .devices import mijiaDevice
+
     api = init_api(args.auth_path)
     device = mijiaDevice(api, did=args.did, dev_name=args.dev_name)
     value = device.get(args.prop_name)
@@ -269,6 +450,16 @@ def get(args):
     print(f"{device.name} ({device.did}) 的 {args.prop_name} 值为 {value} {unit if unit else ''}")
 
 def set(args):
+    if args.gateway:
+        result = gateway_command(args.gateway, {
+            "op": "set", "did": args.did, "dev_name": args.dev_name,
+            "prop_name": args.prop_name, "value": args.value,
+        }, args.auth_path)
+        if result is not None:
+            print(f"{result['name']} ({result['did']}) 的 {args.prop_name} 值已设置为 {args.value}")
+        return
+    from .devices import mijiaDevice
+
     api = init_api(args.auth_path)
     device = mijiaDevice(api, did=args.did, dev_name=args.dev_name)
     try:
@@ -279,22 +470,142 @@ def set(args):
     unit = device.prop_list[args.prop_name].unit
     print(f"{device.name} ({device.did}) 的 {args.prop_name} 值已设置为 {args.value} {unit if unit else ''}")
 
+def batch(args):
+    if args.gateway:
+        from .gateway import GatewayClient, gateway_token_path
+
+        client = GatewayClient(args.gateway, token_path=gateway_token_path(args.auth_path))
+        stream = sys.stdin if args.file == '-' else open(args.file, "r", encoding="utf-8")
+        try:
+            for result in client.batch(stream):
+                print(json.dumps(result, ensure_ascii=False), flush=True)
+        finally:
+            if stream is not sys.stdin:
+                stream.close()
+        return
+    from .batch import run_batch
+
+    api = init_api(args.auth_path)
+    if args.file == '-':
+        run_batch(api, sys.stdin, sys.stdout, max_workers=args.workers, chunk_size=args.chunk_size)
+    else:
+        with open(args.file, "r", encoding="utf-8") as f:
+            run_batch(api, f, sys.stdout, max_workers=args.workers, chunk_size=args.chunk_size)
+
+WATCH_FIELDS = ['time', 'did', 'device', 'prop', 'value', 'previous', 'update_time', 'code']
+
+def watch_devices(
+        api: 'mijiaAPI',
+        devices: list,
+        prop_names: list,
+        interval: float,
+        output=sys.stdout,
+        fmt: str = 'jsonl',
+        duration: Optional[float] = None,
+) -> int:
+    """轮询 devices 的 prop_names 属性并把变化写入 output，返回输出的行数"""
+    import csv
+    import threading
+
+    from .devices import _build_prop_list, get_device_info
+    from .errors import DeviceNotFoundError
+    from .resolve import resolve_device
+
+    watcher = api.property_watcher
+    targets = []
+    device_names = {}
+    for target in devices:
+        try:
+            device = resolve_device(api, did=target)
+        except DeviceNotFoundError:
+            device = resolve_device(api, dev_name=target)
+        did = str(device['did'])
+        device_names[did] = device.get('name')
+        prop_list = _build_prop_list(get_device_info(device['model'], cache_path=api.auth_data_path.parent))
+        # 直接注册规格，轮询器无需再获取设备列表，共享设备也能使用
+        watcher.add_device(did, prop_list)
+        for prop_name in prop_names:
+            if prop_name in prop_list and 'r' in prop_list[prop_name].rw:
+                targets.append((did, prop_name))
+            else:
+                print(f"{device_names[did]} ({did}) 不支持读取属性 {prop_name}，已跳过", file=sys.stderr)
+    if not targets:
+        raise ValueError("没有可读取的属性")
+
+    writer = csv.DictWriter(output, fieldnames=WATCH_FIELDS) if fmt == 'csv' else None
+    if writer is not None:
+        writer.writeheader()
+        output.flush()
+    lines = 0
+
+    def emit(changes):
+        nonlocal lines
+        now = time.strftime('%Y-%m-%dT%H:%M:%S%z')
+        for change in changes:
+            row = {
+                'time': now,
+                'did': change.did,
+                'device': device_names.get(change.did),
+                'prop': change.name,
+                'value': change.value,
+                'previous': change.previous,
+                'update_time': change.update_time,
+                'code': change.code,
+            }
+            if writer is not None:
+                writer.writerow(row)
+            else:
+                output.write(json.dumps(row, ensure_ascii=False) + '\n')
+            lines += 1
+        output.flush()
+
+    with watcher.subscribe(targets, interval, emit):
+        try:
+            threading.Event().wait(duration)
+        except KeyboardInterrupt:
+            pass
+    return lines
+
+def watch(args):
+    from .errors import DeviceNotFoundError, GetDeviceInfoError, MultipleDevicesFoundError
+
+    if args.gateway:
+        from .gateway import RemoteAPI, gateway_token_path
+
+        api = RemoteAPI(args.gateway, token_path=gateway_token_path(args.auth_path))
+    else:
+        api = init_api(args.auth_path)
+    try:
+        watch_devices(api, args.device, args.prop_name, args.interval,
+                      fmt=args.format, duration=args.duration)
+    except (ValueError, DeviceNotFoundError, MultipleDevicesFoundError, GetDeviceInfoError) as e:
+        print(e, file=sys.stderr)
+
 def main(args):
     args = parse_args(args)
+    # 设备规格缓存和规格包与认证文件在同一目录
+    cache_path = args.auth_path if args.auth_path.is_dir() else args.auth_path.parent
 
     if args.get_device_info:
-        device_info = get_device_info(args.get_device_info)
+        from .devices import get_device_info
+
+        device_info = get_device_info(args.get_device_info, cache_path=cache_path)
         print(json.dumps(device_info, indent=2, ensure_ascii=False))
-    if not (args.list_devices or
-            args.list_homes or
-            args.list_scenes or
-            args.list_consumable_items or
-            args.run_scene or
-            args.run or
-            hasattr(args, 'func') and args.func is not None):
+    if args.export_spec_bundle:
+        from .specbundle import export_spec_bundle
+
+        export_spec_bundle(args.export_spec_bundle, cache_path=cache_path, models=args.spec_models)
+    needs_api = (args.list_devices or
+                 args.list_homes or
+                 args.list_scenes or
+                 args.list_consumable_items or
+                 args.run_scene or
+                 args.run)
+    if not (needs_api or hasattr(args, 'func') and args.func is not None):
         return
 
-    api = init_api(args.auth_path)
+    # 子命令各自初始化 API，通过网关执行时无需登录
+    api = init_api(args.auth_path) if needs_api else None
     device_mapping = None
     home_mapping = None
     scenes_mapping = None
@@ -311,6 +622,8 @@ def main(args):
         for scene_id in args.run_scene:
             run_scene(api, scene_id, scene_mapping=scenes_mapping)
     if args.run:
+        from .devices import mijiaDevice
+
         if device_mapping is None:
             device_mapping = get_devices_list(api, verbose=False)
         if args.wifispeaker_name is None:
@@ -329,6 +642,15 @@ def main(args):
             get(args)
         if args.func == 'set':
             set(args)
+        if args.func == 'batch':
+            batch(args)
+        if args.func == 'watch':
+            watch(args)
+        if args.func == 'serve':
+            from .gateway import serve
+
+            serve(init_api(args.auth_path), host=args.host, port=args.port, socket_path=args.socket,
+                  index_ttl=args.index_ttl, revalidate_specs=args.revalidate_specs)
 
 def cli():
     main(sys.argv[1:])
@@ -5,18 +5,12 @@ import time
 import warnings
 from datetime import datetime, timedelta
 from pathlib import Path
-from typing import Callable, Optional, Union
+from typing import TYPE_CHECKING, Callable, Optional, Union
 from urllib import parse
 
-import requests
-import tzlocal
-import urllib3
-from qrcode import QRCode
-
-# 禁用 SSL 警告
-urllib3.disable_warnings(urllib3.exceptions.InsecureRequestWarning)
-
+from .cache import PropertyCache
 from .errors import ERROR_CODE, APIError, LoginError
+from .freshness import FreshnessStats, resolve_datasource
 from .logger import logger
 from .miutils import (
     decrypt,
@@ -26,6 +20,25 @@ from .miutils import (
 )
 
 
+if TYPE_CHECKING:
+    import requests
+
+_requests_module = None
+
+
+def _requests():
+    """按需导入 requests (及 urllib3)，只导入包或查看版本时不需要加载它们"""
+    global _requests_module
+    if _requests_module is None:
+        import requests
+        import urllib3
+
+        # 禁用 SSL 警告
+        urllib3.disable_warnings(urllib3.exceptions.InsecureRequestWarning)
+        _requests_module = requests
+    return _requests_module
+
+
 def _normalize_to_list(data: Union[list, dict]) -> tuple:
     """将单个dict转为list，返回 (params, was_single)"""
     if isinstance(data, dict):
@@ -58,6 +71,11 @@ class mijiaAPI():
 
         self._available_cache = None
         self._available_cache_time = 0
+        self._watcher = None
+        self._resolution_index = None
+        self._statistics_store = None
+        self.prop_cache: Optional[PropertyCache] = None
+        self.freshness_stats = FreshnessStats()
 
         if self.auth_data_path.exists():
             with open(self.auth_data_path, "r") as f:
@@ -67,7 +85,9 @@ class mijiaAPI():
             self.auth_data = {}
 
     def _init_session(self):
-        self.session = requests.Session()
+        import tzlocal
+
+        self.session = _requests().Session()
         self.session.verify = False  # 禁用 SSL 验证（用于解决本地证书问题）
         self.session.headers.update({
             "User-Agent": self.user_agent,
@@ -112,6 +132,50 @@ class mijiaAPI():
         self._available_cache_time = current_time
         return True
 
+    def enable_prop_cache(self, **kwargs) -> PropertyCache:
+        """
+        启用属性缓存
+
+        启用后 mijiaDevice.get() 优先读取缓存，get_devices_prop() 的结果会写入缓存，
+        set_devices_prop() 成功后会直接更新缓存。参数见 PropertyCache。
+
+        返回值:
+            PropertyCache: 属性缓存对象，可通过 stats() 查看命中率
+        """
+        if self.prop_cache is None:
+            self.prop_cache = PropertyCache(**kwargs)
+        return self.prop_cache
+
+    @property
+    def property_watcher(self):
+        """共享的属性轮询器，见 watch()"""
+        if self._watcher is None:
+            from .watch import PropertyWatcher
+            self._watcher = PropertyWatcher(self)
+        return self._watcher
+
+    @property
+    def resolution_index(self):
+        """持久化的名称索引 (设备、场景、家庭和房间)，保存在认证文件所在目录，见 resolve.py"""
+        if self._resolution_index is None:
+            from .resolve import INDEX_FILENAME, ResolutionIndex
+            self._resolution_index = ResolutionIndex(self.auth_data_path.parent / INDEX_FILENAME)
+        return self._resolution_index
+
+    @property
+    def statistics_store(self):
+        """本地统计数据存储，保存在认证文件所在目录的 statistics 子目录，见 statistics.py"""
+        if self._statistics_store is None:
+            from .statistics import STORE_DIRNAME, StatisticsStore
+            self._statistics_store = StatisticsStore(self.auth_data_path.parent / STORE_DIRNAME)
+        return self._statistics_store
+
+    def _update_index(self, method: str, *args):
+        try:
+            getattr(self.resolution_index, method)(*args)
+        except OSError as e:
+            logger.debug(f"更新名称索引失败: {e}")
+
     @property
     def pass_o(self) -> str:
         if "pass_o" in self.auth_data:
@@ -139,12 +203,12 @@ class mijiaAPI():
         self.auth_data["deviceId"] = "".join(random.choices("0123456789abcdefghijklmnopqrstuvwxyzABCDEFGHIJKLMNOPQRSTUVWXYZ_-", k=16))
         return self.auth_data["deviceId"]
 
-    def _parse_service_ret(self, service_ret: requests.Response) -> dict:
+    def _parse_service_ret(self, service_ret: 'requests.Response') -> dict:
         text = service_ret.text.replace("&&&START&&&", "")
         service_data = json.loads(text)
         return service_data
 
-    def _handle_ret(self, fetch_ret: requests.Response, verify_code: bool = True) -> dict:
+    def _handle_ret(self, fetch_ret: 'requests.Response', verify_code: bool = True) -> dict:
         if fetch_ret.status_code != 200:
             raise LoginError(fetch_ret.status_code, fetch_ret.text)
         fetch_data = self._parse_service_ret(fetch_ret)
@@ -154,6 +218,8 @@ class mijiaAPI():
 
     @staticmethod
     def _print_qr(loginurl: str, box_size: int = 10):
+        from qrcode import QRCode
+
         logger.info("请使用米家APP扫描下方二维码")
         qr = QRCode(border=1, box_size=box_size)
         qr.add_data(loginurl)
@@ -186,7 +252,7 @@ class mijiaAPI():
                       f"cUserId={self.auth_data.get('cUserId', '')};"
                       f"uLocale={self.locale};"
         }
-        service_ret = requests.get(self.service_login_url, headers=headers)
+        service_ret = _requests().get(self.service_login_url, headers=headers)
         service_data = self._handle_ret(service_ret, verify_code=False)
         location = service_data["location"]
         if service_data['code'] == 0:
@@ -254,6 +320,7 @@ class mijiaAPI():
         异常:
             LoginError: 当登录超时或服务器返回错误时抛出
         """
+        requests = _requests()
         # Step 1: 从 serviceLogin 获取登录链接参数
         location_data = self._get_location()
         if location_data.get("code", -1) == 0 and location_data.get("message", "") == "刷新Token成功":
@@ -308,6 +375,7 @@ class mijiaAPI():
 
 
     def _request(self, uri: str, data: dict, refresh_token: bool = True) -> dict:
+        requests = _requests()
         logger.debug(f"请求 URI: {uri}，数据: {data}")
         if refresh_token:
             self._refresh_token()
@@ -365,6 +433,10 @@ class mijiaAPI():
 
 
     def _get_home_owner(self, home_id: str) -> int:
+        # 家庭所有者几乎不会变化，优先使用名称索引
+        uid = self.resolution_index.home_owner(home_id)
+        if uid is not None:
+            return uid
         homes = self.get_homes_list()
         for home in homes:
             if home["id"] == home_id:
@@ -446,7 +518,9 @@ class mijiaAPI():
         """
         uri = "/v2/homeroom/gethome_merged"
         data = {"fg": True, "fetch_share": True, "fetch_share_dev": True, "fetch_cariot": True, "limit": 300, "app_ver": 7, "plat_form": 0}
-        return self._request(uri, data)["homelist"]
+        homes = self._request(uri, data)["homelist"]
+        self._update_index("update_homes", homes)
+        return homes
 
     def get_devices_list(self, home_id: Optional[str] = None) -> list:
         """
@@ -471,7 +545,10 @@ class mijiaAPI():
         异常:
             APIError: 当API请求失败或返回错误时抛出
         """
-        return self._aggregate_across_homes(home_id, self._get_devices_list)
+        devices = self._aggregate_across_homes(home_id, self._get_devices_list)
+        if home_id is None:
+            self._update_index("update_devices", devices, "own")
+        return devices
 
     def get_shared_devices_list(self) -> list:
         """
@@ -498,6 +575,7 @@ class mijiaAPI():
         devices = [item for item in ret["list"] if item.get("owner", False)]
         for device in devices:
             device.update({"home_id": "shared"})
+        self._update_index("update_devices", devices, "shared")
         return devices
 
     def get_scenes_list(self, home_id: Optional[str] = None) -> list:
@@ -521,7 +599,9 @@ class mijiaAPI():
         异常:
             APIError: 当API请求失败或返回错误时抛出
         """
-        return self._aggregate_across_homes(home_id, self._get_scenes_list)
+        scenes = self._aggregate_across_homes(home_id, self._get_scenes_list)
+        self._update_index("update_scenes", scenes, home_id)
+        return scenes
 
     def run_scene(self, scene_id: str, home_id: str) -> bool:
         """
@@ -575,7 +655,11 @@ class mijiaAPI():
         """
         return self._aggregate_across_homes(home_id, self._get_consumable_items)
 
-    def get_devices_prop(self, data: Union[list, dict]) -> Union[list, dict]:
+    def get_devices_prop(
+            self,
+            data: Union[list, dict],
+            freshness: Optional[Union[str, int]] = None,
+    ) -> Union[list, dict]:
         """
         获取设备属性
 
@@ -593,6 +677,13 @@ class mijiaAPI():
                               model 从 get_devices_list() 获取
                 - piid (int): 属性ID，从 https://home.miot-spec.com/spec/{model} 获取，
                               model 从 get_devices_list() 获取
+                - freshness (str): 可选，单个属性的读取策略，覆盖参数 freshness
+            freshness (Optional[Union[str, int]]): 可选，读取策略 (对应请求的 datasource 参数)
+                - "cloud": 默认，读取云端缓存的最近上报值，开销小，适合后台轮询
+                - "device": 由云端向设备实时查询，适合打开详情页或控制决策前读取
+                - int: 直接指定 datasource 的值
+                不同策略的属性会拆分为多次请求，结果按输入顺序返回。
+                各策略的使用次数和结果的陈旧程度可通过 freshness_stats.snapshot() 查看。
 
         返回值:
             Union[list, dict]: 设备属性查询结果
@@ -626,10 +717,29 @@ class mijiaAPI():
             ...     {"did": "1234567890", "siid": 2, "piid": 3},  # 色温
             ...     {"did": "0987654321", "siid": 2, "piid": 1}   # 另一个灯的开关
             ... ])
+
+            # 控制前从设备实时读取
+            >>> result = api.get_devices_prop({"did": "1234567890", "siid": 2, "piid": 1}, freshness="device")
         """
         params, was_single = _normalize_to_list(data)
         uri = "/miotspec/prop/get"
-        ret_data = self._request(uri, {"params": params, "datasource": 1})
+        default_datasource = resolve_datasource(freshness)
+        groups = {}
+        for i, param in enumerate(params):
+            if "freshness" in param:
+                param = {k: v for k, v in param.items() if k != "freshness"}
+                datasource = resolve_datasource(params[i]["freshness"])
+            else:
+                datasource = default_datasource
+            groups.setdefault(datasource, []).append((i, param))
+        ret_data = [None] * len(params)
+        for datasource, items in groups.items():
+            ret = self._request(uri, {"params": [param for _, param in items], "datasource": datasource})
+            self.freshness_stats.record(datasource, ret)
+            for (i, _), item in zip(items, ret):
+                ret_data[i] = item
+        if self.prop_cache is not None:
+            self.prop_cache.store_results(ret_data)
         return _unwrap_single(ret_data, was_single)
 
     def set_devices_prop(self, data: Union[list, dict]) -> Union[list, dict]:
@@ -693,6 +803,8 @@ class mijiaAPI():
                 ret.update({"message": ERROR_CODE.get(str(ret["code"]), "未知错误")})
             else:
                 ret.update({"message": "成功"})
+        if self.prop_cache is not None:
+            self.prop_cache.write_through(params, ret_data)
         return _unwrap_single(ret_data, was_single)
 
     def run_action(self, data: Union[list, dict]) -> Union[list, dict]:
@@ -789,7 +901,7 @@ class mijiaAPI():
 
         返回值：
             list: 统计数据列表，每项包含以下字段：
-                - value (str): 统计值（通常需要用 eval() 解析）
+                - value (str): 统计值，JSON 数组字符串，可用 statistics.parse_stat_value() 解析
                 - time (int): 时间戳
 
         已知问题：
@@ -815,11 +927,17 @@ class mijiaAPI():
             ...     "time_start": int(time.time() - 24 * 3600 * 30 * 6),
             ...     "time_end": int(time.time()),
             ... })
+            >>> from mijiaAPI.statistics import parse_stat_value
             >>> for item in ret:
-            ...     value = eval(item['value'])[0]
+            ...     value = parse_stat_value(item['value'])
             ...     ts = item['time']
             ...     date = time.strftime('%Y-%m-%d', time.localtime(ts))
             ...     print(f'{date}: {value}')
+
+            重复获取同一范围时可使用 statistics_store，只请求本地缺失的时间窗口：
+
+            >>> times, values = api.statistics_store.fetch(api, "123456", "7.1", "stat_month_v3",
+            ...                                            int(time.time() - 24 * 3600 * 30 * 6))
         """
         params, was_single = _normalize_to_list(data)
         uri = "/v2/user/statistics"
@@ -828,3 +946,41 @@ class mijiaAPI():
             ret = self._request(uri, param)
             ret_data.append(ret)
         return _unwrap_single(ret_data, was_single)
+
+    def watch(self, props: list, interval: float, callback: Callable[[list], None]):
+        """
+        订阅设备属性变化
+
+        所有订阅共享同一个后台轮询线程：每个周期合并所有到期订阅的属性，批量调用 /miotspec/prop/get，
+        再根据 updateTime 和值的变化，只向各订阅者回调发生变化的属性。
+        首次轮询会回调所有属性的当前值。
+
+        参数:
+            props (list): 需要订阅的属性列表，每个元素为以下两种格式之一：
+                - (did, name): 设备ID和属性名称，属性名称从 get_device_info() 获取
+                - (did, siid, piid): 设备ID、服务ID和属性ID
+            interval (float): 轮询间隔（秒）
+            callback (Callable[[list], None]): 回调函数，参数为 PropertyChange 列表，包含以下字段：
+                - did (str): 设备ID
+                - name (Optional[str]): 属性名称，以 (did, siid, piid) 订阅时为 None
+                - siid (int): 服务ID
+                - piid (int): 属性ID
+                - value: 属性值
+                - update_time (Optional[int]): 属性最后更新时间的时间戳（秒）
+                - code (int): 错误代码，0 表示成功
+                - previous: 上一次回调的值，首次回调为 None
+
+        返回值:
+            WatchSubscription: 订阅句柄，调用 cancel() 取消订阅，也可作为上下文管理器使用
+
+        异常:
+            ValueError: 当属性不存在或不可读取时抛出
+
+        示例:
+            >>> def on_change(changes):
+            ...     for c in changes:
+            ...         print(c.did, c.name, c.previous, "->", c.value)
+            >>> sub = api.watch([("1234567890", "on"), ("1234567890", "brightness")], 5, on_change)
+            >>> sub.cancel()
+        """
+        return self.property_watcher.subscribe(props, interval, callback)
@@ -0,0 +1,266 @@
+import json
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import asdict, dataclass, field
+from pathlib import Path
+from typing import Callable, Dict, Iterable, List, Optional, Tuple, Union
+
+from .logger import logger
+from .statistics import StatisticsStore
+
+
+BackfillWindow = Tuple[str, int, int]
+
+
+class RateLimiter:
+    """Token bucket shared by the backfill workers; acquire() blocks until a request may be sent"""
+
+    def __init__(self, rate: float, burst: int = 1):
+        if rate <= 0:
+            raise ValueError(f"无效的请求速率: {rate}")
+        self.rate = rate
+        self.burst = burst
+        self._tokens = float(burst)
+        self._last = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self, stop: Optional[threading.Event] = None) -> bool:
+        while True:
+            if stop is not None and stop.is_set():
+                return False
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.burst, self._tokens + (now - self._last) * self.rate)
+                self._last = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return True
+                wait = (1 - self._tokens) / self.rate
+            if stop is not None:
+                if stop.wait(wait):
+                    return False
+            else:
+                time.sleep(wait)
+
+
+@dataclass
+class BackfillJob:
+    """What to backfill: one key/data_type over [time_start, time_end) for several devices"""
+    dids: List[str]
+    key: str
+    data_type: str
+    time_start: int
+    time_end: int
+
+
+@dataclass
+class BackfillProgress:
+    total: int = 0
+    done: int = 0
+    failed: int = 0
+    requests: int = 0
+    started_at: float = field(default_factory=time.monotonic)
+
+    @property
+    def elapsed(self) -> float:
+        return time.monotonic() - self.started_at
+
+    @property
+    def throughput(self) -> float:
+        """每秒完成的窗口数"""
+        return self.done / self.elapsed if self.elapsed > 0 else 0.0
+
+    @property
+    def eta(self) -> Optional[float]:
+        """剩余时间估计（秒），尚无完成的窗口时为 None"""
+        remaining = self.total - self.done - self.failed
+        if remaining <= 0:
+            return 0.0
+        return remaining / self.throughput if self.throughput > 0 else None
+
+    def __str__(self) -> str:
+        eta = f"{self.eta:.0f}s" if self.eta is not None else "-"
+        return (f"{self.done + self.failed}/{self.total} 个窗口 (失败 {self.failed}), "
+                f"{self.throughput:.2f} 窗口/s, 剩余约 {eta}")
+
+
+class BackfillRunner:
+    """
+    Backfill statistics for many devices into a StatisticsStore.
+
+    The range of every device is split into limit-sized windows (only those
+    the store has not fetched yet) and run on a bounded worker pool. All
+    workers share one RateLimiter, independent from interactive requests.
+    Completed windows are checkpointed by flushing the store every
+    checkpoint_interval seconds (the store records fetched windows); the
+    checkpoint file holds the job and failed windows, so resume() continues
+    an interrupted run where it stopped.
+    """
+
+    def __init__(
+            self,
+            api,
+            store: StatisticsStore,
+            checkpoint_path: Union[str, Path],
+            max_workers: int = 2,
+            rate: float = 2.0,
+            retries: int = 2,
+            checkpoint_interval: float = 10.0,
+            on_progress: Optional[Callable[[BackfillProgress], None]] = None,
+    ):
+        self.api = api
+        self.store = store
+        self.checkpoint_path = Path(checkpoint_path)
+        self.max_workers = max_workers
+        self.limiter = RateLimiter(rate)
+        self.retries = retries
+        self.checkpoint_interval = checkpoint_interval
+        self.on_progress = on_progress
+        self.progress = BackfillProgress()
+        self._stop = threading.Event()
+        self._lock = threading.Lock()
+        self._dirty: Dict[Tuple[str, str, str], None] = {}
+        self._failed: Dict[str, List[Tuple[int, int]]] = {}
+        self._last_checkpoint = time.monotonic()
+
+    def plan(self, job: BackfillJob) -> List[BackfillWindow]:
+        """尚未获取的 (did, start, end) 窗口列表"""
+        return [
+            (did, start, end)
+            for did in job.dids
+            for start, end in self.store.missing_windows(did, job.key, job.data_type, job.time_start, job.time_end)
+        ]
+
+    def run(self, job: BackfillJob) -> BackfillProgress:
+        """
+        执行回填，阻塞直到完成或调用 stop()
+
+        返回值:
+            BackfillProgress: 窗口总数、完成数、失败数、请求数和耗时
+        """
+        self._stop.clear()
+        windows = self.plan(job)
+        self.progress = BackfillProgress(total=len(windows))
+        self._failed = {}
+        self._save_checkpoint(job, finished=False)
+        logger.info(f"开始回填 {len(job.dids)} 个设备的 {job.data_type} 统计数据，共 {len(windows)} 个窗口")
+        try:
+            with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+                for _ in executor.map(lambda w: self._run_window(job, *w), windows):
+                    pass
+        finally:
+            self._flush()
+            self._save_checkpoint(job, finished=not self._stop.is_set())
+        logger.info(f"回填结束: {self.progress}")
+        return self.progress
+
+    def resume(self) -> Optional[BackfillProgress]:
+        """从检查点文件恢复上次未完成的回填，没有未完成的回填时返回 None"""
+        state = self.load_checkpoint()
+        if state is None or state.get("finished"):
+            return None
+        return self.run(BackfillJob(**state["job"]))
+
+    def stop(self):
+        """请求停止，正在进行的请求完成后返回"""
+        self._stop.set()
+
+    def load_checkpoint(self) -> Optional[dict]:
+        try:
+            with self.checkpoint_path.open("r", encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, json.JSONDecodeError):
+            return None
+
+    def _run_window(self, job: BackfillJob, did: str, start: int, end: int):
+        for attempt in range(self.retries + 1):
+            if not self.limiter.acquire(self._stop):
+                return
+            try:
+                self.store.fetch_window(self.api, did, job.key, job.data_type, start, end)
+            except Exception as e:
+                # 网络错误和接口错误都只影响当前窗口，重试后仍失败的窗口留到下次回填
+                logger.debug(f"回填窗口失败 {did} [{start}, {end}) 第 {attempt + 1} 次: {e}")
+                with self._lock:
+                    self.progress.requests += 1
+                continue
+            with self._lock:
+                self.progress.requests += 1
+                self.progress.done += 1
+                self._dirty[(did, job.key, job.data_type)] = None
+            break
+        else:
+            logger.warning(f"回填窗口失败 {did} [{start}, {end})")
+            with self._lock:
+                self.progress.failed += 1
+                self._failed.setdefault(did, []).append((start, end))
+        if time.monotonic() - self._last_checkpoint >= self.checkpoint_interval:
+            self._flush()
+            self._save_checkpoint(job, finished=False)
+        if self.on_progress is not None:
+            try:
+                self.on_progress(self.progress)
+            except Exception as e:
+                logger.error(f"回填进度回调出错: {e}")
+
+    def _flush(self):
+        with self._lock:
+            dirty = list(self._dirty)
+            self._dirty.clear()
+            self._last_checkpoint = time.monotonic()
+        for series_key in dirty:
+            self.store.save(*series_key)
+
+    def _save_checkpoint(self, job: BackfillJob, finished: bool):
+        with self._lock:
+            state = {
+                "job": asdict(job),
+                "finished": finished,
+                "failed": {did: [list(w) for w in ws] for did, ws in self._failed.items()},
+                "progress": {"total": self.progress.total, "done": self.progress.done,
+                             "failed": self.progress.failed, "requests": self.progress.requests},
+                "updated": time.time(),
+            }
+        self.checkpoint_path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = self.checkpoint_path.with_name(f"{self.checkpoint_path.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+        with tmp.open("w", encoding="utf-8") as f:
+            json.dump(state, f, ensure_ascii=False)
+        os.replace(tmp, self.checkpoint_path)
+
+
+def backfill_statistics(
+        api,
+        dids: Iterable[str],
+        key: str,
+        data_type: str,
+        time_start: int,
+        time_end: Optional[int] = None,
+        checkpoint_path: Optional[Union[str, Path]] = None,
+        **kwargs,
+) -> BackfillProgress:
+    """
+    批量回填多个设备的统计数据到 api.statistics_store
+
+    检查点文件中有相同任务未完成时会继续上次的进度 (已获取的窗口不会重复请求)。
+
+    参数:
+        api (mijiaAPI): API 实例
+        dids (Iterable[str]): 设备ID列表
+        key (str): 统计数据的键，见 mijiaAPI.get_statistics()
+        data_type (str): 统计数据类型，例如 stat_hour_v3
+        time_start (int): 开始时间戳（秒）
+        time_end (Optional[int]): 结束时间戳（秒，不包含），默认当前时间
+        checkpoint_path (Optional[Union[str, Path]]): 检查点文件，默认保存在统计数据目录的 backfill.json
+        **kwargs: 传给 BackfillRunner 的参数，例如 max_workers、rate、on_progress
+
+    返回值:
+        BackfillProgress: 本次回填的进度统计
+    """
+    store = api.statistics_store
+    if checkpoint_path is None:
+        checkpoint_path = store.path / "backfill.json"
+    job = BackfillJob(list(dids), key, data_type, int(time_start),
+                      int(time_end if time_end is not None else time.time() + 1))
+    return BackfillRunner(api, store, checkpoint_path, **kwargs).run(job)
@@ -0,0 +1,525 @@
+import json
+import queue
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, TextIO, Tuple
+
+from .apis import mijiaAPI
+from .bulk import prepare_bulk_set
+from .devices import DevProp, _build_prop_list, get_device_info
+from .errors import APIError, GetDeviceInfoError
+from .freshness import resolve_datasource
+from .logger import logger
+
+
+OPS = ("get", "set", "action", "scene")
+# 命令中只能是字符串 (或数字 ID) 的字段
+SCALAR_FIELDS = ("did", "dev_name", "scene", "action")
+
+
+class BatchCommandError(ValueError):
+    """A batch command that cannot be executed (bad input or unresolved device)"""
+
+
+def iter_windows(items: Iterable, size: int, idle: float) -> Iterator[list]:
+    """
+    Group items into lists of at most size items.
+
+    A list is also closed as soon as no new item arrives for idle seconds, so
+    a slow producer (a script writing into a pipe) gets results for what it
+    has sent instead of waiting for size items or EOF. Items are read on a
+    helper thread; an exception raised by the iterable is re-raised here once
+    the items before it have been yielded.
+    """
+    pending: queue.Queue = queue.Queue(maxsize=size)
+    done = object()
+    failure = []
+
+    def read():
+        try:
+            for item in items:
+                pending.put(item)
+        except Exception as e:
+            failure.append(e)
+        finally:
+            pending.put(done)
+
+    threading.Thread(target=read, name="mijiaAPI-batch-reader", daemon=True).start()
+    window = []
+    while True:
+        try:
+            item = pending.get(timeout=idle) if window else pending.get()
+        except queue.Empty:
+            yield window
+            window = []
+            continue
+        if item is done:
+            if window:
+                yield window
+            if failure:
+                raise failure[0]
+            return
+        window.append(item)
+        if len(window) >= size:
+            yield window
+            window = []
+
+
+@dataclass
+class BatchCommand:
+    """One parsed JSONL command and the result being assembled for it"""
+    line: int
+    op: str
+    raw: dict
+    did: Optional[str] = None
+    name: Optional[str] = None
+    pending: int = 0
+    result: Dict[str, Any] = field(default_factory=dict)
+
+    def header(self) -> dict:
+        header = {"line": self.line, "op": self.op}
+        if "id" in self.raw:
+            header["id"] = self.raw["id"]
+        if self.did is not None:
+            header["did"] = self.did
+            header["name"] = self.name
+        return header
+
+
+class DeviceResolver:
+    """
+    did/name index, per-model spec tables and the scene list of one account.
+
+    Everything is loaded on first use and kept; with ttl set, the device and
+    scene lists are fetched again once they are older than ttl seconds. A
+    resolver is safe to share between threads and between batches.
+    """
+
+    def __init__(self, api: mijiaAPI, ttl: Optional[float] = None):
+        self.api = api
+        self.ttl = ttl
+        self._devices: Optional[Dict[str, dict]] = None
+        self._lists: Tuple[list, list] = ([], [])
+        self._names: Dict[str, List[str]] = {}
+        self._devices_at = 0.0
+        self._specs: Dict[str, Optional[Tuple[Dict[str, DevProp], Dict[str, dict]]]] = {}
+        self._scenes: Optional[Dict[str, dict]] = None
+        self._scenes_at = 0.0
+        self._lock = threading.RLock()
+
+    def _expired(self, loaded_at: float) -> bool:
+        return self.ttl is not None and time.monotonic() - loaded_at > self.ttl
+
+    def devices(self) -> Dict[str, dict]:
+        """did -> device dict from get_devices_list() and get_shared_devices_list()"""
+        with self._lock:
+            if self._devices is None or self._expired(self._devices_at):
+                self._lists = (self.api.get_devices_list(), self.api.get_shared_devices_list())
+                devices = self._lists[0] + self._lists[1]
+                self._devices = {device["did"]: device for device in devices}
+                self._names = {}
+                for device in devices:
+                    self._names.setdefault(device["name"], []).append(device["did"])
+                self._devices_at = time.monotonic()
+            return self._devices
+
+    def device_lists(self) -> Tuple[list, list]:
+        """(get_devices_list(), get_shared_devices_list()) as last fetched"""
+        with self._lock:
+            self.devices()
+            return self._lists
+
+    def resolve(self, did: Optional[str] = None, dev_name: Optional[str] = None) -> dict:
+        devices = self.devices()
+        if did is not None:
+            did = str(did)
+            if did not in devices:
+                raise BatchCommandError(f"未找到 did 为 '{did}' 的设备")
+            return devices[did]
+        if dev_name is None:
+            raise BatchCommandError("必须提供 did 或 dev_name 参数之一")
+        dids = self._names.get(dev_name, [])
+        if not dids:
+            raise BatchCommandError(f"未找到名称为 '{dev_name}' 的设备")
+        if len(dids) > 1:
+            raise BatchCommandError(f"找到多个 dev_name 为 '{dev_name}' 的设备，请使用 did 参数指定具体设备")
+        return devices[dids[0]]
+
+    def spec(self, model: str) -> Tuple[Dict[str, DevProp], Dict[str, dict]]:
+        """(property table, action name -> action dict) for a model"""
+        with self._lock:
+            if model not in self._specs:
+                try:
+                    info = get_device_info(model, cache_path=self.api.auth_data_path.parent)
+                except GetDeviceInfoError as e:
+                    logger.warning(f"获取设备信息失败: {e}")
+                    self._specs[model] = None
+                else:
+                    actions = {act["name"]: act for act in info.get("actions", [])}
+                    self._specs[model] = (_build_prop_list(info), actions)
+            spec = self._specs[model]
+        if spec is None:
+            raise BatchCommandError(f"获取设备型号 '{model}' 的设备信息失败")
+        return spec
+
+    def scene(self, scene: str) -> dict:
+        with self._lock:
+            if self._scenes is None or self._expired(self._scenes_at):
+                self._scenes = {s["scene_id"]: s for s in self.api.get_scenes_list()}
+                self._scenes_at = time.monotonic()
+            scenes = self._scenes
+        if scene in scenes:
+            return scenes[scene]
+        matches = [s for s in scenes.values() if s["name"] == scene]
+        if not matches:
+            raise BatchCommandError(f"场景 {scene} 未找到")
+        if len(matches) > 1:
+            raise BatchCommandError(f"找到多个名称为 '{scene}' 的场景，请使用场景ID")
+        return matches[0]
+
+    def invalidate(self):
+        with self._lock:
+            self._devices = None
+            self._scenes = None
+            self._specs.clear()
+
+
+class BatchRunner:
+    """
+    Execute many get/set/action/scene commands against one logged-in mijiaAPI.
+
+    Devices, specs and scenes come from a DeviceResolver, so each is fetched
+    once per batch, or once per process when a resolver is shared. Property
+    reads from all get commands are merged into chunked prop/get calls,
+    validated writes into chunked prop/set calls, and actions into chunked
+    action calls. The chunks run on a bounded thread pool, and each command's
+    result is emitted as soon as its last chunk completes.
+
+    Commands in one batch run concurrently, in no particular order. A read
+    that must observe a write from the same script belongs in a later batch.
+    Input is consumed in windows of at most window commands; a window also
+    closes once the input has been idle for idle seconds. Each window is
+    planned and executed as soon as it closes, so results flow while a long or
+    slow stream is still being written, and memory stays bounded. Commands are
+    only merged within a window.
+    """
+
+    def __init__(
+            self,
+            api: mijiaAPI,
+            emit: Callable[[dict], None],
+            max_workers: int = 4,
+            chunk_size: int = 100,
+            resolver: Optional[DeviceResolver] = None,
+            reader: Optional[Callable[[list], list]] = None,
+            window: int = 1000,
+            idle: float = 0.05,
+    ):
+        self.api = api
+        self.emit = emit
+        self.max_workers = max_workers
+        self.chunk_size = chunk_size
+        self.window = window
+        self.idle = idle
+        self.resolver = resolver if resolver is not None else DeviceResolver(api)
+        # prop/get 的实际执行者，默认直接请求云端
+        self.reader = reader if reader is not None else api.get_devices_prop
+        self._lock = threading.Lock()
+        self.counters = {"commands": 0, "ok": 0, "failed": 0}
+
+    # -- planning -----------------------------------------------------------
+
+    @staticmethod
+    def _check_fields(raw: dict):
+        """Reject fields of the wrong JSON type before they reach the planner"""
+        for key in SCALAR_FIELDS:
+            value = raw.get(key)
+            if value is not None and (isinstance(value, bool) or not isinstance(value, (str, int))):
+                raise BatchCommandError(f"{key} 参数必须是字符串")
+        names = raw.get("prop_name")
+        if names is not None and not isinstance(names, str) and not (
+                isinstance(names, list) and all(isinstance(name, str) for name in names)):
+            raise BatchCommandError("prop_name 参数必须是字符串或字符串列表")
+        if "values" in raw and not isinstance(raw["values"], dict):
+            raise BatchCommandError("values 参数必须是对象")
+
+    def _prop_names(self, raw: dict) -> List[str]:
+        names = raw.get("prop_name")
+        if names is None:
+            raise BatchCommandError("缺少 prop_name 参数")
+        return [names] if isinstance(names, str) else list(names)
+
+    @staticmethod
+    def _freshness(freshness):
+        try:
+            resolve_datasource(freshness)
+        except ValueError as e:
+            raise BatchCommandError(str(e))
+        return freshness
+
+    def _plan(self, cmd: BatchCommand, gets: list, sets: list, actions: list, scenes: list):
+        raw = cmd.raw
+        self._check_fields(raw)
+        if cmd.op == "scene":
+            if "scene" not in raw:
+                raise BatchCommandError("缺少 scene 参数")
+            scenes.append((cmd, self.resolver.scene(str(raw["scene"]))))
+            cmd.pending = 1
+            return
+
+        device = self.resolver.resolve(raw.get("did"), raw.get("dev_name"))
+        cmd.did = device["did"]
+        cmd.name = device.get("name")
+        props, dev_actions = self.resolver.spec(device["model"])
+        if cmd.op == "get":
+            cmd.result = {"values": {}, "errors": {}}
+            for name in self._prop_names(raw):
+                prop = props.get(name)
+                if prop is None:
+                    cmd.result["errors"][name] = f"不支持的属性: {name}"
+                elif "r" not in prop.rw:
+                    cmd.result["errors"][name] = f"属性 {name} 不可读取"
+                else:
+                    param = {"did": cmd.did, **prop.method}
+                    if "freshness" in raw:
+                        param["freshness"] = self._freshness(raw["freshness"])
+                    gets.append((cmd, name, param))
+                    cmd.pending += 1
+        elif cmd.op == "set":
+            if "values" in raw:
+                items = list(raw["values"].items())
+            elif "value" in raw:
+                items = [(name, raw["value"]) for name in self._prop_names(raw)]
+            else:
+                raise BatchCommandError("缺少 value 或 values 参数")
+            cmd.result = {"codes": {}, "errors": {}}
+            for name, value in items:
+                sets.append((cmd, name, value))
+                cmd.pending += 1
+        else:
+            name = raw.get("action")
+            act = dev_actions.get(name)
+            if act is None:
+                raise BatchCommandError(f"不支持的动作: {name}, 可用动作: {list(dev_actions)}")
+            param = {"did": cmd.did, **act["method"]}
+            for key in ("value", "in"):
+                if key in raw:
+                    param[key] = raw[key]
+            actions.append((cmd, name, param))
+            cmd.pending = 1
+
+    # -- execution ----------------------------------------------------------
+
+    def _output(self, out: dict):
+        with self._lock:
+            self.counters["ok" if out.get("ok") else "failed"] += 1
+        self.emit(out)
+
+    def _emit(self, cmd: BatchCommand, **result):
+        out = cmd.header()
+        out.update(result)
+        self._output(out)
+
+    def _finish(self, cmd: BatchCommand):
+        if cmd.op == "get":
+            ok = not cmd.result["errors"]
+        elif cmd.op == "set":
+            ok = not cmd.result["errors"] and all(code in (0, 1) for code in cmd.result["codes"].values())
+        else:
+            ok = cmd.result.get("code", 0) in (0, 1) and "error" not in cmd.result
+        self._emit(cmd, ok=ok, **cmd.result)
+
+    def _complete(self, items: List[Tuple[BatchCommand, str, Any]], apply: Callable):
+        """Apply per-item outcomes, then emit commands that have nothing pending"""
+        done = []
+        with self._lock:
+            for cmd, name, outcome in items:
+                apply(cmd, name, outcome)
+                cmd.pending -= 1
+                if cmd.pending == 0:
+                    done.append(cmd)
+        for cmd in done:
+            self._finish(cmd)
+
+    @staticmethod
+    def _apply_get(cmd: BatchCommand, name: str, outcome):
+        if isinstance(outcome, Exception):
+            cmd.result["errors"][name] = str(outcome)
+        elif outcome.get("code", 0) != 0:
+            cmd.result["errors"][name] = f"code: {outcome.get('code')}"
+        else:
+            cmd.result["values"][name] = outcome.get("value")
+
+    @staticmethod
+    def _apply_set(cmd: BatchCommand, name: str, outcome):
+        if isinstance(outcome, Exception):
+            cmd.result["errors"][name] = str(outcome)
+        else:
+            cmd.result["codes"][name] = outcome.get("code")
+
+    @staticmethod
+    def _apply_action(cmd: BatchCommand, name: str, outcome):
+        if isinstance(outcome, Exception):
+            cmd.result["error"] = str(outcome)
+        else:
+            cmd.result["code"] = outcome.get("code")
+            if "out" in outcome:
+                cmd.result["out"] = outcome["out"]
+
+    @staticmethod
+    def _apply_scene(cmd: BatchCommand, scene: dict, outcome):
+        cmd.result["scene_id"] = scene["scene_id"]
+        if isinstance(outcome, Exception):
+            cmd.result["error"] = str(outcome)
+        elif not outcome:
+            cmd.result["error"] = "运行场景失败"
+
+    def _chunks(self, items: list) -> Iterable[list]:
+        for start in range(0, len(items), self.chunk_size):
+            yield items[start:start + self.chunk_size]
+
+    def _run_chunk(self, call: Callable, items: list, params: list) -> list:
+        try:
+            results = list(call(params))
+        except Exception as e:
+            # 单个分块失败只影响其中的命令，不中断整个批次
+            return [e] * len(items)
+        if len(results) < len(items):
+            missing = BatchCommandError("请求未返回该项的结果")
+            results += [missing] * (len(items) - len(results))
+        return results
+
+    def run(self, commands: Iterable[Tuple[int, Any]]) -> Dict[str, int]:
+        """
+        Execute (line number, decoded JSON or parse error) pairs.
+
+        Returns counters: commands, ok, failed.
+        """
+        for window in iter_windows(commands, self.window, self.idle):
+            self._run_window(window)
+        return dict(self.counters)
+
+    def _run_window(self, commands: List[Tuple[int, Any]]):
+        gets, sets, actions, scenes = [], [], [], []
+        for line, raw in commands:
+            self.counters["commands"] += 1
+            if isinstance(raw, Exception):
+                self._output({"line": line, "ok": False, "error": f"无效的 JSON: {raw}"})
+                continue
+            op = raw.get("op") if isinstance(raw, dict) else None
+            if op not in OPS:
+                self._output({"line": line, "ok": False, "error": f"无效的 op: {op}, 可选值: {', '.join(OPS)}"})
+                continue
+            cmd = BatchCommand(line, op, raw)
+            try:
+                self._plan(cmd, gets, sets, actions, scenes)
+            except (BatchCommandError, APIError) as e:
+                self._emit(cmd, ok=False, error=str(e))
+                continue
+            except Exception as e:
+                # 一个命令出错不中断整个批次
+                logger.warning(f"第 {line} 行命令执行失败: {e!r}")
+                self._emit(cmd, ok=False, error=f"{type(e).__name__}: {e}")
+                continue
+            if cmd.pending == 0:
+                self._finish(cmd)
+
+        set_items = self._validate_sets(sets)
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            futures = {}
+            for items, call, apply in (
+                    (gets, self.reader, self._apply_get),
+                    (set_items, self.api.set_devices_prop, self._apply_set),
+                    (actions, self.api.run_action, self._apply_action),
+            ):
+                for chunk in self._chunks(items):
+                    fut = executor.submit(self._run_chunk, call, chunk, [param for _, _, param in chunk])
+                    futures[fut] = (chunk, apply)
+            for cmd, scene in scenes:
+                fut = executor.submit(self._run_scene, scene)
+                futures[fut] = ([(cmd, scene, None)], self._apply_scene)
+            for fut in as_completed(futures):
+                chunk, apply = futures[fut]
+                self._complete([(cmd, name, outcome) for (cmd, name, _), outcome in zip(chunk, fut.result())], apply)
+
+    def _run_scene(self, scene: dict) -> list:
+        try:
+            return [self.api.run_scene(scene["scene_id"], scene["home_id"])]
+        except Exception as e:
+            return [e]
+
+    def _validate_sets(self, sets: list) -> list:
+        """Validate all writes in one prepare_bulk_set() pass; rejected rows complete immediately"""
+        if not sets:
+            return []
+        models = {did: device["model"] for did, device in self.resolver.devices().items()}
+        try:
+            plan = prepare_bulk_set(
+                self.api,
+                [cmd.did for cmd, _, _ in sets],
+                [name for _, name, _ in sets],
+                [value for _, _, value in sets],
+                models=models,
+            )
+        except Exception as e:
+            self._complete([(cmd, name, e) for cmd, name, _ in sets], self._apply_set)
+            return []
+        rejected = [(sets[r.row][0], r.name, BatchCommandError(r.reason)) for r in plan.rejected]
+        self._complete(rejected, self._apply_set)
+        return [(sets[row][0], sets[row][1], param) for row, param in zip(plan.rows, plan.params)]
+
+
+def read_commands(stream: TextIO) -> Iterable[Tuple[int, Any]]:
+    """Yield (line number, decoded command or the JSON error) for each non-empty line"""
+    for line_no, line in enumerate(stream, 1):
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            yield line_no, json.loads(line)
+        except json.JSONDecodeError as e:
+            yield line_no, e
+
+
+def run_batch(
+        api: mijiaAPI,
+        stream: TextIO,
+        output: TextIO,
+        max_workers: int = 4,
+        chunk_size: int = 100,
+) -> Dict[str, int]:
+    """
+    批量执行 JSONL 命令
+
+    每行一个命令，支持以下 op：
+        {"op": "get", "did" 或 "dev_name": ..., "prop_name": "on" 或 ["on", "brightness"], "freshness": "device"}
+        {"op": "set", "did" 或 "dev_name": ..., "prop_name": "brightness", "value": 60}
+        {"op": "set", "did" 或 "dev_name": ..., "values": {"on": true, "brightness": 60}}
+        {"op": "action", "did" 或 "dev_name": ..., "action": "toggle", "value": [...]}
+        {"op": "scene", "scene": 场景ID或名称}
+    可选的 "id" 字段会原样写入结果。设备列表和设备规格只获取一次，所有命令的属性读写合并为
+    分块的批量请求，在 max_workers 个线程中并发执行；每个命令完成后立即输出一行 JSON 结果。
+    同一批次中的命令并发执行，不保证顺序。
+
+    参数:
+        api (mijiaAPI): 已登录的 mijiaAPI 实例
+        stream (TextIO): 输入，每行一个 JSON 命令
+        output (TextIO): 输出，每行一个 JSON 结果
+        max_workers (int): 并发请求数，默认 4
+        chunk_size (int): 每次请求包含的最大参数数量，默认 100
+
+    返回值:
+        Dict[str, int]: 命令总数 (commands)、成功数 (ok)、失败数 (failed)
+    """
+    lock = threading.Lock()
+
+    def emit(result: dict):
+        line = json.dumps(result, ensure_ascii=False, default=str)
+        with lock:
+            output.write(line + "\n")
+            output.flush()
+
+    runner = BatchRunner(api, emit, max_workers=max_workers, chunk_size=chunk_size)
+    return runner.run(read_commands(stream))
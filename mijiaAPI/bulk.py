@@ -0,0 +1,250 @@
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional, Sequence, Tuple, Union
+
+from .apis import mijiaAPI
+from .devices import DevProp, _build_prop_list, get_device_info
+from .errors import GetDeviceInfoError
+from .logger import logger
+
+
+@dataclass
+class BulkRejection:
+    """A row rejected before being sent"""
+    row: int
+    did: str
+    name: str
+    value: Any
+    reason: str
+
+
+@dataclass
+class BulkSetPlan:
+    """Validated, ready-to-send prop/set params for a bulk write"""
+    params: List[dict] = field(default_factory=list)
+    rows: List[int] = field(default_factory=list)
+    rejected: List[BulkRejection] = field(default_factory=list)
+
+
+def _broadcast(column, n: int, column_name: str) -> list:
+    """Broadcast a scalar to n rows, or check that a column has n rows"""
+    if isinstance(column, (list, tuple)):
+        if len(column) != n:
+            raise ValueError(f"{column_name} 的长度 ({len(column)}) 与 dids 的长度 ({n}) 不一致")
+        return list(column)
+    return [column] * n
+
+
+def _coerce_bool(value):
+    if isinstance(value, bool):
+        return value
+    if isinstance(value, str):
+        lowered = value.lower()
+        if lowered in ("true", "1"):
+            return True
+        if lowered in ("false", "0"):
+            return False
+    elif isinstance(value, int) and value in (0, 1):
+        return bool(value)
+    raise ValueError(f"无效布尔值: {value}")
+
+
+def _coerce_string(value):
+    if not isinstance(value, str):
+        raise ValueError(f"无效字符串值: {value}")
+    return value
+
+
+_COERCERS = {
+    "bool": _coerce_bool,
+    "int": int,
+    "uint": int,
+    "float": float,
+    "string": _coerce_string,
+}
+
+
+def _validate_column(prop: DevProp, values: list) -> Tuple[list, List[Optional[str]]]:
+    """
+    Validate one column of values against a single property spec.
+
+    Type coercion, range, step and value-list checks are each applied to the
+    whole column at once; the spec lookups happen once per column rather than
+    once per value. Returns (coerced values, per-row error or None).
+    """
+    n = len(values)
+    errors: List[Optional[str]] = [None] * n
+    coerced: list = [None] * n
+
+    coerce = _COERCERS[prop.type]
+    for i, value in enumerate(values):
+        try:
+            coerced[i] = coerce(value)
+        except (TypeError, ValueError) as e:
+            errors[i] = str(e) if prop.type in ("bool", "string") else f"无效数值: {value} ({e})"
+
+    live = [i for i in range(n) if errors[i] is None]
+
+    if prop.range and prop.type in ("int", "uint", "float"):
+        lo, hi = prop.range[0], prop.range[1]
+        out_of_range = [i for i in live if not lo <= coerced[i] <= hi]
+        for i in out_of_range:
+            errors[i] = f"{coerced[i]} 超出数值范围, 应该在 {prop.range[:2]} 之间"
+        live = [i for i in live if errors[i] is None]
+
+        if len(prop.range) >= 3:
+            step = prop.range[2]
+            if prop.type == "float":
+                if isinstance(step, int):
+                    bad_step = [i for i in live if int(coerced[i] - lo) % step != 0]
+                else:
+                    bad_step = []
+            elif step != 1:
+                bad_step = [i for i in live if (coerced[i] - lo) % step != 0]
+            else:
+                bad_step = []
+            for i in bad_step:
+                errors[i] = f"无效的值: {coerced[i]}, 应该在范围 {prop.range[:2]} 内且步长为 {step}"
+            live = [i for i in live if errors[i] is None]
+
+    if prop.value_list:
+        allowed = {item["value"] for item in prop.value_list}
+        for i in live:
+            if coerced[i] not in allowed:
+                errors[i] = f"无效值: {coerced[i]}, 请使用 {prop.value_list}"
+
+    return coerced, errors
+
+
+def prepare_bulk_set(
+        api: mijiaAPI,
+        dids: Sequence[str],
+        names: Union[str, Sequence[str]],
+        values: Any,
+        models: Optional[Dict[str, str]] = None,
+) -> BulkSetPlan:
+    """
+    批量校验并编码设备属性设置参数
+
+    以列的形式接收 (did, 属性名, 值)，按 (型号, 属性) 分组后整列校验类型、范围、步长和枚举值，
+    无效的行会附带原因被拒绝，有效的行一次性编码为 set_devices_prop() 所需的参数列表。
+
+    参数:
+        api (mijiaAPI): 已登录的 mijiaAPI 实例
+        dids (Sequence[str]): 设备ID列
+        names (Union[str, Sequence[str]]): 属性名称列，传入单个字符串时广播到所有行
+        values (Any): 属性值列，传入单个值（非 list/tuple）时广播到所有行
+        models (Optional[Dict[str, str]]): 可选，did -> model 映射。
+            - 如果为 None，则通过 get_devices_list() 获取一次
+            - 如果指定，则不再请求设备列表
+
+    返回值:
+        BulkSetPlan: 批量设置计划，包含以下字段：
+            - params (list): 可直接传给 set_devices_prop() 的参数列表
+            - rows (list): params 中每一项对应的输入行号
+            - rejected (list): 被拒绝的行 (BulkRejection)，包含行号及原因
+
+    异常:
+        ValueError: 当列长度不一致时抛出
+
+    示例:
+        >>> plan = prepare_bulk_set(api, lamp_dids, "brightness", 60)
+        >>> for r in plan.rejected:
+        ...     print(r.did, r.reason)
+        >>> api.set_devices_prop(plan.params)
+    """
+    dids = list(dids)
+    n = len(dids)
+    names = _broadcast(names, n, "names")
+    values = _broadcast(values, n, "values")
+    plan = BulkSetPlan()
+    if n == 0:
+        return plan
+
+    if models is None:
+        devices = api.get_devices_list()
+        models = {device["did"]: device["model"] for device in devices}
+
+    cache_path = api.auth_data_path.parent
+    prop_tables: Dict[str, Optional[Dict[str, DevProp]]] = {}
+    for model in {models.get(did) for did in dids} - {None}:
+        try:
+            prop_tables[model] = _build_prop_list(get_device_info(model, cache_path=cache_path))
+        except GetDeviceInfoError as e:
+            logger.warning(f"批量设置时获取设备信息失败: {e}")
+            prop_tables[model] = None
+
+    rejected: Dict[int, str] = {}
+    groups: Dict[Tuple[str, str], List[int]] = {}
+    for row, (did, name) in enumerate(zip(dids, names)):
+        model = models.get(did)
+        if model is None:
+            rejected[row] = f"未找到 did 为 '{did}' 的设备"
+            continue
+        table = prop_tables[model]
+        if table is None:
+            rejected[row] = f"获取设备型号 '{model}' 的设备信息失败"
+            continue
+        groups.setdefault((model, name), []).append(row)
+
+    encoded: Dict[int, dict] = {}
+    for (model, name), rows in groups.items():
+        prop = prop_tables[model].get(name)
+        if prop is None:
+            for row in rows:
+                rejected[row] = f"不支持的属性: {name}"
+            continue
+        if "w" not in prop.rw:
+            for row in rows:
+                rejected[row] = f"属性 {name} 不可写入"
+            continue
+        coerced, errors = _validate_column(prop, [values[row] for row in rows])
+        for row, value, error in zip(rows, coerced, errors):
+            if error is not None:
+                rejected[row] = error
+            else:
+                encoded[row] = {"did": dids[row], **prop.method, "value": value}
+
+    for row in range(n):
+        if row in encoded:
+            plan.params.append(encoded[row])
+            plan.rows.append(row)
+        else:
+            plan.rejected.append(BulkRejection(row, dids[row], names[row], values[row], rejected[row]))
+    logger.debug(f"批量设置校验完成: {len(plan.params)} 行有效, {len(plan.rejected)} 行被拒绝")
+    return plan
+
+
+def bulk_set_devices_prop(
+        api: mijiaAPI,
+        dids: Sequence[str],
+        names: Union[str, Sequence[str]],
+        values: Any,
+        models: Optional[Dict[str, str]] = None,
+        chunk_size: int = 100,
+) -> Tuple[List[Optional[dict]], List[BulkRejection]]:
+    """
+    批量设置设备属性
+
+    先调用 prepare_bulk_set() 校验，再将有效的行按 chunk_size 分块发送到 /miotspec/prop/set。
+
+    参数:
+        api (mijiaAPI): 已登录的 mijiaAPI 实例
+        dids, names, values, models: 同 prepare_bulk_set()
+        chunk_size (int): 每次请求包含的最大参数数量，默认 100
+
+    返回值:
+        tuple: (results, rejected)
+            - results (list): 与输入行一一对应的设置结果 dict，被拒绝的行为 None
+            - rejected (list): 被拒绝的行 (BulkRejection)
+
+    异常:
+        APIError: 当API请求失败或返回错误时抛出
+    """
+    plan = prepare_bulk_set(api, dids, names, values, models=models)
+    results: List[Optional[dict]] = [None] * (len(plan.params) + len(plan.rejected))
+    for start in range(0, len(plan.params), chunk_size):
+        chunk = plan.params[start:start + chunk_size]
+        ret = api.set_devices_prop(chunk)
+        for row, item in zip(plan.rows[start:start + chunk_size], ret):
+            results[row] = item
+    return results, plan.rejected
@@ -0,0 +1,167 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, Iterable, Optional, Tuple
+
+from .logger import logger
+
+
+PropKey = Tuple[str, int, int]
+
+
+@dataclass
+class CacheEntry:
+    value: Any
+    stored_at: float
+    ttl: float
+    update_time: Optional[int] = None
+
+    @property
+    def age(self) -> float:
+        return time.monotonic() - self.stored_at
+
+
+class PropertyCache:
+    """
+    Read-through property cache keyed by (did, siid, piid).
+
+    TTLs come from the property spec: writable settings (rw) change rarely and
+    mostly through our own set calls, which write through to the cache, so they
+    live for setting_ttl; read-only properties are sensor readings and live for
+    sensor_ttl. Entries past their TTL but within stale_window are still served
+    while a background refresh runs (stale-while-revalidate).
+    """
+
+    def __init__(
+            self,
+            sensor_ttl: float = 5.0,
+            setting_ttl: float = 60.0,
+            stale_window: float = 30.0,
+            max_workers: int = 2,
+    ):
+        self.sensor_ttl = sensor_ttl
+        self.setting_ttl = setting_ttl
+        self.stale_window = stale_window
+        self.max_workers = max_workers
+        self._entries: Dict[PropKey, CacheEntry] = {}
+        self._ttls: Dict[PropKey, float] = {}
+        self._refreshing: set = set()
+        self._lock = threading.Lock()
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self.hits = 0
+        self.stale_hits = 0
+        self.misses = 0
+        self.refreshes = 0
+
+    def ttl_for(self, prop) -> float:
+        """TTL for a DevProp, based on its access rights"""
+        return self.setting_ttl if "w" in prop.rw else self.sensor_ttl
+
+    def register(self, key: PropKey, prop) -> float:
+        ttl = self.ttl_for(prop)
+        self._ttls[key] = ttl
+        return ttl
+
+    def put(self, key: PropKey, value: Any, ttl: Optional[float] = None, update_time: Optional[int] = None):
+        if ttl is None:
+            ttl = self._ttls.get(key, self.sensor_ttl)
+        with self._lock:
+            self._entries[key] = CacheEntry(value, time.monotonic(), ttl, update_time)
+
+    def peek(self, key: PropKey) -> Optional[CacheEntry]:
+        with self._lock:
+            return self._entries.get(key)
+
+    def lookup(self, key: PropKey, max_age: Optional[float] = None) -> Optional[CacheEntry]:
+        """Return the entry if it is fresh enough, counting a hit or a miss"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and time.monotonic() - entry.stored_at <= (entry.ttl if max_age is None else max_age):
+                self.hits += 1
+                return entry
+            self.misses += 1
+            return None
+
+    def invalidate(self, did: Optional[str] = None, key: Optional[PropKey] = None):
+        with self._lock:
+            if key is not None:
+                self._entries.pop(key, None)
+            elif did is not None:
+                for k in [k for k in self._entries if k[0] == did]:
+                    del self._entries[k]
+            else:
+                self._entries.clear()
+
+    def get(self, key: PropKey, loader: Callable[[], Any], max_age: Optional[float] = None) -> Any:
+        """
+        Return the cached value for key, calling loader() on a miss.
+
+        With max_age the entry must be at most max_age seconds old and stale
+        values are never served; otherwise the key's TTL and stale window apply.
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                age = time.monotonic() - entry.stored_at
+                if age <= (entry.ttl if max_age is None else max_age):
+                    self.hits += 1
+                    return entry.value
+                if max_age is None and age <= entry.ttl + self.stale_window:
+                    self.stale_hits += 1
+                    self._schedule_refresh(key, loader)
+                    return entry.value
+            self.misses += 1
+        value = loader()
+        self.put(key, value)
+        return value
+
+    def _schedule_refresh(self, key: PropKey, loader: Callable[[], Any]):
+        # caller holds self._lock
+        if key in self._refreshing:
+            return
+        self._refreshing.add(key)
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="mijiaAPI-cache")
+        self._executor.submit(self._refresh, key, loader)
+
+    def _refresh(self, key: PropKey, loader: Callable[[], Any]):
+        try:
+            self.put(key, loader())
+            self.refreshes += 1
+        except Exception as e:
+            logger.debug(f"后台刷新属性缓存失败 {key}: {e}")
+        finally:
+            with self._lock:
+                self._refreshing.discard(key)
+
+    def store_results(self, results: Iterable[dict]):
+        """Fill the cache from prop/get results"""
+        for ret in results:
+            if ret is not None and ret.get("code", 0) == 0 and "value" in ret:
+                key = (str(ret["did"]), int(ret["siid"]), int(ret["piid"]))
+                self.put(key, ret["value"], update_time=ret.get("updateTime"))
+
+    def write_through(self, params: Iterable[dict], results: Iterable[dict]):
+        """Apply our own prop/set calls: store confirmed values, drop unconfirmed ones"""
+        for param, ret in zip(params, results):
+            key = (str(param["did"]), int(param["siid"]), int(param["piid"]))
+            if ret.get("code", 0) == 0:
+                self.put(key, param["value"])
+            else:
+                self.invalidate(key=key)
+
+    @property
+    def hit_ratio(self) -> float:
+        total = self.hits + self.stale_hits + self.misses
+        return (self.hits + self.stale_hits) / total if total else 0.0
+
+    def stats(self) -> dict:
+        return {
+            "size": len(self._entries),
+            "hits": self.hits,
+            "stale_hits": self.stale_hits,
+            "misses": self.misses,
+            "refreshes": self.refreshes,
+            "hit_ratio": self.hit_ratio,
+        }
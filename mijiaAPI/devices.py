@@ -1,22 +1,23 @@
 import json
-import re
+import threading
 import time
+import weakref
+from concurrent.futures import ThreadPoolExecutor
 from dataclasses import dataclass, field
 from pathlib import Path
 from typing import Dict, List, Optional, Union
 
-import requests
-
 from .apis import mijiaAPI
 from .errors import (
     DeviceActionError,
     DeviceGetError,
-    DeviceNotFoundError,
     DeviceSetError,
     GetDeviceInfoError,
-    MultipleDevicesFoundError,
 )
+from .freshness import DATASOURCES, DEFAULT_FRESHNESS, resolve_datasource
 from .logger import logger
+from .resolve import resolve_device
+from .specbundle import load_from_bundle
 from .version import version
 
 
@@ -153,6 +154,18 @@ class DevAction:
         return f"  {self.name}: {self.desc}"
 
 
+def _build_prop_list(dev_info: dict) -> Dict[str, DevProp]:
+    """Build name -> DevProp mapping, with underscore aliases for hyphenated names"""
+    prop_list = {}
+    for prop in dev_info.get("properties", []):
+        prop_obj = DevProp.from_dict(prop)
+        name = prop["name"]
+        prop_list[name] = prop_obj
+        if "-" in name:
+            prop_list[name.replace("-", "_")] = prop_obj
+    return prop_list
+
+
 class mijiaDevice():
     def __init__(
             self,
@@ -168,44 +181,43 @@ class mijiaDevice():
         if did is not None and dev_name is not None:
             logger.warning("同时提供了 did 和 dev_name 参数，将忽略 dev_name")
 
-        devices_list = self.api.get_devices_list()
-        if did is None:
-            matches = [device for device in devices_list if device["name"] == dev_name]
-            if not matches:
-                raise DeviceNotFoundError(dev_name)
-            else:
-                if len(matches) > 1:
-                    raise MultipleDevicesFoundError(f"找到多个 dev_name 为 '{dev_name}' 的设备，请使用 did 参数指定具体设备或者修改设备名称以区分")
-                did = matches[0]["did"]
-                model = matches[0]["model"]
-        else:
-            matches = [device for device in devices_list if device["did"] == did]
-            if not matches:
-                raise DeviceNotFoundError(did)
-            else:
-                if len(matches) > 1:
-                    raise MultipleDevicesFoundError(f"找到多个 did 为 '{did}' 的设备，未预想的问题，欢迎提交 issue: https://github.com/Do1e/mijia-api/issues")
-                dev_name = matches[0].get("name", None)
-                model = matches[0]["model"]
+        # 优先使用持久化的名称索引，未命中或有歧义时才请求设备列表
+        device = resolve_device(self.api, did=did, dev_name=dev_name if did is None else None)
+        did = device["did"]
+        model = device["model"]
+        dev_name = device.get("name", None)
 
         dev_info = get_device_info(model, cache_path=api.auth_data_path.parent)
         self.did = did
         self.model = model
         self.name = dev_name if dev_name is not None else dev_info["name"]
         self.sleep_time = sleep_time
+        # 属性名 -> 读取策略 ("cloud"/"device")，未指定的属性使用调用时传入的策略
+        self.prop_freshness: Dict[str, str] = {}
 
-        self.prop_list = {}
-        for prop in dev_info.get("properties", []):
-            prop_obj = DevProp.from_dict(prop)
-            name = prop["name"]
-            self.prop_list[name] = prop_obj
-            if "-" in name:
-                self.prop_list[name.replace("-", "_")] = prop_obj
+        self.spec_type = dev_info.get("type")
+        self.prop_list = _build_prop_list(dev_info)
+        self.action_list = {
+            act["name"]: DevAction.from_dict(act)
+            for act in dev_info.get("actions", [])
+        }
+        _register_live_device(self)
+
+    def rebind(self, dev_info: dict):
+        """
+        使用新的设备规格信息重建属性和操作列表
 
+        规格更新后 siid/piid 可能变化，因此同时丢弃属性缓存中该设备的条目。
+        """
+        self.spec_type = dev_info.get("type")
+        self.prop_list = _build_prop_list(dev_info)
         self.action_list = {
             act["name"]: DevAction.from_dict(act)
             for act in dev_info.get("actions", [])
         }
+        if self.api.prop_cache is not None:
+            self.api.prop_cache.invalidate(did=self.did)
+        logger.info(f"设备 {self.name} ({self.model}) 已更新到规格 {self.spec_type}")
 
     def __str__(self) -> str:
         prop_list_str = "\n".join(filter(None, (str(v) for k, v in self.prop_list.items() if "_" not in k)))
@@ -215,7 +227,7 @@ class mijiaDevice():
                 f"Actions:\n{action_list_str if action_list_str else 'No actions available'}")
 
 
-    def get(self, name: str) -> Union[bool, int, float, str]:
+    def _readable_method(self, name: str) -> dict:
         if name not in self.prop_list:
             raise ValueError(f"不支持的属性: {name}, 可用属性: {list(self.prop_list.keys())}")
         prop = self.prop_list[name]
@@ -223,13 +235,71 @@ class mijiaDevice():
             raise ValueError(f"属性 {name} 不可读取")
         method = prop.method.copy()
         method["did"] = self.did
-        result = self.api.get_devices_prop(method)
+        return method
+
+    def _is_device_read(self, freshness: Optional[Union[str, int]]) -> bool:
+        return resolve_datasource(freshness) != DATASOURCES[DEFAULT_FRESHNESS]
+
+    def get(
+            self,
+            name: str,
+            max_age: Optional[float] = None,
+            freshness: Optional[Union[str, int]] = None,
+    ) -> Union[bool, int, float, str]:
+        method = self._readable_method(name)
+        freshness = freshness or self.prop_freshness.get(name)
+        cache = self.api.prop_cache
+        if cache is None:
+            return self._fetch(name, method, freshness)
+        if self._is_device_read(freshness):
+            # 实时读取不使用缓存，但结果仍会写入缓存
+            max_age = 0
+        key = (self.did, method["siid"], method["piid"])
+        cache.register(key, self.prop_list[name])
+        return cache.get(key, lambda: self._fetch(name, method, freshness), max_age=max_age)
+
+    def _fetch(self, name: str, method: dict, freshness: Optional[Union[str, int]] = None) -> Union[bool, int, float, str]:
+        result = self.api.get_devices_prop(method, freshness=freshness)
         if result["code"] != 0:
             raise DeviceGetError(self.name, name, result["code"])
         time.sleep(self.sleep_time)
         logger.debug(f"获取属性: {self.name} -> {name}, 结果: {result}")
         return result["value"]
 
+    def get_many(
+            self,
+            names: List[str],
+            max_age: Optional[float] = None,
+            freshness: Optional[Union[str, int]] = None,
+    ) -> Dict[str, Union[bool, int, float, str]]:
+        """Read several properties with a single prop/get call (cached values are used where fresh)"""
+        values = {}
+        params = []
+        cache = self.api.prop_cache
+        for name in dict.fromkeys(names):
+            method = self._readable_method(name)
+            prop_freshness = freshness or self.prop_freshness.get(name)
+            if cache is not None:
+                key = (self.did, method["siid"], method["piid"])
+                cache.register(key, self.prop_list[name])
+                if not self._is_device_read(prop_freshness):
+                    entry = cache.lookup(key, max_age=max_age)
+                    if entry is not None:
+                        values[name] = entry.value
+                        continue
+            if prop_freshness is not None:
+                method["freshness"] = prop_freshness
+            params.append((name, method))
+        if params:
+            results = self.api.get_devices_prop([method for _, method in params])
+            for (name, _), result in zip(params, results):
+                if result["code"] != 0:
+                    raise DeviceGetError(self.name, name, result["code"])
+                values[name] = result["value"]
+            time.sleep(self.sleep_time)
+            logger.debug(f"批量获取属性: {self.name} -> {list(values)}, 结果: {results}")
+        return {name: values[name] for name in names}
+
     def set(self, name: str, value: Union[bool, int, float, str]):
         if name not in self.prop_list:
             raise ValueError(f"不支持的属性: {name}, 可用属性: {list(self.prop_list.keys())}")
@@ -251,6 +321,8 @@ class mijiaDevice():
         method = prop.method.copy()
         method["did"] = self.did
         method["value"] = value
+        if self.api.prop_cache is not None:
+            self.api.prop_cache.register((self.did, method["siid"], method["piid"]), prop)
         result = self.api.set_devices_prop(method)
         if result["code"] == 1:
             logger.warning(f"网关已经接收指令，无法判断是否设置成功: {self.name} -> {name}, 值: {value}")
@@ -259,6 +331,12 @@ class mijiaDevice():
         time.sleep(self.sleep_time)
         logger.debug(f"设置属性: {self.name} -> {name}, 值: {value}, 结果: {result}")
 
+    def watch(self, names: List[str], interval: float, callback):
+        """Subscribe to changes of names on this device, see mijiaAPI.watch()"""
+        watcher = self.api.property_watcher
+        watcher.add_device(self.did, self.prop_list)
+        return watcher.subscribe([(self.did, name) for name in names], interval, callback)
+
     def __getattr__(self, name: str) -> Union[bool, int, float, str]:
         if "prop_list" in self.__dict__ and name in self.prop_list:
             return self.get(name)
@@ -300,7 +378,30 @@ class mijiaDevice():
         logger.debug(f"执行动作: {self.name} -> {name}, 结果: {result}")
 
 
-def get_device_info(device_model: str, cache_path: Optional[Union[str, Path]] = None) -> dict:
+# 型号 -> 存活的 mijiaDevice 实例，规格更新时用于重新绑定
+_live_devices: Dict[str, "weakref.WeakSet[mijiaDevice]"] = {}
+_live_lock = threading.Lock()
+
+
+def _register_live_device(device: mijiaDevice):
+    with _live_lock:
+        _live_devices.setdefault(device.model, weakref.WeakSet()).add(device)
+
+
+def rebind_devices(device_model: str, dev_info: dict) -> int:
+    """重新绑定该型号所有存活的 mijiaDevice 实例，返回实例数量"""
+    with _live_lock:
+        devices = list(_live_devices.get(device_model, ()))
+    for device in devices:
+        device.rebind(dev_info)
+    return len(devices)
+
+
+def get_device_info(
+        device_model: str,
+        cache_path: Optional[Union[str, Path]] = None,
+        refresh: bool = False,
+) -> dict:
     """
     获取设备规格信息
 
@@ -312,11 +413,16 @@ def get_device_info(device_model: str, cache_path: Optional[Union[str, Path]] =
         cache_path (Optional[Union[str, Path]]): 可选，缓存目录路径。
             - 如果为 None，则不使用缓存
             - 如果指定，则将设备信息缓存到该目录下的 {device_model}.json 文件中
+            缓存未命中时，会先查找设备规格包（环境变量 MIJIA_SPEC_BUNDLE 指定的文件，
+            或缓存目录下的 spec_bundle.json.gz，见 export_spec_bundle()），仍未找到才请求网络
+        refresh (bool): 为 True 时忽略缓存和规格包，重新从网络获取并更新缓存，默认 False
 
     返回值:
         dict: 设备规格信息字典，包含以下字段：
             - name (str): 设备名称
             - model (str): 设备型号
+            - type (str): 规格版本 URN，用于检测规格更新（旧版本缓存中可能没有此字段）
+            - fetch_time (int): 从网络获取规格的时间戳，仅写入缓存的结果包含此字段
             - properties (list): 设备属性列表，每个属性包含以下字段：
                 - name (str): 属性名称
                 - description (str): 属性描述
@@ -339,89 +445,104 @@ def get_device_info(device_model: str, cache_path: Optional[Union[str, Path]] =
         >>> print(info['name'])  # 输出设备名称
         >>> print(info['properties'][0]['name'])  # 输出第一个属性的名称
     """
-    if cache_path is not None:
+    if cache_path is not None and not refresh:
         cache_file = Path(cache_path) / f"{device_model}.json"
         if cache_file.exists():
             logger.debug(f"从缓存加载设备信息: {cache_file}")
             with cache_file.open("r", encoding="utf-8") as f:
                 return json.load(f)
+    if not refresh:
+        bundled = load_from_bundle(device_model, cache_path)
+        if bundled is not None:
+            return bundled
+    # 规格缺失时才加载 requests 和页面解析器
+    import requests
+
+    from .specparse import parse_spec_page
+
     response = requests.get(device_url + device_model, headers={
         "User-Agent": f"mijiaAPI/{version}"
     })
     if response.status_code != 200:
         raise GetDeviceInfoError(device_model)
-    content = re.search(r"data-page=\"(.*?)\">", response.text)
-    if content is None:
+    try:
+        result = parse_spec_page(response.text, device_model)
+    except (ValueError, KeyError, TypeError):
         raise GetDeviceInfoError(device_model)
-    content = content.group(1)
-    content = json.loads(content.replace("&quot;", "\""))
-
-    if content["props"]["product"]:
-        name = content["props"]["product"]["name"]
-        model = content["props"]["product"]["model"]
-    else:
-        name = content["props"]["spec"]["name"]
-        model = device_model
-    result = {
-        "name": name,
-        "model": model,
-        "properties": [],
-        "actions": []
-    }
-    services = content["props"]["spec"]["services"]
-
-    properties_name = []
-    actions_name = []
-    for siid in services:
-        if "properties" in services[siid]:
-            for piid in services[siid]["properties"]:
-                prop = services[siid]["properties"][piid]
-                if prop["format"].startswith("int"):
-                    prop_type = "int"
-                elif prop["format"].startswith("uint"):
-                    prop_type = "uint"
-                else:
-                    prop_type = prop["format"]
-                item = {
-                    "name": prop["name"],
-                    "description": f"{prop.get('description', '')} / {prop.get('desc_zh_cn', '')}",
-                    "type": prop_type,
-                    "rw": "".join([
-                        "r" if "read" in prop["access"] else "",
-                        "w" if "write" in prop["access"] else ""
-                    ]),
-                    "unit": prop.get("unit", None),
-                    "range": prop.get("value-range", None),
-                    "value-list": prop.get("value-list", None),
-                    "method": {
-                        "siid": int(siid),
-                        "piid": int(piid)
-                    }
-                }
-                if item["name"] in properties_name:
-                    item["name"] = f"{services[siid]['name']}-{item['name']}"
-                properties_name.append(item["name"])
-                result["properties"].append({k: None if v == "none" else v for k, v in item.items()})
-        if "actions" in services[siid]:
-            for aiid in services[siid]["actions"]:
-                act = services[siid]["actions"][aiid]
-                if act["name"] in actions_name:
-                    act["name"] = f"{services[siid]['name']}-{act['name']}"
-                actions_name.append(act["name"])
-                result["actions"].append({
-                    "name": act["name"],
-                    "description": f"{act.get('description', '')} / {act.get('desc_zh_cn', '')}",
-                    "method": {
-                        "siid": int(siid),
-                        "aiid": int(aiid)
-                    }
-                })
 
     if cache_path is not None:
-        cache_path = Path(cache_path)
-        cache_path.mkdir(parents=True, exist_ok=True)
-        cache_file = cache_path / f"{device_model}.json"
-        logger.debug(f"缓存设备信息到: {cache_file}")
-        with cache_file.open("w", encoding="utf-8") as f:
-            json.dump(result, f, indent=2, ensure_ascii=False)
+        _save_device_info(cache_path, device_model, result)
     return result
+
+
+def _save_device_info(cache_path: Union[str, Path], device_model: str, result: dict):
+    cache_path = Path(cache_path)
+    cache_path.mkdir(parents=True, exist_ok=True)
+    cache_file = cache_path / f"{device_model}.json"
+    result.setdefault("fetch_time", int(time.time()))
+    logger.debug(f"缓存设备信息到: {cache_file}")
+    with cache_file.open("w", encoding="utf-8") as f:
+        json.dump(result, f, indent=2, ensure_ascii=False)
+
+
+def prefetch_device_info(
+        device_models: List[str],
+        cache_path: Union[str, Path],
+        max_workers: int = 8,
+        processes: Optional[int] = None,
+) -> Dict[str, Optional[dict]]:
+    """
+    批量预取设备规格信息
+
+    跳过已缓存的型号，并发下载其余型号的规格页面，批量解析后写入缓存目录。
+
+    参数:
+        device_models (List[str]): 设备型号列表
+        cache_path (Union[str, Path]): 缓存目录路径
+        max_workers (int): 并发下载的线程数，默认 8
+        processes (Optional[int]): 解析页面的进程数，默认 None 在当前进程中解析，大于 1 时使用进程池
+
+    返回值:
+        Dict[str, Optional[dict]]: 型号 -> 设备规格信息，获取失败的型号为 None
+    """
+    results: Dict[str, Optional[dict]] = {}
+    missing = []
+    for device_model in dict.fromkeys(device_models):
+        cache_file = Path(cache_path) / f"{device_model}.json"
+        if cache_file.exists():
+            with cache_file.open("r", encoding="utf-8") as f:
+                results[device_model] = json.load(f)
+        else:
+            missing.append(device_model)
+    if not missing:
+        return results
+    import requests
+
+    from .specparse import parse_spec_pages
+
+    def download(device_model: str) -> Optional[str]:
+        try:
+            response = requests.get(device_url + device_model, headers={
+                "User-Agent": f"mijiaAPI/{version}"
+            }, timeout=30)
+        except requests.exceptions.RequestException as e:
+            logger.warning(f"下载设备规格页面失败 {device_model}: {e}")
+            return None
+        if response.status_code != 200:
+            logger.warning(f"下载设备规格页面失败 {device_model}: HTTP {response.status_code}")
+            return None
+        return response.text
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        pages = dict(zip(missing, executor.map(download, missing)))
+    parsed = parse_spec_pages({m: page for m, page in pages.items() if page is not None}, processes=processes)
+    for device_model in missing:
+        info = parsed.get(device_model)
+        if isinstance(info, dict):
+            _save_device_info(cache_path, device_model, info)
+            results[device_model] = info
+        else:
+            if info is not None:
+                logger.warning(f"解析设备规格页面失败 {device_model}: {info}")
+            results[device_model] = None
+    return results
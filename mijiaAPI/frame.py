@@ -0,0 +1,195 @@
+import time
+from pathlib import Path
+from typing import TYPE_CHECKING, Dict, Iterable, List, Optional, Sequence, Tuple, Union
+
+from .statistics import StatisticsStore, parse_stat_value
+
+
+if TYPE_CHECKING:
+    import numpy as np
+
+RESAMPLE_FREQS = ("hour", "day", "week", "month")
+AGGREGATIONS = ("sum", "mean", "min", "max")
+
+
+def _numpy():
+    try:
+        import numpy
+    except ImportError:
+        raise ImportError("StatisticsFrame 需要 numpy，请使用 pip install mijiaAPI[frame] 或 pip install numpy 安装") from None
+    return numpy
+
+
+def _local_utc_offset() -> int:
+    return time.localtime().tm_gmtoff
+
+
+class StatisticsFrame:
+    """
+    Statistics of several devices aligned on one time axis.
+
+    times is a sorted int64 array of bucket timestamps shared by all rows and
+    values a float64 (rows, times) matrix with nan where a device has no data.
+    Resampling and rollups are done with numpy reductions over whole arrays;
+    no per-point Python objects are created.
+    """
+
+    def __init__(self, labels: Sequence[str], times: "np.ndarray", values: "np.ndarray"):
+        np = _numpy()
+        self.labels = [str(label) for label in labels]
+        self.times = np.asarray(times, dtype=np.int64)
+        self.values = np.asarray(values, dtype=np.float64).reshape(len(self.labels), len(self.times))
+        self._rows = {label: i for i, label in enumerate(self.labels)}
+
+    def __len__(self) -> int:
+        return len(self.labels)
+
+    def __getitem__(self, label: str) -> "np.ndarray":
+        return self.values[self._rows[str(label)]]
+
+    def __repr__(self) -> str:
+        return f"StatisticsFrame({len(self.labels)} rows x {len(self.times)} times)"
+
+    @classmethod
+    def from_series(cls, series: Dict[str, Tuple[Sequence[int], Sequence[float]]]) -> "StatisticsFrame":
+        """由 did -> (times, values) 构建，各设备的时间点取并集对齐"""
+        np = _numpy()
+        columns = [(np.asarray(t, dtype=np.int64), np.asarray(v, dtype=np.float64)) for t, v in series.values()]
+        times = np.unique(np.concatenate([t for t, _ in columns])) if columns else np.empty(0, dtype=np.int64)
+        values = np.full((len(columns), len(times)), np.nan)
+        for row, (t, v) in enumerate(columns):
+            values[row, np.searchsorted(times, t)] = v
+        return cls(list(series), times, values)
+
+    @classmethod
+    def from_store(
+            cls,
+            store: StatisticsStore,
+            dids: Iterable[str],
+            key: str,
+            data_type: str,
+            time_start: int,
+            time_end: int,
+            api=None,
+    ) -> "StatisticsFrame":
+        """
+        从 StatisticsStore 构建
+
+        传入 api 时先获取本地缺失的窗口，否则只使用本地数据。
+        存储中的 array 直接作为 numpy 数组的缓冲区，不逐点转换。
+        """
+        np = _numpy()
+        series = {}
+        for did in dids:
+            if api is not None:
+                times, values = store.fetch(api, did, key, data_type, time_start, time_end)
+            else:
+                times, values = store.query(did, key, data_type, time_start, time_end)
+            series[str(did)] = (np.frombuffer(times, dtype=np.int64), np.frombuffer(values, dtype=np.float64))
+        return cls.from_series(series)
+
+    @classmethod
+    def from_statistics(cls, results: Dict[str, List[dict]]) -> "StatisticsFrame":
+        """由 did -> get_statistics() 原始结果构建"""
+        np = _numpy()
+        series = {}
+        for did, items in results.items():
+            times = np.fromiter((int(item["time"]) for item in items), dtype=np.int64, count=len(items))
+            values = np.fromiter((parse_stat_value(item.get("value")) for item in items), dtype=np.float64,
+                                 count=len(items))
+            order = np.argsort(times, kind="stable")
+            series[did] = (times[order], values[order])
+        return cls.from_series(series)
+
+    def bucket_starts(self, freq: str, utc_offset: Optional[int] = None) -> "np.ndarray":
+        """每个时间点所在的 hour/day/week/month 周期的开始时间戳，按本地时间划分 (周一为一周的开始)"""
+        np = _numpy()
+        if freq not in RESAMPLE_FREQS:
+            raise ValueError(f"不支持的重采样周期: {freq}, 可选值: {RESAMPLE_FREQS}")
+        offset = _local_utc_offset() if utc_offset is None else utc_offset
+        local = self.times + offset
+        if freq == "hour":
+            starts = local // 3600 * 3600
+        elif freq == "day":
+            starts = local // 86400 * 86400
+        elif freq == "week":
+            # 1970-01-01 是周四，向前偏移 3 天让周一成为每周的第一天
+            starts = ((local // 86400 + 3) // 7 * 7 - 3) * 86400
+        else:
+            months = local.astype("datetime64[s]").astype("datetime64[M]")
+            starts = months.astype("datetime64[s]").astype(np.int64)
+        return starts - offset
+
+    def resample(self, freq: str, how: str = "sum", utc_offset: Optional[int] = None) -> "StatisticsFrame":
+        """
+        按 hour/day/week/month 重新聚合
+
+        参数:
+            freq (str): 重采样周期
+            how (str): 聚合方式，sum、mean、min 或 max，忽略 nan，整个周期都没有数据时为 nan
+            utc_offset (Optional[int]): 划分周期使用的 UTC 偏移（秒），默认本地时区
+        """
+        np = _numpy()
+        if how not in AGGREGATIONS:
+            raise ValueError(f"不支持的聚合方式: {how}, 可选值: {AGGREGATIONS}")
+        if len(self.times) == 0:
+            return StatisticsFrame(self.labels, self.times, self.values)
+        starts = self.bucket_starts(freq, utc_offset)
+        # times 有序，同一周期的点相邻，可直接用 reduceat 按段聚合
+        edges = np.flatnonzero(np.r_[True, starts[1:] != starts[:-1]])
+        present = ~np.isnan(self.values)
+        counts = np.add.reduceat(present, edges, axis=1)
+        if how in ("sum", "mean"):
+            result = np.add.reduceat(np.where(present, self.values, 0.0), edges, axis=1)
+            if how == "mean":
+                with np.errstate(invalid="ignore", divide="ignore"):
+                    result = result / counts
+        else:
+            reducer = np.fmin if how == "min" else np.fmax
+            result = reducer.reduceat(self.values, edges, axis=1)
+        result[counts == 0] = np.nan
+        return StatisticsFrame(self.labels, starts[edges], result)
+
+    def rollup(self, groups: Dict[str, Iterable[str]]) -> "StatisticsFrame":
+        """按分组 (名称 -> did 列表) 求和，组内所有设备都没有数据的时间点为 nan，不在本表中的 did 被忽略"""
+        np = _numpy()
+        values = np.full((len(groups), len(self.times)), np.nan)
+        for row, members in enumerate(groups.values()):
+            rows = [self._rows[str(did)] for did in members if str(did) in self._rows]
+            if rows:
+                block = self.values[rows]
+                summed = np.nansum(block, axis=0)
+                summed[np.isnan(block).all(axis=0)] = np.nan
+                values[row] = summed
+        return StatisticsFrame(list(groups), self.times, values)
+
+    def rollup_rooms(self, homes: List[dict]) -> "StatisticsFrame":
+        """按房间求和，homes 为 get_homes_list() 的结果，行名为 "家庭/房间" """
+        return self.rollup({
+            f"{home['name']}/{room['name']}": room.get("dids") or []
+            for home in homes for room in home.get("roomlist") or []
+        })
+
+    def rollup_homes(self, homes: List[dict]) -> "StatisticsFrame":
+        """按家庭求和，homes 为 get_homes_list() 的结果"""
+        return self.rollup({
+            home["name"]: [did for room in home.get("roomlist") or [] for did in room.get("dids") or []]
+            for home in homes
+        })
+
+    def totals(self) -> Dict[str, float]:
+        """每行所有时间点之和 (忽略 nan)"""
+        np = _numpy()
+        return dict(zip(self.labels, np.nansum(self.values, axis=1).tolist()))
+
+    def save(self, path: Union[str, Path]):
+        """保存为未压缩的 .npz 二进制文件"""
+        np = _numpy()
+        with open(path, "wb") as f:
+            np.savez(f, labels=np.array(self.labels, dtype=str), times=self.times, values=self.values)
+
+    @classmethod
+    def load(cls, path: Union[str, Path]) -> "StatisticsFrame":
+        np = _numpy()
+        with np.load(path, allow_pickle=False) as data:
+            return cls(data["labels"].tolist(), data["times"], data["values"])
@@ -0,0 +1,79 @@
+import threading
+import time
+from typing import Dict, Iterable, Optional, Union
+
+
+# /miotspec/prop/get 的 datasource 取值
+FRESHNESS_CLOUD = "cloud"      # 读取云端缓存的最近上报值，开销小，适合后台看板轮询
+FRESHNESS_DEVICE = "device"    # 由云端向设备实时查询，适合打开详情页或控制决策前读取
+
+DATASOURCES = {
+    FRESHNESS_CLOUD: 1,
+    FRESHNESS_DEVICE: 2,
+}
+DEFAULT_FRESHNESS = FRESHNESS_CLOUD
+
+
+def resolve_datasource(freshness: Optional[Union[str, int]]) -> int:
+    """Map a freshness tier name (or a raw datasource int) to the datasource value"""
+    if freshness is None:
+        return DATASOURCES[DEFAULT_FRESHNESS]
+    if isinstance(freshness, int):
+        return freshness
+    if freshness not in DATASOURCES:
+        raise ValueError(f"无效的读取策略: {freshness}, 可选值: {', '.join(DATASOURCES)}")
+    return DATASOURCES[freshness]
+
+
+def tier_name(datasource: int) -> str:
+    for name, value in DATASOURCES.items():
+        if value == datasource:
+            return name
+    return str(datasource)
+
+
+class FreshnessStats:
+    """Per-tier read counters and staleness (now - updateTime) of returned values"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._tiers: Dict[str, dict] = {}
+
+    def record(self, datasource: int, results: Iterable[dict]):
+        now = time.time()
+        name = tier_name(datasource)
+        with self._lock:
+            tier = self._tiers.setdefault(name, {
+                "requests": 0, "reads": 0, "errors": 0,
+                "stale_samples": 0, "stale_sum": 0.0, "stale_max": 0.0,
+            })
+            tier["requests"] += 1
+            for ret in results:
+                tier["reads"] += 1
+                if ret.get("code", 0) != 0:
+                    tier["errors"] += 1
+                    continue
+                update_time = ret.get("updateTime")
+                if update_time:
+                    staleness = max(0.0, now - update_time)
+                    tier["stale_samples"] += 1
+                    tier["stale_sum"] += staleness
+                    tier["stale_max"] = max(tier["stale_max"], staleness)
+
+    def snapshot(self) -> Dict[str, dict]:
+        with self._lock:
+            result = {}
+            for name, tier in self._tiers.items():
+                samples = tier["stale_samples"]
+                result[name] = {
+                    "requests": tier["requests"],
+                    "reads": tier["reads"],
+                    "errors": tier["errors"],
+                    "avg_staleness": tier["stale_sum"] / samples if samples else None,
+                    "max_staleness": tier["stale_max"] if samples else None,
+                }
+            return result
+
+    def reset(self):
+        with self._lock:
+            self._tiers.clear()
@@ -0,0 +1,545 @@
+import hmac
+import http.client
+import json
+import os
+import secrets
+import socket
+import socketserver
+import threading
+import time
+from concurrent.futures import Future
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple, Union
+from urllib.parse import urlparse
+
+from .apis import mijiaAPI
+from .batch import BatchRunner, DeviceResolver, iter_windows, read_commands
+from .freshness import DATASOURCES, DEFAULT_FRESHNESS, resolve_datasource
+from .logger import logger
+from .specsync import SpecRevalidator
+from .version import version
+
+
+GATEWAY_ENV = "MIJIA_GATEWAY"
+TOKEN_ENV = "MIJIA_GATEWAY_TOKEN"
+TOKEN_HEADER = "X-Mijia-Gateway-Token"
+TOKEN_FILENAME = "gateway.token"
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 8751
+DEFAULT_ADDRESS = f"http://{DEFAULT_HOST}:{DEFAULT_PORT}"
+LOOPBACK_HOSTS = frozenset({"127.0.0.1", "localhost", "::1"})
+
+# 允许客户端通过 /call/<method> 调用的 mijiaAPI 方法
+REMOTE_METHODS = (
+    "get_homes_list",
+    "get_devices_list",
+    "get_shared_devices_list",
+    "get_scenes_list",
+    "run_scene",
+    "get_consumable_items",
+    "get_devices_prop",
+    "set_devices_prop",
+    "run_action",
+    "get_statistics",
+)
+
+
+class GatewayError(Exception):
+    """The gateway is unreachable, or a call through it failed"""
+
+
+def gateway_token_path(auth_data_path: Optional[Union[str, Path]] = None) -> Path:
+    """
+    网关令牌文件的路径，与认证文件在同一目录
+
+    参数:
+        auth_data_path (Optional[Union[str, Path]]): 认证文件或其所在目录，默认 ~/.config/mijia-api/auth.json
+
+    返回值:
+        Path: 令牌文件路径
+    """
+    if auth_data_path is None:
+        return Path.home() / ".config" / "mijia-api" / TOKEN_FILENAME
+    path = Path(auth_data_path)
+    return (path if path.is_dir() else path.parent) / TOKEN_FILENAME
+
+
+def _write_token(path: Path) -> str:
+    token = secrets.token_urlsafe(32)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+    with os.fdopen(fd, "w") as f:
+        f.write(token)
+    # 文件已存在时 os.open 不修改权限
+    os.chmod(path, 0o600)
+    return token
+
+
+def _host_name(host: str) -> str:
+    """去掉 Host 请求头中的端口，[::1]:8751 -> ::1"""
+    if host.startswith("["):
+        return host[1:host.find("]")] if "]" in host else host
+    return host.rsplit(":", 1)[0] if host.count(":") == 1 else host
+
+
+class ReadCoalescer:
+    """
+    prop/get through one shared PropertyCache, with one in-flight read per key.
+
+    Cloud-tier reads are answered from the cache while fresh. Everything else
+    is fetched, but a key that another client is already fetching is not asked
+    for again: the second caller waits for the first caller's result.
+    """
+
+    def __init__(self, api: mijiaAPI):
+        self.api = api
+        if api.prop_cache is None:
+            api.enable_prop_cache()
+        self._inflight: Dict[Tuple[str, int, int, int], Future] = {}
+        self._lock = threading.Lock()
+        self.coalesced = 0
+
+    def read(self, data: Union[list, dict], freshness: Optional[Union[str, int]] = None) -> Union[list, dict]:
+        params = [data] if isinstance(data, dict) else list(data)
+        results: List[Optional[dict]] = [None] * len(params)
+        waiting: List[Tuple[int, Future]] = []
+        own: List[Tuple[int, dict, Future]] = []
+        cloud = DATASOURCES[DEFAULT_FRESHNESS]
+        for i, param in enumerate(params):
+            did, siid, piid = str(param["did"]), int(param["siid"]), int(param["piid"])
+            datasource = resolve_datasource(param.get("freshness", freshness))
+            if datasource == cloud:
+                entry = self.api.prop_cache.lookup((did, siid, piid))
+                if entry is not None:
+                    results[i] = {"did": did, "siid": siid, "piid": piid, "code": 0,
+                                  "value": entry.value, "updateTime": entry.update_time}
+                    continue
+            key = (did, siid, piid, datasource)
+            with self._lock:
+                fut = self._inflight.get(key)
+                if fut is not None:
+                    self.coalesced += 1
+                    waiting.append((i, fut))
+                    continue
+                fut = Future()
+                self._inflight[key] = fut
+            own.append((i, {"did": did, "siid": siid, "piid": piid, "freshness": datasource}, fut))
+
+        if own:
+            try:
+                ret = self.api.get_devices_prop([param for _, param, _ in own])
+                for (i, _, fut), item in zip(own, ret):
+                    results[i] = item
+                    fut.set_result(item)
+            except Exception as e:
+                for _, _, fut in own:
+                    if not fut.done():
+                        fut.set_exception(e)
+                raise
+            finally:
+                with self._lock:
+                    for _, param, _ in own:
+                        self._inflight.pop((param["did"], param["siid"], param["piid"], param["freshness"]), None)
+        for i, fut in waiting:
+            results[i] = fut.result()
+        return results[0] if isinstance(data, dict) else results
+
+
+class Gateway:
+    """
+    One warm, logged-in mijiaAPI shared by every local client.
+
+    Holds the did/name index and spec tables (DeviceResolver), the property
+    cache and the read coalescer, so a client request costs one local round
+    trip plus at most one cloud call.
+    """
+
+    def __init__(self, api: mijiaAPI, index_ttl: float = 300, max_workers: int = 4):
+        self.api = api
+        self.max_workers = max_workers
+        self.reader = ReadCoalescer(api)
+        self.resolver = DeviceResolver(api, ttl=index_ttl)
+        self.started = time.time()
+        self.requests = 0
+
+    def call(self, method: str, args: list, kwargs: dict) -> Any:
+        if method not in REMOTE_METHODS:
+            raise GatewayError(f"不支持的方法: {method}")
+        self.requests += 1
+        if method == "get_devices_prop":
+            return self.reader.read(*args, **kwargs)
+        if method in ("get_devices_list", "get_shared_devices_list") and not args and not kwargs:
+            # 由常驻的设备索引提供，不再请求云端
+            own, shared = self.resolver.device_lists()
+            return own if method == "get_devices_list" else shared
+        return getattr(self.api, method)(*args, **kwargs)
+
+    def batch(self, lines: Iterable[str], emit) -> Dict[str, int]:
+        self.requests += 1
+        runner = BatchRunner(self.api, emit, max_workers=self.max_workers,
+                             resolver=self.resolver, reader=self.reader.read)
+        return runner.run(read_commands(lines))
+
+    def health(self) -> dict:
+        return {
+            "ok": True,
+            "version": version,
+            "available": True,
+            "uptime": time.time() - self.started,
+            "auth_data_path": str(self.api.auth_data_path),
+        }
+
+    def stats(self) -> dict:
+        return {
+            "requests": self.requests,
+            "coalesced_reads": self.reader.coalesced,
+            "cache": self.api.prop_cache.stats(),
+            "freshness": self.api.freshness_stats.snapshot(),
+        }
+
+
+class _GatewayHandler(BaseHTTPRequestHandler):
+    server_version = f"mijiaAPI-gateway/{version}"
+
+    @property
+    def gateway(self) -> Gateway:
+        return self.server.gateway
+
+    def log_message(self, format, *args):
+        logger.debug(f"gateway: {format % args}")
+
+    def _send_json(self, data: Any, status: int = 200):
+        body = json.dumps(data, ensure_ascii=False, default=str).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _read_body(self) -> bytes:
+        length = int(self.headers.get("Content-Length") or 0)
+        return self.rfile.read(length) if length else b""
+
+    def _authorized(self, post: bool) -> bool:
+        """
+        Reject anything a web page could send: browser requests carry an
+        Origin, DNS rebinding shows up as a foreign Host, and a cross-site
+        "simple" POST cannot set Content-Type: application/json or a custom
+        header. Every request must also present the token from serve().
+        """
+        if self.headers.get("Origin") is not None:
+            self._send_json({"ok": False, "error": "不接受跨站请求"}, 403)
+            return False
+        if _host_name(self.headers.get("Host") or "") not in self.server.allowed_hosts:
+            self._send_json({"ok": False, "error": "Host 不是本机地址"}, 403)
+            return False
+        content_type = (self.headers.get("Content-Type") or "").split(";")[0].strip().lower()
+        if post and content_type != "application/json":
+            self._send_json({"ok": False, "error": "Content-Type 必须为 application/json"}, 415)
+            return False
+        token = self.server.token
+        if not token or not hmac.compare_digest(self.headers.get(TOKEN_HEADER) or "", token):
+            self._send_json({"ok": False, "error": "网关令牌无效"}, 403)
+            return False
+        return True
+
+    def do_GET(self):
+        if not self._authorized(post=False):
+            return
+        if self.path == "/health":
+            self._send_json(self.gateway.health())
+        elif self.path == "/stats":
+            self._send_json(self.gateway.stats())
+        else:
+            self._send_json({"ok": False, "error": f"未知路径: {self.path}"}, 404)
+
+    def do_POST(self):
+        if not self._authorized(post=True):
+            return
+        if self.path.startswith("/call/"):
+            self._handle_call(self.path[len("/call/"):])
+        elif self.path == "/batch":
+            self._handle_batch()
+        else:
+            self._send_json({"ok": False, "error": f"未知路径: {self.path}"}, 404)
+
+    def _handle_call(self, method: str):
+        try:
+            payload = json.loads(self._read_body() or b"{}")
+            result = self.gateway.call(method, payload.get("args", []), payload.get("kwargs", {}))
+        except GatewayError as e:
+            self._send_json({"ok": False, "error": str(e)}, 404)
+        except Exception as e:
+            self._send_json({"ok": False, "error": str(e), "type": type(e).__name__})
+        else:
+            self._send_json({"ok": True, "result": result})
+
+    def _handle_batch(self):
+        lines = self._read_body().decode("utf-8").splitlines()
+        # 不设置 Content-Length，逐行写出结果，写完后关闭连接
+        self.send_response(200)
+        self.send_header("Content-Type", "application/x-ndjson; charset=utf-8")
+        self.end_headers()
+        lock = threading.Lock()
+
+        def emit(result: dict):
+            line = json.dumps(result, ensure_ascii=False, default=str) + "\n"
+            with lock:
+                self.wfile.write(line.encode("utf-8"))
+                self.wfile.flush()
+
+        self.gateway.batch(lines, emit)
+        self.close_connection = True
+
+
+class _GatewayServerMixin:
+    daemon_threads = True
+    gateway: Optional[Gateway] = None
+    # 请求必须携带的令牌，为空时拒绝所有请求
+    token = ""
+    allowed_hosts = LOOPBACK_HOSTS
+
+
+class _TCPGatewayServer(_GatewayServerMixin, ThreadingHTTPServer):
+    pass
+
+
+class _UnixGatewayServer(
+    _GatewayServerMixin, socketserver.ThreadingMixIn, socketserver.UnixStreamServer
+):
+    pass
+
+
+def serve(
+        api: mijiaAPI,
+        host: str = DEFAULT_HOST,
+        port: int = DEFAULT_PORT,
+        socket_path: Optional[Union[str, Path]] = None,
+        index_ttl: float = 300,
+        max_workers: int = 4,
+        token_path: Optional[Union[str, Path]] = None,
+        revalidate_specs: bool = False,
+):
+    """
+    启动常驻网关，阻塞直到被中断
+
+    网关持有一个已登录的 mijiaAPI、设备索引、设备规格和属性缓存，
+    客户端 (GatewayClient / RemoteAPI / 命令行 --gateway) 通过本地 HTTP 或 Unix socket 调用。
+    启动时生成随机令牌写入仅当前用户可读的令牌文件，每个请求都必须在请求头中携带该令牌；
+    带 Origin 头、Host 不是本机地址或 POST 的 Content-Type 不是 application/json 的请求会被拒绝。
+
+    参数:
+        api (mijiaAPI): 已登录的 mijiaAPI 实例
+        host (str): 监听地址，默认 127.0.0.1
+        port (int): 监听端口，默认 8751
+        socket_path (Optional[Union[str, Path]]): 可选，Unix socket 路径，指定时忽略 host 和 port
+        index_ttl (float): 设备列表和场景列表的刷新间隔（秒），默认 300
+        max_workers (int): 每个批量请求的并发请求数，默认 4
+        token_path (Optional[Union[str, Path]]): 令牌文件路径，默认与认证文件在同一目录的 gateway.token
+        revalidate_specs (bool): 是否在后台定期检查设备规格更新 (见 SpecRevalidator)，默认 False
+    """
+    gateway = Gateway(api, index_ttl=index_ttl, max_workers=max_workers)
+    token_path = Path(token_path) if token_path is not None else gateway_token_path(api.auth_data_path)
+    token = _write_token(token_path)
+    revalidator = None
+    if revalidate_specs:
+        revalidator = SpecRevalidator(api.auth_data_path.parent)
+        revalidator.start()
+    if socket_path is not None:
+        socket_path = Path(socket_path)
+        if socket_path.exists():
+            socket_path.unlink()
+        server = _UnixGatewayServer(str(socket_path), _GatewayHandler)
+        os.chmod(socket_path, 0o600)
+        address = f"unix://{socket_path}"
+    else:
+        if host not in ("127.0.0.1", "localhost", "::1"):
+            logger.warning(f"网关监听非本机地址 {host}，任何能访问该地址的人都可以控制你的设备")
+        server = _TCPGatewayServer((host, port), _GatewayHandler)
+        server.allowed_hosts = LOOPBACK_HOSTS | {host}
+        address = f"http://{host}:{port}"
+    server.gateway = gateway
+    server.token = token
+    logger.info(f"网关已启动: {address}，客户端可设置环境变量 {GATEWAY_ENV}={address}，令牌文件: {token_path}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        if revalidator is not None:
+            revalidator.stop()
+        server.server_close()
+        token_path.unlink(missing_ok=True)
+        if socket_path is not None:
+            socket_path.unlink(missing_ok=True)
+
+
+class _UnixHTTPConnection(http.client.HTTPConnection):
+    def __init__(self, path: str, timeout: float):
+        super().__init__("localhost", timeout=timeout)
+        self.socket_path = path
+
+    def connect(self):
+        self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.sock.settimeout(self.timeout)
+        self.sock.connect(self.socket_path)
+
+
+class GatewayClient:
+    """
+    Thin client for a running gateway.
+
+    address is http://host:port or unix:///path/to.sock; it defaults to
+    $MIJIA_GATEWAY, then http://127.0.0.1:8751. The token defaults to
+    $MIJIA_GATEWAY_TOKEN, then the token file written by serve(), which is
+    re-read on every request so a restarted gateway is picked up.
+    """
+
+    def __init__(self, address: Optional[str] = None, timeout: float = 60, token: Optional[str] = None,
+                 token_path: Optional[Union[str, Path]] = None):
+        self.address = address or os.getenv(GATEWAY_ENV) or DEFAULT_ADDRESS
+        self.timeout = timeout
+        self.token = token or os.getenv(TOKEN_ENV)
+        self.token_path = Path(token_path) if token_path is not None else gateway_token_path()
+
+    def _token(self) -> str:
+        if self.token:
+            return self.token
+        try:
+            return self.token_path.read_text().strip()
+        except OSError as e:
+            raise GatewayError(f"无法读取网关令牌 {self.token_path}: {e}")
+
+    def _connection(self) -> http.client.HTTPConnection:
+        url = urlparse(self.address)
+        if url.scheme == "unix":
+            return _UnixHTTPConnection(url.path, self.timeout)
+        if url.scheme != "http":
+            raise GatewayError(f"不支持的网关地址: {self.address}")
+        return http.client.HTTPConnection(url.hostname, url.port or DEFAULT_PORT, timeout=self.timeout)
+
+    def _request(self, method: str, path: str, body: Optional[bytes] = None):
+        headers = {"Content-Type": "application/json", TOKEN_HEADER: self._token()}
+        conn = self._connection()
+        try:
+            conn.request(method, path, body=body, headers=headers)
+            response = conn.getresponse()
+        except OSError as e:
+            conn.close()
+            raise GatewayError(f"无法连接网关 {self.address}: {e}")
+        if response.status in (403, 415):
+            try:
+                error = json.loads(response.read()).get("error")
+            except ValueError:
+                error = response.reason
+            finally:
+                conn.close()
+            raise GatewayError(f"网关拒绝请求: {error}")
+        return conn, response
+
+    def _json(self, method: str, path: str, payload: Optional[dict] = None) -> dict:
+        body = json.dumps(payload, ensure_ascii=False).encode("utf-8") if payload is not None else None
+        conn, response = self._request(method, path, body)
+        try:
+            return json.loads(response.read())
+        finally:
+            conn.close()
+
+    def health(self) -> dict:
+        return self._json("GET", "/health")
+
+    def stats(self) -> dict:
+        return self._json("GET", "/stats")
+
+    def call(self, method: str, *args, **kwargs) -> Any:
+        data = self._json("POST", f"/call/{method}", {"args": list(args), "kwargs": kwargs})
+        if not data.get("ok"):
+            raise GatewayError(data.get("error"))
+        return data["result"]
+
+    def batch(self, commands: Iterable[Union[dict, str]], window: int = 1000,
+              idle: float = 0.05) -> Iterator[dict]:
+        """
+        Send JSONL commands (see run_batch()) and yield results as the gateway
+        streams them. Input is sent at most window lines per request, and a
+        request is sent early once the input has been idle for idle seconds,
+        so a long or slow stream is never waited on or held in memory at once;
+        line numbers count across requests.
+        """
+        offset = 0
+        for chunk in iter_windows(commands, window, idle):
+            lines = [c.rstrip("\r\n") if isinstance(c, str) else json.dumps(c, ensure_ascii=False)
+                     for c in chunk]
+            conn, response = self._request("POST", "/batch", "\n".join(lines).encode("utf-8"))
+            try:
+                for line in response:
+                    if line.strip():
+                        result = json.loads(line)
+                        if "line" in result:
+                            result["line"] += offset
+                        yield result
+            finally:
+                conn.close()
+            offset += len(lines)
+
+
+class _RemoteStats:
+    def __init__(self, client: GatewayClient):
+        self.client = client
+
+    def snapshot(self) -> Dict[str, dict]:
+        return self.client.stats().get("freshness", {})
+
+
+class RemoteAPI:
+    """
+    mijiaAPI stand-in that forwards calls to a gateway.
+
+    Supports what mijiaDevice and the desktop adapter use: device and scene
+    listing, prop get/set and actions. Caching happens in the gateway, so
+    prop_cache is always None here.
+    """
+
+    prop_cache = None
+
+    def __init__(self, address: Optional[str] = None, timeout: float = 60, token: Optional[str] = None,
+                 token_path: Optional[Union[str, Path]] = None):
+        self.client = GatewayClient(address, timeout=timeout, token=token, token_path=token_path)
+        self.freshness_stats = _RemoteStats(self.client)
+        self._health: Optional[dict] = None
+        self._health_at = 0.0
+        self._watcher = None
+
+    def _gateway_health(self) -> dict:
+        if self._health is None or time.monotonic() - self._health_at > 10:
+            self._health = self.client.health()
+            self._health_at = time.monotonic()
+        return self._health
+
+    @property
+    def available(self) -> bool:
+        try:
+            return bool(self._gateway_health().get("available"))
+        except GatewayError:
+            return False
+
+    @property
+    def auth_data_path(self) -> Path:
+        # 网关与客户端在同一台机器上，设备规格缓存目录共用
+        return Path(self._gateway_health()["auth_data_path"])
+
+    def enable_prop_cache(self, **kwargs):
+        return None
+
+    @property
+    def property_watcher(self):
+        if self._watcher is None:
+            from .watch import PropertyWatcher
+            self._watcher = PropertyWatcher(self)
+        return self._watcher
+
+    def __getattr__(self, name: str):
+        if name in REMOTE_METHODS:
+            return lambda *args, **kwargs: self.client.call(name, *args, **kwargs)
+        raise AttributeError(name)
@@ -14,8 +14,6 @@ import time
 from gzip import GzipFile
 from io import BytesIO
 
-from Crypto.Cipher import ARC4
-
 
 def gen_nonce():
     millis = int(round(time.time() * 1000))
@@ -62,12 +60,16 @@ def generate_enc_params(uri, method, signed_nonce, nonce, params, ssecurity):
 
 
 def encrypt_rc4(password, payload):
+    from Crypto.Cipher import ARC4  # 首次请求时才加载加密库
+
     r = ARC4.new(base64.b64decode(password))
     r.encrypt(bytes(1024))
     return base64.b64encode(r.encrypt(payload.encode())).decode()
 
 
 def decrypt_rc4(password, payload):
+    from Crypto.Cipher import ARC4
+
     r = ARC4.new(base64.b64decode(password))
     r.encrypt(bytes(1024))
     return r.encrypt(base64.b64decode(payload))
@@ -0,0 +1,259 @@
+import json
+import os
+import threading
+import time
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Union
+
+from .errors import DeviceNotFoundError, MultipleDevicesFoundError
+from .logger import logger
+
+
+INDEX_FILENAME = "resolution_index.json"
+INDEX_VERSION = 1
+SECTIONS = ("devices", "scenes", "homes")
+
+
+class ResolutionIndex:
+    """
+    Persisted name -> id index for devices, scenes, homes and rooms.
+
+    Every full listing done through mijiaAPI updates the index, so later runs
+    can resolve a device name, scene name or room without listing anything.
+    Each section has its own update time; a section older than ttl is still
+    used, but triggers a background refresh when an api is at hand. The file
+    is only rewritten when a listing changes its contents, or when the saved
+    update time is more than half a ttl old and would soon look stale to the
+    next process.
+    """
+
+    def __init__(self, path: Union[str, Path], ttl: float = 3600):
+        self.path = Path(path)
+        self.ttl = ttl
+        self._data: Optional[dict] = None
+        self._saved_at: Dict[str, float] = {}  # section -> update time in the file
+        self._lock = threading.RLock()
+        self._refreshing = False
+
+    def _load(self) -> dict:
+        with self._lock:
+            if self._data is None:
+                data = None
+                try:
+                    with self.path.open("r", encoding="utf-8") as f:
+                        data = json.load(f)
+                except (OSError, json.JSONDecodeError):
+                    pass
+                if not isinstance(data, dict) or data.get("version") != INDEX_VERSION:
+                    data = {"version": INDEX_VERSION}
+                for section in SECTIONS:
+                    data.setdefault(section, {"updated": 0, "items": {}})
+                self._data = data
+                self._saved_at = {section: data[section]["updated"] for section in SECTIONS}
+            return self._data
+
+    def _save(self):
+        # 先写临时文件再替换，进程在写入中途退出也不会留下损坏的索引
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = self.path.with_name(f"{self.path.name}.{os.getpid()}.tmp")
+        with tmp.open("w", encoding="utf-8") as f:
+            json.dump(self._data, f, ensure_ascii=False)
+        os.replace(tmp, self.path)
+        self._saved_at = {section: self._data[section]["updated"] for section in SECTIONS}
+
+    def _store(self, name: str, items: dict, touch: bool = True):
+        """Replace a section's items, saving only if they changed or the saved update time is getting old"""
+        section = self._load()[name]
+        dirty = items != section["items"]
+        section["items"] = items
+        if touch:
+            section["updated"] = time.time()
+            dirty = dirty or section["updated"] - self._saved_at[name] > self.ttl / 2
+        if dirty:
+            self._save()
+
+    def is_stale(self, section: str) -> bool:
+        return time.time() - self._load()[section]["updated"] > self.ttl
+
+    def update_devices(self, devices: Iterable[dict], source: str = "own"):
+        """Replace the devices from one listing (source "own" or "shared")"""
+        with self._lock:
+            section = self._load()["devices"]
+            items = {did: d for did, d in section["items"].items() if d.get("source") != source}
+            for device in devices:
+                items[str(device["did"])] = {
+                    "name": device.get("name"),
+                    "model": device.get("model"),
+                    "home_id": str(device.get("home_id", "")),
+                    "source": source,
+                }
+            self._store("devices", items)
+
+    def update_scenes(self, scenes: Iterable[dict], home_id: Optional[str] = None):
+        """Replace all scenes, or only the scenes of home_id"""
+        with self._lock:
+            section = self._load()["scenes"]
+            if home_id is None:
+                items = {}
+            else:
+                items = {sid: s for sid, s in section["items"].items() if s.get("home_id") != str(home_id)}
+            for scene in scenes:
+                items[str(scene["scene_id"])] = {"name": scene.get("name"), "home_id": str(scene.get("home_id"))}
+            self._store("scenes", items, touch=home_id is None)
+
+    def update_homes(self, homes: Iterable[dict]):
+        """Homes with their owner uid and rooms (room id -> name, dids)"""
+        with self._lock:
+            self._store("homes", {
+                str(home["id"]): {
+                    "name": home.get("name"),
+                    "uid": home.get("uid"),
+                    "rooms": {
+                        str(room["id"]): {"name": room.get("name"), "dids": list(room.get("dids") or [])}
+                        for room in home.get("roomlist") or []
+                    },
+                }
+                for home in homes
+            })
+
+    def device(self, did: str) -> Optional[dict]:
+        entry = self._load()["devices"]["items"].get(str(did))
+        return {"did": str(did), **entry} if entry is not None else None
+
+    def find_devices(self, name: str) -> List[dict]:
+        return [{"did": did, **d} for did, d in self._load()["devices"]["items"].items() if d["name"] == name]
+
+    def find_scenes(self, scene: str) -> List[dict]:
+        """Scenes whose id or name is scene"""
+        items = self._load()["scenes"]["items"]
+        if scene in items:
+            return [{"scene_id": scene, **items[scene]}]
+        return [{"scene_id": sid, **s} for sid, s in items.items() if s["name"] == scene]
+
+    def find_rooms(self, room: str) -> List[dict]:
+        """Rooms whose id or name is room, as {room_id, name, home_id, dids}"""
+        rooms = []
+        for home_id, home in self._load()["homes"]["items"].items():
+            for room_id, entry in home["rooms"].items():
+                if room in (room_id, entry["name"]):
+                    rooms.append({"room_id": room_id, "home_id": home_id, **entry})
+        return rooms
+
+    def home_owner(self, home_id: str) -> Optional[int]:
+        home = self._load()["homes"]["items"].get(str(home_id))
+        return int(home["uid"]) if home is not None and home.get("uid") is not None else None
+
+    def refresh(self, api, sections: Iterable[str] = SECTIONS):
+        """Fetch the given sections live; listings update the index as a side effect"""
+        sections = set(sections)
+        if "homes" in sections:
+            api.get_homes_list()
+        if "devices" in sections:
+            api.get_devices_list()
+            api.get_shared_devices_list()
+        if "scenes" in sections:
+            api.get_scenes_list()
+
+    def refresh_stale(self, api, sections: Iterable[str] = SECTIONS, background: bool = True):
+        """Refresh those of sections that are older than ttl, in a daemon thread by default"""
+        stale = [section for section in sections if self.is_stale(section)]
+        if not stale:
+            return
+        with self._lock:
+            if self._refreshing:
+                return
+            self._refreshing = True
+
+        def run():
+            try:
+                self.refresh(api, stale)
+            except Exception as e:
+                logger.debug(f"后台刷新名称索引失败: {e}")
+            finally:
+                self._refreshing = False
+
+        if background:
+            threading.Thread(target=run, name="mijiaAPI-index-refresh", daemon=True).start()
+        else:
+            run()
+
+
+def _index(api) -> Optional[ResolutionIndex]:
+    return getattr(api, "resolution_index", None)
+
+
+def resolve_device(api, did: Optional[str] = None, dev_name: Optional[str] = None) -> dict:
+    """
+    根据 did 或设备名称查找设备
+
+    优先使用名称索引，未找到或找到多个时才请求设备列表确认。
+
+    返回值:
+        dict: 包含 did、name、model 的设备信息
+
+    异常:
+        DeviceNotFoundError: 当设备不存在时抛出
+        MultipleDevicesFoundError: 当名称对应多个设备时抛出
+        ValueError: 当 did 和 dev_name 都为 None 时抛出
+    """
+    if did is None and dev_name is None:
+        raise ValueError("必须提供 did 或 dev_name 参数之一")
+    index = _index(api)
+    if index is not None:
+        matches = [index.device(did)] if did is not None else index.find_devices(dev_name)
+        matches = [m for m in matches if m is not None]
+        if len(matches) == 1:
+            index.refresh_stale(api, ["devices"])
+            return matches[0]
+
+    devices = api.get_devices_list() + api.get_shared_devices_list()
+    if did is not None:
+        matches = [device for device in devices if device["did"] == did]
+        if len(matches) > 1:
+            raise MultipleDevicesFoundError(f"找到多个 did 为 '{did}' 的设备，未预想的问题，欢迎提交 issue: https://github.com/Do1e/mijia-api/issues")
+    else:
+        matches = [device for device in devices if device["name"] == dev_name]
+        if len(matches) > 1:
+            raise MultipleDevicesFoundError(f"找到多个 dev_name 为 '{dev_name}' 的设备，请使用 did 参数指定具体设备或者修改设备名称以区分")
+    if not matches:
+        raise DeviceNotFoundError(did if did is not None else dev_name)
+    return matches[0]
+
+
+def resolve_scene(api, scene: str) -> Optional[dict]:
+    """
+    根据场景ID或名称查找场景
+
+    返回值:
+        Optional[dict]: 包含 scene_id、name、home_id 的场景信息，未找到时返回 None
+
+    异常:
+        ValueError: 当名称对应多个场景时抛出
+    """
+    index = _index(api)
+    if index is not None:
+        matches = index.find_scenes(scene)
+        if len(matches) == 1:
+            index.refresh_stale(api, ["scenes"])
+            return matches[0]
+    scenes = api.get_scenes_list()
+    matches = [s for s in scenes if s["scene_id"] == scene] or [s for s in scenes if s["name"] == scene]
+    if len(matches) > 1:
+        raise ValueError(f"找到多个名称为 '{scene}' 的场景，请使用场景ID")
+    return matches[0] if matches else None
+
+
+def resolve_room(api, room: str) -> List[str]:
+    """根据房间ID或名称查找房间中的设备 did 列表，同名房间的设备会合并返回"""
+    index = _index(api)
+    if index is not None:
+        rooms = index.find_rooms(room)
+        if rooms:
+            index.refresh_stale(api, ["homes"])
+            return [did for r in rooms for did in r["dids"]]
+    dids: Dict[str, None] = {}
+    for home in api.get_homes_list():
+        for r in home.get("roomlist") or []:
+            if room in (str(r["id"]), r["name"]):
+                dids.update(dict.fromkeys(r.get("dids") or []))
+    return list(dids)
@@ -0,0 +1,157 @@
+import copy
+import gzip
+import json
+import os
+import threading
+import time
+from pathlib import Path
+from typing import Dict, Iterable, Optional, Union
+
+from .logger import logger
+from .version import version
+
+
+BUNDLE_FORMAT = "mijiaAPI-spec-bundle"
+BUNDLE_VERSION = 1
+BUNDLE_FILENAME = "spec_bundle.json.gz"
+BUNDLE_ENV = "MIJIA_SPEC_BUNDLE"
+
+
+class SpecBundle:
+    """
+    A versioned file holding compiled get_device_info() results for many models.
+
+    The file is only read on the first lookup, so having a bundle configured
+    costs nothing until a spec is actually needed.
+    """
+
+    def __init__(self, path: Union[str, Path]):
+        self.path = Path(path)
+        self._models: Optional[Dict[str, dict]] = None
+        self._lock = threading.Lock()
+        self.meta: dict = {}
+
+    def _load(self) -> Dict[str, dict]:
+        with self._lock:
+            if self._models is not None:
+                return self._models
+            self._models = {}
+            try:
+                with gzip.open(self.path, "rt", encoding="utf-8") as f:
+                    data = json.load(f)
+            except (OSError, json.JSONDecodeError) as e:
+                logger.warning(f"读取设备规格包失败 {self.path}: {e}")
+                return self._models
+            if data.get("format") != BUNDLE_FORMAT or data.get("version", 0) > BUNDLE_VERSION:
+                logger.warning(f"不支持的设备规格包格式: {self.path} "
+                               f"(format={data.get('format')}, version={data.get('version')})")
+                return self._models
+            self.meta = {k: v for k, v in data.items() if k != "models"}
+            self._models = data.get("models", {})
+            logger.debug(f"已加载设备规格包 {self.path}, 共 {len(self._models)} 个型号")
+            return self._models
+
+    def get(self, device_model: str) -> Optional[dict]:
+        info = self._load().get(device_model)
+        return copy.deepcopy(info) if info is not None else None
+
+    def __contains__(self, device_model: str) -> bool:
+        return device_model in self._load()
+
+    @property
+    def models(self) -> list:
+        return sorted(self._load())
+
+
+_bundles: Dict[Path, SpecBundle] = {}
+
+
+def find_bundles(cache_path: Optional[Union[str, Path]] = None) -> list:
+    """Bundles to consult, in order: $MIJIA_SPEC_BUNDLE, then <cache_path>/spec_bundle.json.gz"""
+    paths = []
+    if os.getenv(BUNDLE_ENV):
+        paths.append(Path(os.environ[BUNDLE_ENV]))
+    if cache_path is not None:
+        paths.append(Path(cache_path) / BUNDLE_FILENAME)
+    bundles = []
+    for path in paths:
+        if not path.is_file():
+            continue
+        if path not in _bundles:
+            _bundles[path] = SpecBundle(path)
+        bundles.append(_bundles[path])
+    return bundles
+
+
+def load_from_bundle(device_model: str, cache_path: Optional[Union[str, Path]] = None) -> Optional[dict]:
+    for bundle in find_bundles(cache_path):
+        info = bundle.get(device_model)
+        if info is not None:
+            logger.debug(f"从设备规格包加载设备信息: {device_model} ({bundle.path})")
+            return info
+    return None
+
+
+def _is_spec_entry(data) -> bool:
+    return isinstance(data, dict) and "model" in data and "properties" in data and "actions" in data
+
+
+def export_spec_bundle(
+        output: Union[str, Path],
+        cache_path: Optional[Union[str, Path]] = None,
+        models: Optional[Iterable[str]] = None,
+) -> Path:
+    """
+    导出设备规格包
+
+    将设备规格缓存目录中的所有设备信息，或指定型号列表的设备信息，打包为一个带版本号的文件。
+    将该文件放到新机器的缓存目录（默认 ~/.config/mijia-api/spec_bundle.json.gz），
+    或通过环境变量 MIJIA_SPEC_BUNDLE 指定，get_device_info() 即可在不联网的情况下获取设备信息。
+
+    参数:
+        output (Union[str, Path]): 输出文件路径
+        cache_path (Optional[Union[str, Path]]): 可选，设备规格缓存目录
+        models (Optional[Iterable[str]]): 可选，设备型号列表。
+            - 如果为 None，则打包 cache_path 中已缓存的全部设备信息
+            - 如果指定，则通过 get_device_info() 获取（会优先使用缓存）并打包这些型号
+
+    返回值:
+        Path: 输出文件路径
+
+    异常:
+        GetDeviceInfoError: 当指定型号的设备信息获取失败时抛出
+        ValueError: 当既没有指定 models 也没有指定 cache_path 时抛出
+    """
+    from .devices import get_device_info
+
+    entries: Dict[str, dict] = {}
+    if models is not None:
+        for model in models:
+            entries[model] = get_device_info(model, cache_path=cache_path)
+    elif cache_path is not None:
+        for file in sorted(Path(cache_path).glob("*.json")):
+            try:
+                with file.open("r", encoding="utf-8") as f:
+                    data = json.load(f)
+            except (OSError, json.JSONDecodeError):
+                continue
+            if _is_spec_entry(data):
+                entries[file.stem] = data
+    else:
+        raise ValueError("必须提供 cache_path 或 models 参数之一")
+
+    output = Path(output)
+    output.parent.mkdir(parents=True, exist_ok=True)
+    bundle = {
+        "format": BUNDLE_FORMAT,
+        "version": BUNDLE_VERSION,
+        "created": int(time.time()),
+        "generator": f"mijiaAPI/{version}",
+        "models": entries,
+    }
+    with gzip.open(output, "wt", encoding="utf-8") as f:
+        json.dump(bundle, f, ensure_ascii=False, separators=(",", ":"))
+    _bundles.pop(output.resolve(), None)
+    _bundles.pop(output, None)
+    logger.info(f"已导出设备规格包 {output}, 共 {len(entries)} 个型号")
+    return output
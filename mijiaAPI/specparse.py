@@ -0,0 +1,157 @@
+import html
+import json
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, Optional, Union
+
+
+_ATTR = 'data-page="'
+
+# 规格页面中常见的实体，可以用 str.replace 直接解码；
+# 以 & 开头的实体不会出现在 &amp; 的内部，因此先替换它们、最后替换 &amp; 不会重复解码
+_SIMPLE_ENTITIES = (
+    ("&quot;", '"'),
+    ("&#34;", '"'),
+    ("&#39;", "'"),
+    ("&#x27;", "'"),
+    ("&lt;", "<"),
+    ("&gt;", ">"),
+)
+
+
+def _unescape(raw: str) -> str:
+    text = raw
+    for entity, char in _SIMPLE_ENTITIES:
+        if entity in text:
+            text = text.replace(entity, char)
+    if text.count("&") != text.count("&amp;"):
+        # 还有其他实体，交给 html.unescape 对原文做完整解码
+        return html.unescape(raw)
+    return text.replace("&amp;", "&")
+
+
+def extract_page_data(page: str) -> dict:
+    """
+    Extract and decode the JSON held in the data-page attribute of a spec page.
+
+    The attribute value is delimited by the first unescaped quote after the
+    attribute name (quotes inside it are always written as &quot;), so the
+    boundary is found with two str.find calls instead of a regex over the whole
+    page. All entities are decoded, not just &quot;: the common ones with
+    str.replace, anything else through html.unescape.
+    """
+    start = page.find(_ATTR)
+    if start < 0:
+        raise ValueError("页面中未找到 data-page 属性")
+    start += len(_ATTR)
+    end = page.find('"', start)
+    if end < 0:
+        raise ValueError("data-page 属性未闭合")
+    return json.loads(_unescape(page[start:end]))
+
+
+def _none(value):
+    return None if value == "none" else value
+
+
+def compile_spec(content: dict, device_model: str) -> dict:
+    """Convert the decoded page data into the get_device_info() result format"""
+    props = content["props"]
+    product = props["product"]
+    spec = props["spec"]
+    if product:
+        name = product["name"]
+        model = product["model"]
+    else:
+        name = spec["name"]
+        model = device_model
+    properties = []
+    actions = []
+    result = {
+        "name": name,
+        "model": model,
+        # 规格版本的 URN，例如 urn:miot-spec-v2:device:light:0000A001:yeelink-lamp4:1，用于检测规格更新
+        "type": spec.get("type"),
+        "properties": properties,
+        "actions": actions,
+    }
+
+    properties_name = set()
+    actions_name = set()
+    for siid, service in spec["services"].items():
+        service_props = service.get("properties")
+        if service_props:
+            for piid, prop in service_props.items():
+                fmt = prop["format"]
+                if fmt.startswith("int"):
+                    prop_type = "int"
+                elif fmt.startswith("uint"):
+                    prop_type = "uint"
+                else:
+                    prop_type = fmt
+                access = prop["access"]
+                prop_name = prop["name"]
+                if prop_name in properties_name:
+                    prop_name = f"{service['name']}-{prop_name}"
+                properties_name.add(prop_name)
+                properties.append({
+                    "name": _none(prop_name),
+                    "description": _none(f"{prop.get('description', '')} / {prop.get('desc_zh_cn', '')}"),
+                    "type": _none(prop_type),
+                    "rw": ("r" if "read" in access else "") + ("w" if "write" in access else ""),
+                    "unit": _none(prop.get("unit", None)),
+                    "range": _none(prop.get("value-range", None)),
+                    "value-list": _none(prop.get("value-list", None)),
+                    "method": {
+                        "siid": int(siid),
+                        "piid": int(piid)
+                    }
+                })
+        service_actions = service.get("actions")
+        if service_actions:
+            for aiid, act in service_actions.items():
+                act_name = act["name"]
+                if act_name in actions_name:
+                    act_name = f"{service['name']}-{act_name}"
+                actions_name.add(act_name)
+                actions.append({
+                    "name": act_name,
+                    "description": f"{act.get('description', '')} / {act.get('desc_zh_cn', '')}",
+                    "method": {
+                        "siid": int(siid),
+                        "aiid": int(aiid)
+                    }
+                })
+    return result
+
+
+def parse_spec_page(page: str, device_model: str) -> dict:
+    """Parse a home.miot-spec.com spec page into the get_device_info() result format"""
+    return compile_spec(extract_page_data(page), device_model)
+
+
+def _parse_item(item):
+    device_model, page = item
+    try:
+        return device_model, parse_spec_page(page, device_model)
+    except (ValueError, KeyError, TypeError) as e:
+        return device_model, e
+
+
+def parse_spec_pages(
+        pages: Dict[str, str],
+        processes: Optional[int] = None,
+) -> Dict[str, Union[dict, Exception]]:
+    """
+    Parse many spec pages, in the calling process by default.
+
+    A process pool is only used when processes > 1 is asked for: starting the
+    workers and pickling pages costs more than parsing the handful of models a
+    home usually has, so callers opt in for large batches.
+
+    Returns model -> parsed info, or the exception raised while parsing that page.
+    """
+    items = list(pages.items())
+    if processes is None or processes <= 1 or len(items) <= 1:
+        return dict(map(_parse_item, items))
+    with ProcessPoolExecutor(max_workers=processes) as executor:
+        return dict(executor.map(_parse_item, items, chunksize=max(1, len(items) // 32)))
@@ -0,0 +1,211 @@
+import json
+import threading
+import time
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Union
+
+from .errors import GetDeviceInfoError
+from .logger import logger
+from .version import version
+
+
+SPEC_INDEX_URL = "https://miot-spec.org/miot-spec-v2/instances?status=released"
+STATE_FILENAME = "spec_revalidation.json"
+
+
+def fetch_spec_index(timeout: float = 30) -> Dict[str, str]:
+    """
+    获取所有已发布规格的最新版本
+
+    一次请求即可得到全部型号的规格 URN，比逐个下载规格页面开销小得多。
+
+    返回值:
+        Dict[str, str]: 型号 -> 最新版本的规格 URN
+    """
+    import requests
+
+    response = requests.get(SPEC_INDEX_URL, headers={
+        "User-Agent": f"mijiaAPI/{version}"
+    }, timeout=timeout)
+    response.raise_for_status()
+    latest: Dict[str, tuple] = {}
+    for instance in response.json().get("instances", []):
+        model = instance.get("model")
+        urn = instance.get("type")
+        if not model or not urn:
+            continue
+        ver = instance.get("version", 0)
+        if model not in latest or ver >= latest[model][0]:
+            latest[model] = (ver, urn)
+    return {model: urn for model, (_, urn) in latest.items()}
+
+
+def _cached_entries(cache_path: Path, models: Optional[Iterable[str]] = None) -> Dict[str, dict]:
+    files = ([cache_path / f"{m}.json" for m in models] if models is not None
+             else sorted(cache_path.glob("*.json")))
+    entries = {}
+    for file in files:
+        try:
+            with file.open("r", encoding="utf-8") as f:
+                data = json.load(f)
+        except (OSError, json.JSONDecodeError):
+            continue
+        if isinstance(data, dict) and "properties" in data and "actions" in data:
+            entries[file.stem] = data
+    return entries
+
+
+def find_changed_specs(
+        cache_path: Union[str, Path],
+        index: Dict[str, str],
+        models: Optional[Iterable[str]] = None,
+) -> List[str]:
+    """
+    对比缓存的规格 URN 与最新版本，返回规格已变化的型号
+
+    不在索引中的型号（未发布或已下线）视为未变化。旧版本缓存没有记录 URN，
+    无法通过 URN 判断，不在返回值中，由 revalidate_specs() 重新获取一次并核对。
+    """
+    changed = []
+    for model, info in _cached_entries(Path(cache_path), models).items():
+        cached, latest = info.get("type"), index.get(model)
+        if cached is not None and latest is not None and cached != latest:
+            changed.append(model)
+    return changed
+
+
+def _unverified_specs(
+        cache_path: Union[str, Path],
+        index: Dict[str, str],
+        models: Optional[Iterable[str]] = None,
+) -> Dict[str, dict]:
+    """Published models whose cache entry predates URN tracking, so their version was never known"""
+    return {
+        model: info for model, info in _cached_entries(Path(cache_path), models).items()
+        if info.get("type") is None and model in index
+    }
+
+
+def _same_mapping(old: dict, new: dict) -> bool:
+    return old.get("properties") == new.get("properties") and old.get("actions") == new.get("actions")
+
+
+def revalidate_specs(
+        cache_path: Union[str, Path],
+        index: Optional[Dict[str, str]] = None,
+        models: Optional[Iterable[str]] = None,
+) -> List[str]:
+    """
+    重新验证缓存目录中的设备规格
+
+    只重新获取规格已变化的型号，更新缓存文件，并重新绑定这些型号存活的 mijiaDevice 实例。
+    旧版本缓存没有记录 URN，会重新获取一次并与缓存的属性/动作映射对比，有差异时同样重新绑定，
+    之后缓存中记录获取到的 URN，后续只在 URN 变化时才重新获取。
+
+    参数:
+        cache_path (Union[str, Path]): 设备规格缓存目录
+        index (Optional[Dict[str, str]]): 可选，型号 -> 最新规格 URN，为 None 时通过 fetch_spec_index() 获取
+        models (Optional[Iterable[str]]): 可选，只检查这些型号，默认检查全部缓存
+
+    返回值:
+        List[str]: 已更新的型号列表
+    """
+    import requests
+
+    from .devices import _save_device_info, get_device_info, rebind_devices
+
+    if index is None:
+        index = fetch_spec_index()
+    unverified = _unverified_specs(cache_path, index, models)
+    updated = []
+    for model in find_changed_specs(cache_path, index, models) + list(unverified):
+        try:
+            info = get_device_info(model, cache_path=cache_path, refresh=True)
+        except (GetDeviceInfoError, requests.exceptions.RequestException) as e:
+            logger.warning(f"更新设备规格失败 {model}: {e}")
+            continue
+        if model in unverified:
+            if info.get("type") is None:
+                # 页面中没有 URN 时记录索引中的版本，避免每次都重新获取
+                info["type"] = index[model]
+                _save_device_info(cache_path, model, info)
+            if _same_mapping(unverified[model], info):
+                logger.debug(f"旧缓存的设备规格未变化 {model}，已记录版本 {info['type']}")
+                continue
+        updated.append(model)
+        count = rebind_devices(model, info)
+        logger.info(f"设备规格已更新 {model}: {info.get('type')}，重新绑定 {count} 个设备实例")
+    return updated
+
+
+class SpecRevalidator:
+    """
+    Revalidate cached specs in a background thread every interval seconds.
+
+    The time of the last check is kept in <cache_path>/spec_revalidation.json,
+    so restarting the process does not trigger a check before it is due.
+    """
+
+    def __init__(
+            self,
+            cache_path: Union[str, Path],
+            interval: float = 24 * 3600,
+            initial_delay: float = 60,
+    ):
+        self.cache_path = Path(cache_path)
+        self.interval = interval
+        self.initial_delay = initial_delay
+        self.last_updated: List[str] = []
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def _state_file(self) -> Path:
+        return self.cache_path / STATE_FILENAME
+
+    def _last_check(self) -> float:
+        try:
+            with self._state_file.open("r", encoding="utf-8") as f:
+                return float(json.load(f).get("last_check", 0))
+        except (OSError, ValueError, AttributeError):
+            return 0.0
+
+    def _save_check(self, checked_at: float, updated: List[str]):
+        self.cache_path.mkdir(parents=True, exist_ok=True)
+        with self._state_file.open("w", encoding="utf-8") as f:
+            json.dump({"last_check": int(checked_at), "updated": updated}, f, ensure_ascii=False)
+
+    def next_delay(self) -> float:
+        due = self._last_check() + self.interval - time.time()
+        return max(self.initial_delay, due)
+
+    def check_now(self) -> List[str]:
+        checked_at = time.time()
+        updated = revalidate_specs(self.cache_path)
+        self._save_check(checked_at, updated)
+        self.last_updated = updated
+        return updated
+
+    def _run(self):
+        delay = self.next_delay()
+        while not self._stop.wait(delay):
+            try:
+                self.check_now()
+                delay = self.interval
+            except Exception as e:
+                # 网络不可用时稍后重试，不影响正常使用
+                logger.warning(f"设备规格重新验证失败: {e}")
+                delay = min(self.interval, 3600)
+
+    def start(self):
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="mijiaAPI-spec-revalidator", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+            self._thread = None
@@ -0,0 +1,277 @@
+import json
+import math
+import os
+import re
+import sys
+import threading
+import time
+from array import array
+from bisect import bisect_left
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Tuple, Union
+
+from .logger import logger
+
+
+STORE_DIRNAME = "statistics"
+FILE_MAGIC = b"MJSTAT1\n"
+PERIOD_SECONDS = {
+    "hour": 3600,
+    "day": 86400,
+    "week": 7 * 86400,
+    # 按月统计的窗口只用于切分请求，按最长的月份计算，保证每个窗口的条目数不超过 limit
+    "month": 31 * 86400,
+}
+
+SeriesKey = Tuple[str, str, str]
+Window = Tuple[int, int]
+
+
+def period_seconds(data_type: str) -> int:
+    """统计数据类型 (stat_hour_v3、stat_day 等) 对应的统计周期秒数"""
+    for period, seconds in PERIOD_SECONDS.items():
+        if f"_{period}" in data_type:
+            return seconds
+    raise ValueError(f"无法识别的统计数据类型: {data_type}")
+
+
+def parse_stat_value(value) -> float:
+    """
+    解析 get_statistics() 返回的 value 字段，替代 eval()
+
+    value 通常是 JSON 数组字符串，例如 "[12.5]"，取第一个元素；无法解析为数字时返回 nan。
+    """
+    if isinstance(value, (int, float)):
+        return float(value)
+    try:
+        parsed = json.loads(value)
+    except (TypeError, ValueError):
+        return math.nan
+    if isinstance(parsed, list):
+        parsed = parsed[0] if parsed else None
+    try:
+        return float(parsed)
+    except (TypeError, ValueError):
+        return math.nan
+
+
+def split_windows(time_start: int, time_end: int, data_type: str, limit: int) -> List[Window]:
+    """把 [time_start, time_end) 切分为每个最多包含 limit 个统计周期的窗口"""
+    if limit <= 0:
+        raise ValueError(f"无效的 limit: {limit}")
+    step = period_seconds(data_type) * limit
+    return [(start, min(start + step, time_end)) for start in range(time_start, time_end, step)]
+
+
+def _merge_windows(windows: Iterable[Window]) -> List[Window]:
+    merged: List[List[int]] = []
+    for start, end in sorted(windows):
+        if start >= end:
+            continue
+        if merged and start <= merged[-1][1]:
+            merged[-1][1] = max(merged[-1][1], end)
+        else:
+            merged.append([start, end])
+    return [(start, end) for start, end in merged]
+
+
+def _subtract_windows(start: int, end: int, covered: List[Window]) -> List[Window]:
+    missing = []
+    cursor = start
+    for c_start, c_end in covered:
+        if c_end <= cursor:
+            continue
+        if c_start >= end:
+            break
+        if c_start > cursor:
+            missing.append((cursor, c_start))
+        cursor = max(cursor, c_end)
+    if cursor < end:
+        missing.append((cursor, end))
+    return missing
+
+
+class StatSeries:
+    """
+    Points of one (did, key, data_type) series as parallel typed arrays.
+
+    times holds the bucket timestamps in ascending order and values the parsed
+    values; covered lists the [start, end) windows that have been fetched, so
+    buckets without data are not requested again.
+    """
+
+    def __init__(self, times: Optional[array] = None, values: Optional[array] = None,
+                 covered: Optional[List[Window]] = None):
+        self.times = times if times is not None else array("q")
+        self.values = values if values is not None else array("d")
+        self.covered: List[Window] = covered or []
+
+    def __len__(self) -> int:
+        return len(self.times)
+
+    def slice(self, time_start: int, time_end: int) -> Tuple[array, array]:
+        """[time_start, time_end) 范围内的 (times, values)"""
+        lo = bisect_left(self.times, time_start)
+        hi = bisect_left(self.times, time_end)
+        return self.times[lo:hi], self.values[lo:hi]
+
+    def replace(self, start: int, end: int, times: array, values: array):
+        """用一次完整获取的结果替换 [start, end) 范围内的点"""
+        lo = bisect_left(self.times, start)
+        hi = bisect_left(self.times, end)
+        self.times[lo:hi] = times
+        self.values[lo:hi] = values
+
+    def mark_covered(self, start: int, end: int):
+        self.covered = _merge_windows(self.covered + [(start, end)])
+
+    def to_bytes(self) -> bytes:
+        times, values = array("q", self.times), array("d", self.values)
+        if sys.byteorder == "big":
+            times.byteswap()
+            values.byteswap()
+        header = json.dumps({"count": len(times), "covered": self.covered}).encode("utf-8")
+        return FILE_MAGIC + header + b"\n" + times.tobytes() + values.tobytes()
+
+    @classmethod
+    def from_bytes(cls, data: bytes) -> "StatSeries":
+        if not data.startswith(FILE_MAGIC):
+            raise ValueError("不是统计数据文件")
+        newline = data.index(b"\n", len(FILE_MAGIC))
+        header = json.loads(data[len(FILE_MAGIC):newline])
+        count = header["count"]
+        body = memoryview(data)[newline + 1:]
+        times, values = array("q"), array("d")
+        times.frombytes(body[:count * times.itemsize])
+        values.frombytes(body[count * times.itemsize:count * (times.itemsize + values.itemsize)])
+        if sys.byteorder == "big":
+            times.byteswap()
+            values.byteswap()
+        if len(times) != count or len(values) != count:
+            raise ValueError("统计数据文件不完整")
+        return cls(times, values, [tuple(w) for w in header["covered"]])
+
+
+class StatisticsStore:
+    """
+    Local time-series store for get_statistics() results.
+
+    Each (did, key, data_type) series is kept in its own file under path:
+    a small JSON header with the fetched windows, followed by the timestamps
+    as int64 and the values as float64, little-endian. fetch() only requests
+    the windows of a range that have not been fetched yet; the window holding
+    the current, still growing bucket is never marked as fetched.
+    """
+
+    def __init__(self, path: Union[str, Path], limit: int = 200):
+        self.path = Path(path)
+        self.limit = limit
+        self._series: Dict[SeriesKey, StatSeries] = {}
+        self._lock = threading.RLock()
+        self.requests = 0
+
+    def _file(self, key: SeriesKey) -> Path:
+        name = "__".join(re.sub(r"[^\w.-]", "_", str(part)) for part in key)
+        return self.path / f"{name}.stat"
+
+    def series(self, did: str, key: str, data_type: str) -> StatSeries:
+        series_key = (str(did), str(key), data_type)
+        with self._lock:
+            series = self._series.get(series_key)
+            if series is None:
+                try:
+                    series = StatSeries.from_bytes(self._file(series_key).read_bytes())
+                except FileNotFoundError:
+                    series = StatSeries()
+                except (OSError, ValueError, KeyError) as e:
+                    logger.warning(f"统计数据文件损坏，将重新获取 {series_key}: {e}")
+                    series = StatSeries()
+                self._series[series_key] = series
+            return series
+
+    def save(self, did: str, key: str, data_type: str):
+        series_key = (str(did), str(key), data_type)
+        with self._lock:
+            data = self.series(*series_key).to_bytes()
+            file = self._file(series_key)
+            self.path.mkdir(parents=True, exist_ok=True)
+            tmp = file.with_name(f"{file.name}.{os.getpid()}.tmp")
+            tmp.write_bytes(data)
+            os.replace(tmp, file)
+
+    def missing_windows(self, did: str, key: str, data_type: str, time_start: int, time_end: int) -> List[Window]:
+        """[time_start, time_end) 中尚未获取的部分，按 limit 切分为请求窗口"""
+        covered = self.series(did, key, data_type).covered
+        windows = []
+        for start, end in _subtract_windows(int(time_start), int(time_end), covered):
+            windows.extend(split_windows(start, end, data_type, self.limit))
+        return windows
+
+    def add_points(self, did: str, key: str, data_type: str, start: int, end: int,
+                   items: List[dict], now: Optional[float] = None):
+        """
+        写入一个窗口 [start, end) 的 get_statistics() 原始结果
+
+        窗口结束时间早于当前统计周期的开始时才标记为已获取，当前周期的值还会变化。
+        """
+        points = sorted((int(item["time"]), parse_stat_value(item.get("value"))) for item in items
+                        if start <= int(item["time"]) < end)
+        times = array("q", (t for t, _ in points))
+        values = array("d", (v for _, v in points))
+        settled = int(now if now is not None else time.time()) - period_seconds(data_type)
+        with self._lock:
+            series = self.series(did, key, data_type)
+            series.replace(start, end, times, values)
+            if min(end, settled) > start:
+                series.mark_covered(start, min(end, settled))
+
+    def fetch_window(self, api, did: str, key: str, data_type: str, start: int, end: int):
+        """请求一个窗口并写入 (不保存文件)"""
+        items = api.get_statistics({
+            "did": did,
+            "key": key,
+            "data_type": data_type,
+            "limit": self.limit,
+            "time_start": start,
+            "time_end": end - 1,
+        })
+        self.requests += 1
+        self.add_points(did, key, data_type, start, end, items or [])
+
+    def fetch(self, api, did: str, key: str, data_type: str,
+              time_start: int, time_end: Optional[int] = None) -> Tuple[array, array]:
+        """
+        获取统计数据，只请求本地缺失的窗口
+
+        参数:
+            api (mijiaAPI): API 实例
+            did (str): 设备ID
+            key (str): 统计数据的键，见 mijiaAPI.get_statistics()
+            data_type (str): 统计数据类型，例如 stat_day_v3
+            time_start (int): 开始时间戳（秒）
+            time_end (Optional[int]): 结束时间戳（秒，不包含），默认当前时间
+
+        返回值:
+            Tuple[array, array]: (时间戳 array('q'), 统计值 array('d'))，按时间升序
+        """
+        if time_end is None:
+            time_end = int(time.time()) + 1
+        windows = self.missing_windows(did, key, data_type, time_start, time_end)
+        for start, end in windows:
+            self.fetch_window(api, did, key, data_type, start, end)
+        if windows:
+            self.save(did, key, data_type)
+        return self.series(did, key, data_type).slice(time_start, time_end)
+
+    def query(self, did: str, key: str, data_type: str, time_start: int, time_end: int) -> Tuple[array, array]:
+        """只读取本地数据，不请求网络"""
+        return self.series(did, key, data_type).slice(time_start, time_end)
+
+    def total(self, api, devices: Iterable[str], key: str, data_type: str,
+              time_start: int, time_end: Optional[int] = None) -> Dict[str, float]:
+        """多个设备在时间范围内的统计值之和 (忽略 nan)，例如整屋的月耗电量"""
+        totals = {}
+        for did in devices:
+            _, values = self.fetch(api, did, key, data_type, time_start, time_end)
+            totals[did] = math.fsum(v for v in values if not math.isnan(v))
+        return totals
@@ -0,0 +1,249 @@
+import threading
+import time
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple, Union
+
+from .devices import DevProp, _build_prop_list, get_device_info
+from .errors import APIError
+from .logger import logger
+
+
+# 轮询出错时的最长重试间隔 (秒)
+MAX_BACKOFF = 60
+
+
+PropKey = Tuple[str, int, int]
+
+
+@dataclass
+class PropertyChange:
+    """A property value delivered to a watch callback"""
+    did: str
+    name: Optional[str]
+    siid: int
+    piid: int
+    value: Any
+    update_time: Optional[int]
+    code: int = 0
+    previous: Any = None
+
+
+class WatchSubscription:
+    """Handle returned by PropertyWatcher.subscribe(); call cancel() to stop watching"""
+
+    def __init__(
+            self,
+            watcher: "PropertyWatcher",
+            keys: List[PropKey],
+            names: Dict[PropKey, Optional[str]],
+            interval: float,
+            callback: Callable[[List[PropertyChange]], None],
+    ):
+        self.watcher = watcher
+        self.keys = keys
+        self.names = names
+        self.interval = interval
+        self.callback = callback
+        self.next_due = time.monotonic()
+        self.active = True
+        self._last: Dict[PropKey, Tuple[Any, Optional[int], int]] = {}
+
+    def cancel(self):
+        self.watcher.unsubscribe(self)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.cancel()
+
+    def _advance(self, now: float):
+        self.next_due += self.interval
+        if self.next_due <= now:
+            # 落后太多时跳过错过的周期，保持固定节奏而不是连续补发
+            self.next_due = now + self.interval
+
+    def _diff(self, results: Dict[PropKey, dict]) -> List[PropertyChange]:
+        changes = []
+        for key in self.keys:
+            ret = results.get(key)
+            if ret is None:
+                continue
+            value = ret.get("value")
+            update_time = ret.get("updateTime")
+            code = ret.get("code", 0)
+            prev = self._last.get(key)
+            if prev is not None:
+                prev_value, prev_update_time, prev_code = prev
+                if update_time is not None and update_time == prev_update_time and code == prev_code:
+                    continue
+                if value == prev_value and code == prev_code:
+                    self._last[key] = (value, update_time, code)
+                    continue
+            self._last[key] = (value, update_time, code)
+            changes.append(PropertyChange(
+                did=key[0],
+                name=self.names.get(key),
+                siid=key[1],
+                piid=key[2],
+                value=value,
+                update_time=update_time,
+                code=code,
+                previous=prev[0] if prev is not None else None,
+            ))
+        return changes
+
+
+class PropertyWatcher:
+    """
+    Shared property poller.
+
+    All subscriptions are served by a single background thread that is started
+    on the first subscribe() and exits when the last subscription is cancelled.
+    On each tick the keys of every due subscription are merged and read with
+    batched prop/get calls; each subscriber then receives only the values that
+    changed since its previous delivery.
+    """
+
+    def __init__(self, api, batch_size: int = 100):
+        self.api = api
+        self.batch_size = batch_size
+        self._subs: List[WatchSubscription] = []
+        self._cond = threading.Condition()
+        self._thread: Optional[threading.Thread] = None
+        self._prop_tables: Dict[str, Dict[str, DevProp]] = {}
+        self._models: Optional[Dict[str, str]] = None
+
+    def add_device(self, did: str, prop_list: Dict[str, DevProp]):
+        """Register an already loaded spec so that names for this did resolve without a device list lookup"""
+        self._prop_tables[did] = prop_list
+
+    def _prop_table(self, did: str) -> Dict[str, DevProp]:
+        if did in self._prop_tables:
+            return self._prop_tables[did]
+        if self._models is None or did not in self._models:
+            self._models = {device["did"]: device["model"] for device in self.api.get_devices_list()}
+        if did not in self._models:
+            raise ValueError(f"未找到 did 为 '{did}' 的设备")
+        dev_info = get_device_info(self._models[did], cache_path=self.api.auth_data_path.parent)
+        self._prop_tables[did] = _build_prop_list(dev_info)
+        return self._prop_tables[did]
+
+    def _resolve(self, item: Union[Tuple[str, str], Tuple[str, int, int]]) -> Tuple[PropKey, Optional[str]]:
+        if len(item) == 3:
+            did, siid, piid = item
+            return (str(did), int(siid), int(piid)), None
+        did, name = item
+        did = str(did)
+        table = self._prop_table(did)
+        if name not in table:
+            raise ValueError(f"不支持的属性: {name}, 可用属性: {list(table.keys())}")
+        prop = table[name]
+        if "r" not in prop.rw:
+            raise ValueError(f"属性 {name} 不可读取")
+        return (did, prop.method["siid"], prop.method["piid"]), name
+
+    def subscribe(
+            self,
+            props: Iterable[Union[Tuple[str, str], Tuple[str, int, int]]],
+            interval: float,
+            callback: Callable[[List[PropertyChange]], None],
+    ) -> WatchSubscription:
+        if interval <= 0:
+            raise ValueError(f"无效的轮询间隔: {interval}")
+        keys = []
+        names = {}
+        for item in props:
+            key, name = self._resolve(item)
+            if key not in names:
+                keys.append(key)
+                names[key] = name
+        if not keys:
+            raise ValueError("至少需要订阅一个属性")
+        sub = WatchSubscription(self, keys, names, interval, callback)
+        with self._cond:
+            self._subs.append(sub)
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="mijiaAPI-watch", daemon=True)
+                self._thread.start()
+            self._cond.notify()
+        logger.debug(f"新增属性订阅: {len(keys)} 个属性, 间隔 {interval}s")
+        return sub
+
+    def unsubscribe(self, sub: WatchSubscription):
+        with self._cond:
+            sub.active = False
+            if sub in self._subs:
+                self._subs.remove(sub)
+            self._cond.notify()
+
+    def close(self):
+        with self._cond:
+            for sub in self._subs:
+                sub.active = False
+            self._subs.clear()
+            self._cond.notify()
+
+    def fetch(self, keys: Iterable[PropKey]) -> Dict[PropKey, dict]:
+        """Read keys with as few prop/get calls as batch_size allows"""
+        keys = list(dict.fromkeys(keys))
+        results = {}
+        for start in range(0, len(keys), self.batch_size):
+            chunk = keys[start:start + self.batch_size]
+            try:
+                ret = self.api.get_devices_prop([
+                    {"did": did, "siid": siid, "piid": piid} for did, siid, piid in chunk
+                ])
+            except APIError as e:
+                logger.warning(f"批量获取订阅属性失败: {e}")
+                continue
+            for item in ret:
+                results[(str(item["did"]), int(item["siid"]), int(item["piid"]))] = item
+        return results
+
+    def poll(self, subs: List[WatchSubscription]):
+        """Read the union of keys for subs once and deliver changes to each of them"""
+        results = self.fetch(key for sub in subs for key in sub.keys)
+        for sub in subs:
+            if not sub.active:
+                continue
+            changes = sub._diff(results)
+            if not changes:
+                continue
+            try:
+                sub.callback(changes)
+            except Exception as e:
+                logger.error(f"属性订阅回调出错: {e}")
+
+    def _run(self):
+        fails = 0
+        try:
+            while True:
+                with self._cond:
+                    if not self._subs:
+                        self._thread = None
+                        return
+                    now = time.monotonic()
+                    due = [sub for sub in self._subs if sub.next_due <= now]
+                    if not due:
+                        self._cond.wait(min(sub.next_due for sub in self._subs) - now)
+                        continue
+                try:
+                    self.poll(due)
+                except Exception as e:
+                    # 网络错误或登录失效不能让共享线程退出，退避后重试
+                    fails += 1
+                    logger.warning(f"轮询订阅属性失败 (连续 {fails} 次): {e!r}")
+                    now = time.monotonic()
+                    for sub in due:
+                        sub.next_due = now + min(MAX_BACKOFF, sub.interval * 2 ** fails)
+                    continue
+                fails = 0
+                now = time.monotonic()
+                for sub in due:
+                    sub._advance(now)
+        finally:
+            # 线程意外退出时允许下一次 subscribe() 重新启动
+            with self._cond:
+                if self._thread is threading.current_thread():
+                    self._thread = None
@@ -0,0 +1,76 @@
+"""
+统计数据回填测试
+"""
+import json
+import threading
+
+from mijiaAPI import statistics
+from mijiaAPI.backfill import BackfillJob, BackfillProgress, BackfillRunner
+from mijiaAPI.errors import APIError
+from mijiaAPI.statistics import StatisticsStore
+
+
+HOUR = 3600
+NOW = 1000 * HOUR
+
+
+class FakeAPI:
+    def __init__(self, fail_did=None, stop_after=None, runner=None):
+        self.requests = []
+        self.fail_did = fail_did
+        self.stop_after = stop_after
+        self.runner = runner
+        self.lock = threading.Lock()
+
+    def get_statistics(self, data):
+        with self.lock:
+            self.requests.append((data["did"], data["time_start"]))
+            if self.stop_after is not None and len(self.requests) >= self.stop_after:
+                self.runner.stop()
+        if data["did"] == self.fail_did:
+            raise APIError(-1, "failed")
+        return [{"time": t, "value": "[1]"} for t in range(data["time_start"], data["time_end"] + 1, HOUR)]
+
+
+def make_runner(tmp_path, api, **kwargs):
+    store = StatisticsStore(tmp_path / "stats", limit=100)
+    return BackfillRunner(api, store, tmp_path / "backfill.json", max_workers=3, rate=1000,
+                          checkpoint_interval=0, **kwargs)
+
+
+def test_backfill_with_failures(tmp_path, monkeypatch):
+    monkeypatch.setattr(statistics.time, "time", lambda: NOW)
+    api = FakeAPI(fail_did="3")
+    runner = make_runner(tmp_path, api, retries=1)
+    job = BackfillJob(["1", "2", "3"], "7.1", "stat_hour_v3", 0, 500 * HOUR)
+    progress = runner.run(job)
+    assert (progress.total, progress.done, progress.failed) == (15, 10, 5)
+    assert progress.requests == 20 and progress.eta == 0
+    state = json.loads((tmp_path / "backfill.json").read_text(encoding="utf-8"))
+    assert state["finished"] and len(state["failed"]["3"]) == 5
+    times, values = runner.store.query("2", "7.1", "stat_hour_v3", 0, 500 * HOUR)
+    assert len(times) == 500 and sum(values) == 500
+
+
+def test_resume_after_stop(tmp_path, monkeypatch):
+    monkeypatch.setattr(statistics.time, "time", lambda: NOW)
+    api = FakeAPI(stop_after=4)
+    runner = make_runner(tmp_path, api)
+    api.runner = runner
+    runner.max_workers = 1
+    progress = runner.run(BackfillJob(["1", "2"], "7.1", "stat_hour_v3", 0, 600 * HOUR))
+    assert progress.done == 4 and progress.total == 12
+
+    # 新进程中恢复，已完成的窗口不再请求
+    api = FakeAPI()
+    resumed = make_runner(tmp_path, api)
+    progress = resumed.resume()
+    assert progress.total == 8 and progress.done == 8
+    assert not set(api.requests) & {("1", 0), ("1", 100 * HOUR)}
+    assert resumed.resume() is None
+
+
+def test_progress_eta():
+    progress = BackfillProgress(total=10, done=5)
+    progress.started_at -= 5
+    assert 4 < progress.eta < 6
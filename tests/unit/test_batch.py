@@ -0,0 +1,184 @@
+"""
+JSONL 批量命令测试
+"""
+import io
+import json
+import threading
+from pathlib import Path
+
+import mijiaAPI.batch as batch
+import mijiaAPI.bulk as bulk
+
+
+LAMP_INFO = {
+    "name": "Lamp",
+    "model": "test.light.lamp",
+    "properties": [
+        {"name": "on", "description": "", "type": "bool", "rw": "rw", "unit": None,
+         "range": None, "value-list": None, "method": {"siid": 2, "piid": 1}},
+        {"name": "brightness", "description": "", "type": "uint", "rw": "rw", "unit": "percentage",
+         "range": [1, 100, 1], "value-list": None, "method": {"siid": 2, "piid": 2}},
+    ],
+    "actions": [
+        {"name": "toggle", "description": "", "method": {"siid": 2, "aiid": 1}},
+    ],
+}
+
+
+class FakeAPI:
+    auth_data_path = Path("/nonexistent/auth.json")
+
+    def __init__(self):
+        self.calls = []
+        self.lock = threading.Lock()
+        self.values = {("1", 2, 1): True, ("1", 2, 2): 40, ("2", 2, 1): False, ("2", 2, 2): 80}
+
+    def get_devices_list(self):
+        with self.lock:
+            self.calls.append("list")
+        return [{"did": "1", "name": "lamp", "model": "test.light.lamp"},
+                {"did": "2", "name": "desk", "model": "test.light.lamp"}]
+
+    def get_shared_devices_list(self):
+        return []
+
+    def get_devices_prop(self, params):
+        with self.lock:
+            self.calls.append(("get", len(params)))
+        return [{**p, "code": 0, "value": self.values[(p["did"], p["siid"], p["piid"])]} for p in params]
+
+    def set_devices_prop(self, params):
+        with self.lock:
+            self.calls.append(("set", len(params)))
+        return [{**p, "code": 0} for p in params]
+
+    def run_action(self, params):
+        with self.lock:
+            self.calls.append(("action", len(params)))
+        return [{**p, "code": 0} for p in params]
+
+    def get_scenes_list(self):
+        return [{"scene_id": "s1", "name": "home", "home_id": "h1"}]
+
+    def run_scene(self, scene_id, home_id):
+        return True
+
+
+def run(monkeypatch, commands, **kwargs):
+    monkeypatch.setattr(batch, "get_device_info", lambda model, cache_path=None: LAMP_INFO)
+    monkeypatch.setattr(bulk, "get_device_info", lambda model, cache_path=None: LAMP_INFO)
+    api = FakeAPI()
+    out = io.StringIO()
+    stream = io.StringIO("\n".join(c if isinstance(c, str) else json.dumps(c) for c in commands))
+    counters = batch.run_batch(api, stream, out, **kwargs)
+    results = {r["line"]: r for r in map(json.loads, out.getvalue().splitlines())}
+    return api, counters, results
+
+
+def test_reads_and_writes_are_batched(monkeypatch):
+    api, counters, results = run(monkeypatch, [
+        {"op": "get", "dev_name": "lamp", "prop_name": ["on", "brightness"], "id": "a"},
+        {"op": "get", "did": "2", "prop_name": "brightness"},
+        {"op": "set", "dev_name": "desk", "values": {"on": True, "brightness": "60"}},
+        {"op": "action", "did": "1", "action": "toggle"},
+        {"op": "scene", "scene": "home"},
+    ])
+    assert counters == {"commands": 5, "ok": 5, "failed": 0}
+    assert api.calls.count("list") == 1
+    assert sorted(c for c in api.calls if c != "list") == [("action", 1), ("get", 3), ("set", 2)]
+    assert results[1] == {"line": 1, "op": "get", "id": "a", "did": "1", "name": "lamp", "ok": True,
+                          "values": {"on": True, "brightness": 40}, "errors": {}}
+    assert results[2]["values"] == {"brightness": 80}
+    assert results[3]["codes"] == {"on": 0, "brightness": 0}
+    assert results[5]["scene_id"] == "s1"
+
+
+def test_chunking_and_errors(monkeypatch):
+    api, counters, results = run(monkeypatch, [
+        {"op": "get", "did": "1", "prop_name": ["on", "brightness"]},
+        {"op": "get", "did": "2", "prop_name": ["on", "nope"]},
+        {"op": "set", "did": "1", "prop_name": "brightness", "value": 500},
+        {"op": "get", "dev_name": "missing", "prop_name": "on"},
+        "not json",
+        {"op": "reboot"},
+    ], chunk_size=2)
+    assert counters == {"commands": 6, "ok": 1, "failed": 5}
+    assert ("get", 2) in api.calls and ("get", 1) in api.calls
+    assert not any(c[0] == "set" for c in api.calls if c != "list")
+    assert results[2]["values"] == {"on": False} and "nope" in results[2]["errors"]
+    assert "超出数值范围" in results[3]["errors"]["brightness"]
+    assert "未找到" in results[4]["error"]
+    assert "JSON" in results[5]["error"]
+    assert "op" in results[6]["error"]
+
+
+def test_malformed_commands_do_not_abort_the_batch(monkeypatch):
+    api, counters, results = run(monkeypatch, [
+        {"op": "set", "did": "1", "values": [1]},
+        {"op": "get", "did": "1", "prop_name": 5},
+        {"op": "get", "did": ["1"], "prop_name": "on"},
+        {"op": "action", "did": "1", "action": {"name": "toggle"}},
+        {"op": "get", "did": "1", "prop_name": "on"},
+    ])
+    assert counters == {"commands": 5, "ok": 1, "failed": 4}
+    assert "values" in results[1]["error"]
+    assert "prop_name" in results[2]["error"]
+    assert "did" in results[3]["error"]
+    assert "action" in results[4]["error"]
+    assert results[5]["values"] == {"on": True}
+
+
+def test_missing_results_are_reported(monkeypatch):
+    monkeypatch.setattr(FakeAPI, "get_devices_prop", lambda self, params: [{"code": 0, "value": True}])
+    api, counters, results = run(monkeypatch, [
+        {"op": "get", "did": "1", "prop_name": "on"},
+        {"op": "get", "did": "2", "prop_name": "on"},
+    ])
+    assert counters == {"commands": 2, "ok": 1, "failed": 1}
+    assert "未返回" in results[2]["errors"]["on"]
+
+
+def test_input_is_consumed_in_windows(monkeypatch):
+    monkeypatch.setattr(batch, "get_device_info", lambda model, cache_path=None: LAMP_INFO)
+    api = FakeAPI()
+    emitted = []
+
+    def commands():
+        for line in range(1, 6):
+            yield line, {"op": "get", "did": "1", "prop_name": "on"}
+
+    # 窗口大小限制每次合并的命令数
+    runner = batch.BatchRunner(api, emitted.append, window=3, idle=5)
+    assert runner.run(commands()) == {"commands": 5, "ok": 5, "failed": 0}
+    assert [c for c in api.calls if c != "list"] == [("get", 3), ("get", 2)]
+
+
+def test_results_flow_while_input_is_blocked(monkeypatch):
+    monkeypatch.setattr(batch, "get_device_info", lambda model, cache_path=None: LAMP_INFO)
+    api = FakeAPI()
+    emitted = []
+    first_results = threading.Event()
+    release = threading.Event()
+
+    def emit(result):
+        emitted.append(result)
+        if len(emitted) == 2:
+            first_results.set()
+
+    def commands():
+        # 模拟通过管道缓慢写入命令的脚本：前两条之后长时间没有输入
+        yield 1, {"op": "get", "did": "1", "prop_name": "on"}
+        yield 2, {"op": "get", "did": "2", "prop_name": "on"}
+        release.wait(5)
+        yield 3, {"op": "get", "did": "1", "prop_name": "brightness"}
+
+    runner = batch.BatchRunner(api, emit, window=1000, idle=0.05)
+    thread = threading.Thread(target=runner.run, args=(commands(),))
+    thread.start()
+    try:
+        assert first_results.wait(2)
+        assert sorted(r["line"] for r in emitted) == [1, 2]
+    finally:
+        release.set()
+        thread.join(5)
+    assert sorted(r["line"] for r in emitted) == [1, 2, 3]
@@ -0,0 +1,86 @@
+"""
+批量属性设置校验测试
+"""
+from pathlib import Path
+
+import mijiaAPI.bulk as bulk
+
+
+LAMP_INFO = {
+    "name": "Lamp",
+    "model": "test.light.lamp",
+    "properties": [
+        {"name": "on", "description": "", "type": "bool", "rw": "rw", "unit": None,
+         "range": None, "value-list": None, "method": {"siid": 2, "piid": 1}},
+        {"name": "brightness", "description": "", "type": "uint", "rw": "rw", "unit": "percentage",
+         "range": [1, 100, 1], "value-list": None, "method": {"siid": 2, "piid": 2}},
+        {"name": "color-temperature", "description": "", "type": "uint", "rw": "rw", "unit": "kelvin",
+         "range": [2700, 6500, 100], "value-list": None, "method": {"siid": 2, "piid": 3}},
+        {"name": "mode", "description": "", "type": "uint", "rw": "rw", "unit": None, "range": None,
+         "value-list": [{"value": 0, "description": "a"}, {"value": 1, "description": "b"}],
+         "method": {"siid": 2, "piid": 4}},
+        {"name": "fault", "description": "", "type": "uint", "rw": "r", "unit": None,
+         "range": None, "value-list": None, "method": {"siid": 2, "piid": 5}},
+    ],
+    "actions": [],
+}
+
+
+class FakeAPI:
+    auth_data_path = Path("/nonexistent/auth.json")
+
+    def __init__(self):
+        self.sent = []
+
+    def get_devices_list(self):
+        return [{"did": "1", "model": "test.light.lamp"}, {"did": "2", "model": "test.light.lamp"}]
+
+    def set_devices_prop(self, params):
+        self.sent.append(params)
+        return [{"did": p["did"], "siid": p["siid"], "piid": p["piid"], "code": 0} for p in params]
+
+
+def _patch_spec(monkeypatch):
+    monkeypatch.setattr(bulk, "get_device_info", lambda model, cache_path=None: LAMP_INFO)
+
+
+def test_broadcast_scalar_value(monkeypatch):
+    _patch_spec(monkeypatch)
+    plan = bulk.prepare_bulk_set(FakeAPI(), ["1", "2"], "brightness", "60")
+    assert not plan.rejected
+    assert plan.params == [
+        {"did": "1", "siid": 2, "piid": 2, "value": 60},
+        {"did": "2", "siid": 2, "piid": 2, "value": 60},
+    ]
+
+
+def test_rejects_with_reasons(monkeypatch):
+    _patch_spec(monkeypatch)
+    plan = bulk.prepare_bulk_set(
+        FakeAPI(),
+        ["1", "2", "3", "1", "2", "1", "2"],
+        ["brightness", "color_temperature", "on", "mode", "fault", "nope", "on"],
+        [101, 2750, True, 2, 0, 1, "yes"],
+    )
+    assert plan.params == []
+    reasons = {r.row: r.reason for r in plan.rejected}
+    assert "超出数值范围" in reasons[0]
+    assert "步长" in reasons[1]
+    assert "未找到" in reasons[2]
+    assert "无效值" in reasons[3]
+    assert "不可写入" in reasons[4]
+    assert "不支持的属性" in reasons[5]
+    assert "无效布尔值" in reasons[6]
+
+
+def test_bulk_set_maps_results_to_rows(monkeypatch):
+    _patch_spec(monkeypatch)
+    api = FakeAPI()
+    results, rejected = bulk.bulk_set_devices_prop(
+        api, ["1", "2", "1"], ["on", "brightness", "brightness"], [True, 0, 50], chunk_size=1,
+    )
+    assert len(api.sent) == 2
+    assert results[0]["piid"] == 1
+    assert results[1] is None
+    assert results[2]["piid"] == 2
+    assert [r.row for r in rejected] == [1]
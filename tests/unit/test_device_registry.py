@@ -0,0 +1,120 @@
+"""
+设备注册表测试
+"""
+import threading
+
+from ui.desktop.core.device import Device, DeviceType
+from ui.desktop.core.device_registry import DeviceRegistry
+
+
+def make_devices():
+    return [
+        Device(id="a", type=DeviceType.MIJIA_SWITCH, did="wall.s2", model="lumi.switch"),
+        Device(id="b", type=DeviceType.MIJIA_SWITCH, did="wall.s3", model="lumi.switch"),
+        Device(id="c", type=DeviceType.MIJIA_LIGHT, did="lamp", model="yeelink.light"),
+        Device(id="d", type=DeviceType.LIGHT, ip="192.168.1.2"),
+    ]
+
+
+def test_indexes():
+    registry = DeviceRegistry(make_devices())
+    assert registry.get_by_did("wall.s3").id == "b"
+    assert [d.id for d in registry.get_by_real_did("wall")] == ["a", "b"]
+    assert [d.id for d in registry.get_by_type(DeviceType.LIGHT)] == ["d"]
+    assert [d.id for d in registry.get_by_model("lumi.switch")] == ["a", "b"]
+
+    registry.update(registry.get("c"), did="lamp2")
+    assert registry.get_by_did("lamp") is None
+    assert registry.get_by_did("lamp2").id == "c"
+
+    registry.remove("a")
+    assert [d.id for d in registry.get_by_real_did("wall")] == ["b"]
+    assert "a" not in registry
+
+
+def test_snapshot_is_not_affected_by_writes():
+    registry = DeviceRegistry(make_devices())
+    snapshot = registry.snapshot()
+    version = registry.version
+    registry.add(Device(id="e", type=DeviceType.SENSOR))
+    registry.remove("d")
+    assert list(snapshot.devices) == ["a", "b", "c", "d"]
+    assert [d.id for d in registry.all()] == ["a", "b", "c", "e"]
+    assert registry.version == version + 2
+
+
+def test_replace_state_swaps_data():
+    registry = DeviceRegistry(make_devices())
+    device = registry.get("c")
+    old = device.data
+    status = {"power": "on"}
+    version = registry.version
+    registry.replace_state(device, data=status, online=True)
+    assert device.data == {"power": "on"} and device.data is not status
+    assert old == {}
+    assert device.online
+    assert registry.version == version + 1
+
+
+def test_state_change_reports_diff():
+    registry = DeviceRegistry(make_devices())
+    device = registry.get("c")
+    registry.mark_online(device, {"power": "on", "brightness": 50})
+    data, version = device.data, registry.version
+
+    # 相同的值不产生变化，不替换字典，版本不变
+    change = registry.mark_online(device, {"power": "on", "brightness": 50})
+    assert not change
+    assert device.data is data
+    assert registry.version == version
+
+    change = registry.mark_online(device, {"power": "off"})
+    assert change.changed == {"power", "brightness"}
+    assert not change.online_changed
+    assert change.version == device.state_version
+    assert registry.version == version + 1
+
+    # 连续失败达到上限才标记离线
+    assert not registry.mark_failed(device)
+    assert not registry.mark_failed(device)
+    change = registry.mark_failed(device)
+    assert change.online_changed and not change.changed
+    assert not device.online
+
+
+def test_status_text_follows_state_version():
+    device = Device(id="a", type=DeviceType.LIGHT)
+    assert device.get_status_text() == "离线"
+    device.apply_state(data={"power": "on"}, online=True)
+    assert device.get_status_text() == "已开启"
+    device.apply_state(data={"power": "off"})
+    assert device.get_status_text() == "已关闭"
+    # 直接赋值的状态也不会读到旧的缓存
+    device.data = {"power": "on"}
+    assert device.get_status_text() == "已开启"
+
+
+def test_concurrent_writers_and_readers():
+    registry = DeviceRegistry()
+    errors = []
+
+    def writer(start):
+        for i in range(start, start + 200):
+            registry.add(Device(id=str(i), type=DeviceType.SENSOR))
+
+    def reader():
+        try:
+            for _ in range(200):
+                for device in registry.all():
+                    registry.get(device.id)
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=writer, args=(i * 1000,)) for i in range(3)]
+    threads += [threading.Thread(target=reader) for _ in range(2)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert errors == []
+    assert len(registry) == 600
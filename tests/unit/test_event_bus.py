@@ -0,0 +1,188 @@
+"""
+设备事件总线测试
+"""
+import threading
+import time
+
+from ui.desktop.core.device import Device, DeviceType, StateChange
+from ui.desktop.core.device_manager import DeviceManager
+from ui.desktop.core.event_bus import (
+    DeviceStateChanged,
+    EventBus,
+    OnlineChanged,
+    PowerChanged,
+    SensorReading,
+)
+
+
+class ManualDispatch:
+    """模拟 Tk 的 after(0, drain)：记录待执行的批次，由测试手动执行"""
+
+    def __init__(self):
+        self.scheduled = []
+
+    def __call__(self, drain):
+        self.scheduled.append(drain)
+
+    def run(self):
+        scheduled, self.scheduled = self.scheduled, []
+        for drain in scheduled:
+            drain()
+
+
+def make_device(device_id="a", visible=True):
+    return Device(id=device_id, type=DeviceType.MIJIA_SWITCH, did=f"{device_id}.s2", visible=visible)
+
+
+def test_topics_and_filters():
+    bus = EventBus()
+    dispatch = ManualDispatch()
+    power, everything = [], []
+    bus.subscribe(power.append, topics=(PowerChanged,), where=lambda e: e.device.visible, dispatch=dispatch)
+    bus.subscribe(everything.append, dispatch=dispatch)
+
+    a, hidden = make_device("a"), make_device("b", visible=False)
+    bus.publish(PowerChanged(a, True, False), PowerChanged(hidden, True, False), OnlineChanged(a, True))
+    dispatch.run()
+    assert [(e.device_id, type(e)) for e in power] == [("a", PowerChanged)]
+    assert len(everything) == 3
+
+
+def test_batched_dispatch_coalesces_superseded_events():
+    bus = EventBus()
+    dispatch = ManualDispatch()
+    received = []
+    subscription = bus.subscribe(received.append, dispatch=dispatch)
+    a, b = make_device("a"), make_device("b")
+
+    bus.publish(DeviceStateChanged(a, StateChange("a", 1, frozenset({"power"}))))
+    bus.publish(DeviceStateChanged(b, StateChange("b", 1, online_changed=True)))
+    bus.publish(DeviceStateChanged(a, StateChange("a", 2, frozenset({"brightness"}))))
+    bus.publish(PowerChanged(a, True, False), PowerChanged(a, False, True))
+    bus.publish(SensorReading(a, {"temperature": 20}), SensorReading(a, {"humidity": 40}))
+
+    # 一批只调度一次，同一设备的同类事件合并为一个
+    assert len(dispatch.scheduled) == 1
+    dispatch.run()
+    states = [e for e in received if isinstance(e, DeviceStateChanged)]
+    assert [e.device_id for e in states] == ["a", "b"]
+    assert states[0].change.changed == {"power", "brightness"}
+    assert states[0].change.version == 2
+    power = next(e for e in received if isinstance(e, PowerChanged))
+    assert power.is_on is False and power.previous is False
+    reading = next(e for e in received if isinstance(e, SensorReading))
+    assert reading.readings == {"temperature": 20, "humidity": 40}
+    assert subscription.stats()["coalesced"] == 3
+
+
+def test_bounded_queue_drops_oldest():
+    bus = EventBus()
+    dispatch = ManualDispatch()
+    received = []
+    subscription = bus.subscribe(received.append, dispatch=dispatch, max_pending=2, coalesce=False)
+    a = make_device("a")
+    for is_on in (True, False, True):
+        bus.publish(PowerChanged(a, is_on, not is_on))
+    dispatch.run()
+    assert [e.is_on for e in received] == [False, True]
+    assert subscription.stats()["dropped"] == 1
+
+
+def test_worker_delivery_does_not_block_publisher():
+    bus = EventBus()
+    release = threading.Event()
+    done = threading.Event()
+    received = []
+
+    def slow(event):
+        release.wait(2)
+        received.append(event)
+        if len(received) == 2:
+            done.set()
+
+    bus.subscribe(slow, topics=(OnlineChanged,), coalesce=False)
+    a = make_device("a")
+    bus.publish(OnlineChanged(a, True))
+    bus.publish(OnlineChanged(a, False))
+    assert received == []
+    release.set()
+    assert done.wait(2)
+    assert [e.online for e in received] == [True, False]
+    bus.close()
+
+
+class FakeConfig:
+    def __init__(self, devices):
+        self.devices = devices
+        self.logs = []
+
+    def get_notification_config(self):
+        return {}
+
+    def get_notification_rules(self):
+        return {}
+
+    def is_status_log_enabled(self):
+        return True
+
+    def add_status_log(self, log):
+        self.logs.append(log)
+
+    def get_mijia_auth_path(self):
+        return "/nonexistent/auth.json"
+
+    def is_spec_revalidation_enabled(self):
+        return False
+
+    def get_devices(self):
+        return self.devices
+
+
+def test_manager_publishes_typed_events():
+    manager = DeviceManager(FakeConfig([
+        {"id": "a", "name": "A", "type": "mijia_switch", "did": "wall.s2"},
+        {"id": "s", "name": "S", "type": "sensor", "ip": "192.168.1.2"},
+    ]))
+    dispatch = ManualDispatch()
+    received = []
+    manager.events.subscribe(received.append, topics=(OnlineChanged, PowerChanged, SensorReading),
+                             dispatch=dispatch, coalesce=False)
+
+    a = manager.get_device("a")
+    manager._apply_mijia_status(a, {"online": True, "power": "on"})
+    manager._apply_mijia_status(a, {"online": True, "power": "on"})
+    manager.update_device_state("a", power="off")
+    sensor = manager.get_device("s")
+    manager._publish_change(sensor, manager._registry.mark_online(sensor, {"temperature": 25.0, "wifi_signal": -50}))
+    dispatch.run()
+
+    assert [(type(e).__name__, e.device_id) for e in received] == [
+        ("OnlineChanged", "a"), ("PowerChanged", "a"), ("PowerChanged", "a"),
+        ("OnlineChanged", "s"), ("SensorReading", "s"),
+    ]
+    assert (received[1].is_on, received[1].previous) == (True, None)
+    assert (received[2].is_on, received[2].previous) == (False, True)
+    assert received[4].readings == {"temperature": 25.0}
+
+    # 状态记录在自己的工作线程中处理，首次读取到的状态不记录
+    deadline = time.monotonic() + 2
+    while not manager._config.logs and time.monotonic() < deadline:
+        time.sleep(0.01)
+    manager.events.close()
+    assert [log["action"] for log in manager._config.logs] == ["关闭"]
+
+
+def test_unavailable_mijia_poll_publishes_offline():
+    manager = DeviceManager(FakeConfig([{"id": "a", "name": "A", "type": "mijia_switch", "did": "wall.s2"}]))
+    dispatch = ManualDispatch()
+    received = []
+    manager.events.subscribe(received.append, topics=(OnlineChanged,), dispatch=dispatch, coalesce=False)
+
+    a = manager.get_device("a")
+    manager._apply_mijia_status(a, {"online": True, "power": "on"})
+    # 未登录时轮询失败，连续失败后同样发布离线事件
+    for _ in range(5):
+        assert manager._poll_mijia_device(a) is False
+    dispatch.run()
+    assert [e.online for e in received] == [True, False]
+    manager.events.close()
@@ -0,0 +1,76 @@
+"""
+统计数据表测试
+"""
+import math
+
+import pytest
+
+from mijiaAPI.statistics import StatisticsStore
+
+
+np = pytest.importorskip("numpy")
+
+from mijiaAPI.frame import StatisticsFrame  # noqa: E402
+
+
+HOUR = 3600
+DAY = 86400
+# 2024-01-29 (周一) 00:00 UTC
+MONDAY = 1706486400
+
+HOMES = [{"name": "家", "roomlist": [
+    {"name": "客厅", "dids": ["1", "2"]},
+    {"name": "卧室", "dids": ["3", "9"]},
+]}]
+
+
+def make_frame():
+    hours = np.arange(MONDAY, MONDAY + 10 * DAY, HOUR)
+    return StatisticsFrame.from_series({
+        "1": (hours, np.ones(len(hours))),
+        "2": (hours[::2], np.full(len(hours[::2]), 2.0)),
+        "3": (hours[:24], np.arange(24, dtype=float)),
+    })
+
+
+def test_alignment_and_resample():
+    frame = make_frame()
+    assert frame.values.shape == (3, 240)
+    assert math.isnan(frame["2"][1]) and frame["2"][2] == 2
+    daily = frame.resample("day", utc_offset=0)
+    assert list(daily.times[:2]) == [MONDAY, MONDAY + DAY]
+    assert list(daily["1"]) == [24] * 10 and daily["2"][0] == 24
+    assert daily["3"][0] == sum(range(24)) and math.isnan(daily["3"][1])
+    weekly = frame.resample("week", utc_offset=0)
+    assert list(weekly.times) == [MONDAY, MONDAY + 7 * DAY] and list(weekly["1"]) == [168, 72]
+    assert frame.resample("day", how="max", utc_offset=0)["3"][0] == 23
+    assert frame.resample("day", how="mean", utc_offset=0)["2"][0] == 2
+    monthly = frame.resample("month", utc_offset=0)
+    assert len(monthly.times) == 2 and monthly["1"].sum() == 240
+    # 东八区的一天从 UTC 16:00 开始
+    assert frame.resample("day", utc_offset=8 * HOUR).times[0] == MONDAY - 8 * HOUR
+
+
+def test_rollup_and_export(tmp_path):
+    daily = make_frame().resample("day", utc_offset=0)
+    rooms = daily.rollup_rooms(HOMES)
+    assert rooms.labels == ["家/客厅", "家/卧室"]
+    assert rooms["家/客厅"][0] == 48 and rooms["家/卧室"][0] == sum(range(24))
+    assert math.isnan(rooms["家/卧室"][1])
+    assert daily.rollup_homes(HOMES).totals()["家"] == 240 + 240 + sum(range(24))
+
+    path = tmp_path / "frame.npz"
+    rooms.save(path)
+    loaded = StatisticsFrame.load(path)
+    assert loaded.labels == rooms.labels
+    np.testing.assert_array_equal(loaded.values, rooms.values)
+
+
+def test_from_store_and_statistics(tmp_path):
+    store = StatisticsStore(tmp_path)
+    store.add_points("1", "7.1", "stat_day_v3", 0, 3 * DAY,
+                     [{"time": t, "value": "[1.5]"} for t in (0, DAY, 2 * DAY)], now=10 * DAY)
+    frame = StatisticsFrame.from_store(store, ["1"], "7.1", "stat_day_v3", 0, 3 * DAY)
+    assert list(frame["1"]) == [1.5, 1.5, 1.5]
+    raw = StatisticsFrame.from_statistics({"1": [{"time": DAY, "value": "[2]"}, {"time": 0, "value": "[1]"}]})
+    assert list(raw.times) == [0, DAY] and list(raw["1"]) == [1, 2]
@@ -0,0 +1,99 @@
+"""
+界面帧调度测试
+"""
+import threading
+
+from ui.desktop.ui.frame_scheduler import FrameScheduler
+
+
+class FakeAfter:
+    """模拟 Tk 的 after：记录回调，由测试手动执行"""
+
+    def __init__(self):
+        self.calls = []
+
+    def __call__(self, ms, func):
+        self.calls.append((ms, func))
+
+    def run(self):
+        calls, self.calls = self.calls, []
+        for _, func in calls:
+            func()
+
+
+def make_scheduler():
+    after = FakeAfter()
+    rendered = []
+    scheduler = FrameScheduler(
+        after,
+        render_devices=lambda ids: rendered.append(("devices", ids)),
+        render_grid=lambda: rendered.append(("grid",)),
+    )
+    return scheduler, after, rendered
+
+
+def test_updates_are_merged_into_one_frame():
+    scheduler, after, rendered = make_scheduler()
+
+    threads = [
+        threading.Thread(target=scheduler.mark_dirty, args=([f"d{i}", "d0"],))
+        for i in range(60)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    scheduler.request_grid_refresh()
+    scheduler.request_grid_refresh()
+
+    # 60 个设备的更新和两次网格刷新只调度一次
+    assert len(after.calls) == 1
+    after.run()
+    assert rendered[0] == ("grid",)
+    assert rendered[1][0] == "devices" and len(rendered[1][1]) == 60
+    assert len(rendered) == 2
+
+    stats = scheduler.stats()
+    assert (stats["frames"], stats["devices"], stats["grids"]) == (1, 60, 1)
+    assert stats["max_ms"] >= stats["last_ms"] >= 0
+
+
+def test_frames_are_rate_limited():
+    scheduler, after, rendered = make_scheduler()
+    scheduler.mark_dirty(["a"])
+    assert after.calls[0][0] == 0
+    after.run()
+
+    # 上一帧刚结束，下一帧等到帧间隔之后
+    scheduler.mark_dirty(["b"])
+    assert 50 < after.calls[0][0] <= 100
+    after.run()
+    assert rendered == [("devices", ["a"]), ("devices", ["b"])]
+
+
+def test_render_error_does_not_stop_frames():
+    after = FakeAfter()
+
+    def fail(ids):
+        raise RuntimeError("widget destroyed")
+
+    scheduler = FrameScheduler(after, render_devices=fail, render_grid=lambda: None)
+    scheduler.mark_dirty(["a"])
+    after.run()
+    scheduler.mark_dirty(["a"])
+    assert len(after.calls) == 1
+    assert scheduler.stats()["frames"] == 1
+
+
+def test_after_is_called_outside_the_lock():
+    # Tk 的 after() 在工作线程中调用时会等待主线程，而主线程可能正在 _flush 中等待调度器的锁
+    completed = []
+
+    def blocking_after(ms, func):
+        main = threading.Thread(target=lambda: completed.append(scheduler.stats()))
+        main.start()
+        main.join(1)
+
+    scheduler = FrameScheduler(blocking_after, render_devices=lambda ids: None, render_grid=lambda: None)
+    scheduler.mark_dirty(["a"])
+    assert len(completed) == 1
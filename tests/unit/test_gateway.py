@@ -0,0 +1,185 @@
+"""
+常驻网关测试
+"""
+import http.client
+import json
+import stat
+import threading
+import time
+from pathlib import Path
+
+import pytest
+
+import mijiaAPI.batch as batch
+from mijiaAPI.cache import PropertyCache
+from mijiaAPI.freshness import FreshnessStats
+from mijiaAPI.gateway import (
+    TOKEN_HEADER,
+    Gateway,
+    GatewayClient,
+    GatewayError,
+    ReadCoalescer,
+    RemoteAPI,
+    _GatewayHandler,
+    _TCPGatewayServer,
+    _write_token,
+)
+
+
+LAMP_INFO = {
+    "name": "Lamp",
+    "model": "test.light.lamp",
+    "properties": [
+        {"name": "on", "description": "", "type": "bool", "rw": "rw", "unit": None,
+         "range": None, "value-list": None, "method": {"siid": 2, "piid": 1}},
+    ],
+    "actions": [],
+}
+
+
+class FakeAPI:
+    auth_data_path = Path("/nonexistent/auth.json")
+
+    def __init__(self, delay: float = 0):
+        self.delay = delay
+        self.prop_cache = None
+        self.freshness_stats = FreshnessStats()
+        self.reads = []
+        self.list_calls = 0
+
+    def enable_prop_cache(self):
+        self.prop_cache = PropertyCache()
+
+    def get_devices_list(self):
+        self.list_calls += 1
+        return [{"did": "1", "name": "lamp", "model": "test.light.lamp"}]
+
+    def get_shared_devices_list(self):
+        return []
+
+    def get_devices_prop(self, params):
+        self.reads.append(len(params))
+        time.sleep(self.delay)
+        ret = [{"did": p["did"], "siid": p["siid"], "piid": p["piid"], "code": 0, "value": True, "updateTime": 1}
+               for p in params]
+        self.prop_cache.store_results(ret)
+        return ret
+
+    def set_devices_prop(self, params):
+        return [{**p, "code": 0} for p in params]
+
+    def run_action(self, params):
+        return [{**p, "code": 0} for p in params]
+
+
+def test_concurrent_reads_are_coalesced():
+    api = FakeAPI(delay=0.2)
+    reader = ReadCoalescer(api)
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(
+        reader.read({"did": "1", "siid": 2, "piid": 1}, freshness="device"))) for _ in range(4)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert api.reads == [1]
+    assert reader.coalesced == 3
+    assert all(r["value"] is True for r in results)
+    # 云端读取在缓存有效期内直接命中缓存
+    assert reader.read([{"did": "1", "siid": 2, "piid": 1}])[0]["value"] is True
+    assert api.reads == [1]
+
+
+@pytest.fixture
+def gateway_server():
+    def start(api):
+        server = _TCPGatewayServer(("127.0.0.1", 0), _GatewayHandler)
+        server.gateway = Gateway(api)
+        server.token = "secret"
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        servers.append(server)
+        return f"http://127.0.0.1:{server.server_address[1]}", server.server_address[1]
+
+    servers = []
+    yield start
+    for server in servers:
+        server.shutdown()
+        server.server_close()
+
+
+def test_client_round_trip(monkeypatch, gateway_server):
+    monkeypatch.setattr(batch, "get_device_info", lambda model, cache_path=None: LAMP_INFO)
+    api = FakeAPI()
+    address, _ = gateway_server(api)
+    remote = RemoteAPI(address, token="secret")
+    assert remote.available
+    assert remote.get_devices_list()[0]["did"] == "1"
+    assert remote.get_devices_list()[0]["did"] == "1"
+    assert api.list_calls == 1
+    assert remote.get_devices_prop({"did": "1", "siid": 2, "piid": 1})["value"] is True
+
+    results = list(GatewayClient(address, token="secret").batch([
+        {"op": "get", "dev_name": "lamp", "prop_name": "on"},
+        {"op": "get", "dev_name": "nobody", "prop_name": "on"},
+    ]))
+    by_line = {r["line"]: r for r in results}
+    assert by_line[1]["values"] == {"on": True}
+    assert not by_line[2]["ok"]
+    # 两次读取中只有第一次请求了云端
+    assert api.reads == [1]
+    assert GatewayClient(address, token="secret").stats()["requests"] == 4
+
+    # 分多次请求发送时行号连续
+    results = GatewayClient(address, token="secret").batch([
+        {"op": "get", "dev_name": "lamp", "prop_name": "on"},
+        "",
+        {"op": "get", "dev_name": "lamp", "prop_name": "on"},
+    ], window=2)
+    assert sorted(r["line"] for r in results) == [1, 3]
+
+
+def _raw_request(port, method, path, headers, body=None):
+    conn = http.client.HTTPConnection("127.0.0.1", port, timeout=5)
+    try:
+        conn.request(method, path, body=body, headers=headers)
+        response = conn.getresponse()
+        return response.status, json.loads(response.read())
+    finally:
+        conn.close()
+
+
+def test_requests_are_authenticated(gateway_server):
+    address, port = gateway_server(FakeAPI())
+    body = json.dumps({"args": [], "kwargs": {}})
+    valid = {"Content-Type": "application/json", TOKEN_HEADER: "secret"}
+
+    assert _raw_request(port, "GET", "/health", {TOKEN_HEADER: "secret"})[0] == 200
+    assert _raw_request(port, "POST", "/call/get_devices_list", valid, body)[0] == 200
+    # 缺少或错误的令牌
+    assert _raw_request(port, "GET", "/health", {})[0] == 403
+    assert _raw_request(port, "GET", "/health", {TOKEN_HEADER: "wrong"})[0] == 403
+    # 浏览器可以发送的请求
+    assert _raw_request(port, "POST", "/call/get_devices_list",
+                        {**valid, "Content-Type": "text/plain"}, body)[0] == 415
+    assert _raw_request(port, "POST", "/call/get_devices_list",
+                        {**valid, "Origin": "http://127.0.0.1"}, body)[0] == 403
+    assert _raw_request(port, "POST", "/call/get_devices_list",
+                        {**valid, "Host": f"evil.example:{port}"}, body)[0] == 403
+    assert _raw_request(port, "GET", "/health", {TOKEN_HEADER: "secret", "Host": f"[::1]:{port}"})[0] == 200
+
+    with pytest.raises(GatewayError):
+        GatewayClient(address, token="wrong").health()
+
+
+def test_client_reads_token_file(tmp_path, gateway_server):
+    address, _ = gateway_server(FakeAPI())
+    token_path = tmp_path / "gateway.token"
+    token_path.write_text("stale")
+    token = _write_token(token_path)
+    assert stat.S_IMODE(token_path.stat().st_mode) == 0o600
+    assert token_path.read_text() == token != "stale"
+
+    token_path.write_text("secret\n")
+    assert GatewayClient(address, token_path=token_path).health()["ok"]
+    with pytest.raises(GatewayError):
+        GatewayClient(address, token_path=tmp_path / "missing").health()
@@ -0,0 +1,69 @@
+"""
+设备网格布局测试
+"""
+from ui.desktop.ui.grid_layout import (
+    SLOT_ADD,
+    SLOT_DEVICE,
+    SLOT_MULTI,
+    WidgetPool,
+    group_multi_switches,
+    layout_slots,
+    multi_switch_card_data,
+    visible_rows,
+)
+
+
+def device(device_id, did="", name="", is_on=False):
+    return {"id": device_id, "did": did, "name": name or device_id, "is_on": is_on, "online": True}
+
+
+def test_group_multi_switches():
+    devices = [
+        device("lamp", "lamp1"),
+        device("main", "wall"),
+        device("mid", "wall.s3", "中键-H+单火三键开关", is_on=True),
+        device("left", "wall.s2", "左键-H+单火三键开关"),
+        device("esp", ""),
+    ]
+    grouped, regular = group_multi_switches(devices)
+    # 有子开关的主设备不单独显示
+    assert [d["id"] for d in regular] == ["lamp", "esp"]
+    assert [d["id"] for d in grouped["wall"]] == ["mid", "left"]
+
+    data = multi_switch_card_data(grouped["wall"])
+    assert data["name"] == "H+单火三键开关"
+    assert [(sw["id"], sw["name"], sw["is_on"]) for sw in data["switches"]] == [
+        ("left", "左键三键", False), ("mid", "中键三键", True),
+    ]
+
+
+def test_group_multi_switches_is_linear():
+    devices = [device(f"d{i}", f"{i}") for i in range(5000)]
+    devices += [device(f"s{i}", f"{i}.s2") for i in range(0, 5000, 2)]
+    grouped, regular = group_multi_switches(devices)
+    assert len(grouped) == 2500
+    assert len(regular) == 2500
+
+
+def test_layout_and_visible_rows():
+    slots = layout_slots(["wall"], [f"d{i}" for i in range(8)])
+    assert (slots[0].kind, slots[0].row, slots[0].col) == (SLOT_MULTI, 0, 0)
+    assert (slots[4].key, slots[4].kind, slots[4].row, slots[4].col) == ("d3", SLOT_DEVICE, 1, 0)
+    assert (slots[-1].kind, slots[-1].row, slots[-1].col) == (SLOT_ADD, 2, 1)
+
+    # 500 台设备 125 行，可见区域 3 行，上下各多创建一行
+    assert visible_rows(0.0, 600, 125) == range(0, 4)
+    assert visible_rows(0.5, 600, 125) == range(61, 66)
+    assert visible_rows(0.99, 600, 125) == range(122, 125)
+    assert visible_rows(0.0, 600, 0) == range(0)
+
+
+def test_widget_pool():
+    pool = WidgetPool(limit=2)
+    assert pool.acquire(SLOT_DEVICE) is None
+    assert pool.release(SLOT_DEVICE, "a")
+    assert pool.release(SLOT_DEVICE, "b")
+    assert not pool.release(SLOT_DEVICE, "c")
+    assert pool.acquire(SLOT_DEVICE) == "b"
+    assert len(pool) == 1
+    assert pool.drain() == ["a"]
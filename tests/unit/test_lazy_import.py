@@ -0,0 +1,40 @@
+"""
+延迟导入测试
+"""
+import json
+import subprocess
+import sys
+
+import pytest
+
+import mijiaAPI
+
+
+HEAVY_MODULES = ["qrcode", "Crypto", "requests", "tzlocal", "urllib3", "mijiaAPI.specparse"]
+
+
+def loaded_modules(code: str) -> list:
+    script = f"import sys\n{code}\nimport json\nprint(json.dumps(sorted(sys.modules)))"
+    output = subprocess.run([sys.executable, "-c", script], capture_output=True, text=True, check=True).stdout
+    return json.loads(output.splitlines()[-1])
+
+
+def test_import_does_not_load_heavy_dependencies():
+    modules = loaded_modules("import mijiaAPI")
+    assert [m for m in HEAVY_MODULES if m in modules] == []
+    assert "mijiaAPI.apis" not in modules
+
+
+def test_cli_version_does_not_load_heavy_dependencies():
+    code = "from mijiaAPI.__main__ import main\ntry:\n    main(['--version'])\nexcept SystemExit:\n    pass"
+    modules = loaded_modules(code)
+    assert [m for m in HEAVY_MODULES if m in modules] == []
+
+
+def test_lazy_attributes():
+    from mijiaAPI.apis import mijiaAPI as api_class
+
+    assert mijiaAPI.mijiaAPI is api_class
+    assert set(mijiaAPI.__all__) <= set(dir(mijiaAPI))
+    with pytest.raises(AttributeError):
+        mijiaAPI.not_a_name
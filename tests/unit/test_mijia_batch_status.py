@@ -0,0 +1,255 @@
+"""
+米家设备批量状态读取测试
+"""
+from types import SimpleNamespace
+
+from ui.desktop.core.device_manager import (
+    MIJIA_STATUS_MAX_INTERVAL,
+    MIJIA_STATUS_MIN_INTERVAL,
+    DeviceManager,
+)
+from ui.desktop.core.mijia_adapter import MijiaAdapter
+
+
+class FakeAPI:
+    prop_cache = None
+
+    def __init__(self, values, offline=(), homes=None):
+        self.values = values
+        self.offline = set(offline)
+        self.homes = homes or {}
+        self.requests = []
+        self.listings = []
+        self.auth_data = {"ssecurity": "s", "userId": "u", "serviceToken": "t"}
+
+    def get_devices_prop(self, data, freshness=None):
+        self.requests.append(data)
+        results = []
+        for item in data:
+            key = (item["did"], item["siid"], item["piid"])
+            if key in self.values:
+                results.append({**item, "code": 0, "value": self.values[key]})
+            elif item["did"] in self.offline:
+                results.append({**item, "code": -704042011})
+            else:
+                results.append({**item, "code": -704220043})
+        return results
+
+    def get_homes_list(self):
+        self.listings.append("homes")
+        return [{"id": home_id} for home_id in self.homes]
+
+    def get_devices_list(self, home_id=None):
+        self.listings.append(home_id)
+        return [{"did": did, "isOnline": online} for did, online in self.homes[home_id].items()]
+
+
+def prop(name, siid, piid, rw="rw"):
+    return {"name": name, "rw": rw, "method": {"siid": siid, "piid": piid}}
+
+
+SPECS = {
+    "yeelink.light": {
+        "type": "urn:miot-spec-v2:device:light:0000A001:yeelink-light:1",
+        "properties": [prop("on", 2, 1), prop("brightness", 2, 2), prop("color-temperature", 2, 3)],
+    },
+    "zhimi.fan": {"properties": [prop("on", 2, 1)]},
+}
+
+
+def make_adapter(api, models, specs=SPECS):
+    adapter = MijiaAdapter(auth_path="/nonexistent/auth.json")
+    adapter._api = api
+    adapter._devices = {did: SimpleNamespace(did=did, model=model) for did, model in models.items()}
+    loaded = []
+    adapter._load_spec = lambda model: loaded.append(model) or specs[model]
+    adapter.loaded_specs = loaded
+    return adapter
+
+
+def test_batched_status_reads():
+    api = FakeAPI({
+        ("light", 2, 1): True,
+        ("light", 2, 2): 80,
+        ("light", 2, 3): 4000,
+        ("wall", 2, 1): True,
+        ("wall", 3, 1): False,
+    })
+    adapter = make_adapter(api, {"light": "yeelink.light", "fan": "zhimi.fan"})
+
+    statuses = adapter.get_devices_status({
+        "light": "other",
+        "fan": "fan",
+        "wall.s2": "switch",
+        "wall.s3": "switch",
+    })
+
+    # 所有设备 (包括虚拟开关) 合并为一次请求
+    assert len(api.requests) == 1
+    assert len(api.requests[0]) == 6
+    # 规格能识别类别时以规格为准
+    assert statuses["light"] == {
+        "online": True, "power": "on", "brightness": 80, "color_temperature": 4000,
+    }
+    # 读取失败的属性不写入状态
+    assert statuses["fan"] == {"online": True}
+    assert statuses["wall.s2"] == {"online": True, "power": "on"}
+    assert statuses["wall.s3"] == {"online": True, "power": "off"}
+
+
+def test_status_plan_compiled_once_per_model():
+    specs = {
+        "zhimi.airp": {
+            "type": "urn:miot-spec-v2:device:air-purifier:0000A007:zhimi-airp:1",
+            "properties": [
+                prop("on", 2, 1),
+                prop("relative_humidity", 3, 1, rw="r"),
+                prop("pm2.5-density", 3, 2, rw="r"),
+                prop("mode", 2, 4),
+                prop("alarm", 4, 1, rw="w"),
+            ],
+        },
+    }
+    api = FakeAPI({("p1", 2, 1): 1, ("p1", 3, 1): 40, ("p2", 3, 2): 12})
+    adapter = make_adapter(api, {"p1": "zhimi.airp", "p2": "zhimi.airp"}, specs)
+
+    statuses = adapter.get_devices_status({"p1": "other", "p2": "other"})
+    assert adapter.loaded_specs == ["zhimi.airp"]
+    # 每个设备只读取规格中存在的属性，同一属性只读一次
+    p1_reads = sorted((r["siid"], r["piid"]) for r in api.requests[0] if r["did"] == "p1")
+    assert p1_reads == [(2, 1), (2, 4), (3, 1), (3, 2)]
+    assert statuses["p1"] == {"online": True, "power": "on", "humidity": 40}
+    assert statuses["p2"] == {"online": True, "pm25": 12}
+
+    adapter._spec_revalidator = SimpleNamespace(last_updated=["zhimi.airp"])
+    adapter.get_devices_status({"p1": "other"})
+    assert adapter.loaded_specs == ["zhimi.airp", "zhimi.airp"]
+
+
+def test_virtual_switch_without_value_is_offline():
+    api = FakeAPI({})
+    adapter = make_adapter(api, {})
+    assert adapter.get_device_status("wall.s4", "switch") == {"online": False}
+    # 无法获取设备规格的设备不发起请求
+    assert adapter.get_devices_status({"missing": "light"}) == {"missing": {"online": False}}
+    assert len(api.requests) == 1
+
+
+def test_failed_request_leaves_devices_out():
+    class FailingAPI(FakeAPI):
+        def get_devices_prop(self, data, freshness=None):
+            raise ConnectionError("timeout")
+
+    adapter = make_adapter(FailingAPI({}), {})
+    assert adapter.get_devices_status({"wall.s2": "switch"}) == {}
+
+
+class FakeConfig:
+    def __init__(self, devices):
+        self.devices = devices
+
+    def get_notification_config(self):
+        return {}
+
+    def get_mijia_auth_path(self):
+        return "/nonexistent/auth.json"
+
+    def is_spec_revalidation_enabled(self):
+        return False
+
+    def get_devices(self):
+        return self.devices
+
+    def set_devices(self, devices):
+        self.devices = devices
+
+    def save(self):
+        pass
+
+
+def make_manager(api):
+    config = FakeConfig([
+        {"id": "a", "name": "A", "type": "mijia_switch", "did": "wall.s2"},
+        {"id": "b", "name": "B", "type": "mijia_switch", "did": "wall.s3"},
+        {"id": "c", "name": "C", "type": "mijia_switch", "did": "plug.s2"},
+    ])
+    manager = DeviceManager(config)
+    manager._mijia_adapter = make_adapter(api, {})
+    return manager
+
+
+def test_manager_polls_mijia_devices_in_one_batch():
+    api = FakeAPI({("wall", 2, 1): True, ("wall", 3, 1): False})
+    manager = make_manager(api)
+    updated = []
+    manager.set_status_callback(updated.append)
+
+    assert manager._poll_mijia_batch() is True
+    assert len(api.requests) == 1
+    assert manager.get_device("a").data["power"] == "on"
+    assert manager.get_device("b").data["power"] == "off"
+    assert not manager.get_device("c").online
+    # c 原本就是离线状态，一次失败没有产生变化，不回调
+    assert [d.id for d in updated] == ["a", "b"]
+
+    # 未到期的设备不再读取，离线设备按退避间隔重试
+    assert manager._poll_mijia_batch() is None
+    assert len(api.requests) == 1
+    assert manager._mijia_fails == {"c": 1}
+
+
+def test_offline_code_marks_device_offline():
+    api = FakeAPI({("wall", 2, 1): True}, offline=["plug"])
+    manager = make_manager(api)
+    manager.get_device("c").mark_online()
+    manager._status_interval = MIJIA_STATUS_MAX_INTERVAL
+
+    manager._poll_mijia_batch()
+    # 一次离线错误码即标记离线，并加快在线状态刷新
+    assert not manager.get_device("c").online
+    assert manager._status_interval == MIJIA_STATUS_MIN_INTERVAL
+    assert not manager._should_poll_mijia(manager.get_device("c"))
+
+
+def test_online_status_reports_only_changes():
+    api = FakeAPI({}, homes={"h1": {"wall": True}, "h2": {"plug": False}})
+    manager = make_manager(api)
+    updated = []
+    manager.set_status_callback(updated.append)
+
+    assert manager._refresh_mijia_status() is True
+    assert [d.id for d in updated] == ["a", "b"]
+    assert manager._status_interval == MIJIA_STATUS_MIN_INTERVAL
+
+    # 无变化时不回调，刷新间隔加倍；家庭列表只获取一次
+    assert manager._refresh_mijia_status() is True
+    assert len(updated) == 2
+    assert manager._status_interval == MIJIA_STATUS_MIN_INTERVAL * 2
+    assert api.listings.count("homes") == 1
+
+    api.homes["h2"]["plug"] = True
+    manager._refresh_mijia_status()
+    assert [d.id for d in updated[2:]] == ["c"]
+    assert manager._status_interval == MIJIA_STATUS_MIN_INTERVAL
+
+
+def test_switch_channels_are_read_together():
+    api = FakeAPI({("wall", 2, 1): True, ("wall", 3, 1): False})
+    manager = make_manager(api)
+    manager._mijia_due = {"a": 0.0, "b": float("inf"), "c": float("inf")}
+    updated = []
+    manager.set_status_callback(updated.append)
+
+    # 只有 a 到期，同一开关的 b 一起读取，其他设备的 c 不受影响
+    manager._poll_mijia_batch()
+    assert [(r["did"], r["siid"]) for r in api.requests[0]] == [("wall", 2), ("wall", 3)]
+    assert [d.id for d in updated] == ["a", "b"]
+    assert manager._mijia_due["a"] == manager._mijia_due["b"]
+
+    # 状态没有变化时不回调，只有变化的通道回调
+    updated.clear()
+    api.values[("wall", 3, 1)] = True
+    manager.poll_device_now("b")
+    assert len(api.requests) == 2
+    assert [d.id for d in updated] == ["b"]
+    assert manager.get_device("b").data["power"] == "on"
@@ -0,0 +1,92 @@
+"""
+轮询调度器测试
+"""
+import threading
+import time
+
+from ui.desktop.core.poll_scheduler import PollScheduler
+
+
+def run_scheduler(run, setup, duration):
+    scheduler = PollScheduler(run, max_workers=4, max_backoff=0.4)
+    setup(scheduler)
+    scheduler.start()
+    time.sleep(duration)
+    scheduler.stop()
+    return scheduler
+
+
+def test_slow_job_does_not_delay_others():
+    calls = {"fast": 0, "slow": 0}
+    lock = threading.Lock()
+
+    def run(key):
+        with lock:
+            calls[key] += 1
+        if key == "slow":
+            time.sleep(0.5)
+        return True
+
+    def setup(scheduler):
+        scheduler.add("fast", 0.05, delay=0)
+        scheduler.add("slow", 0.05, delay=0)
+
+    scheduler = run_scheduler(run, setup, 0.6)
+    assert calls["fast"] >= 8
+    # 慢任务执行期间不会被重复派发，并记录超时
+    assert calls["slow"] <= 2
+    assert scheduler.stats()["overruns"] >= 1
+
+
+def test_overrun_waits_a_full_interval():
+    starts, ends = [], []
+
+    def run(key):
+        starts.append(time.monotonic())
+        if len(starts) == 1:
+            time.sleep(0.3)
+        ends.append(time.monotonic())
+        return True
+
+    scheduler = run_scheduler(run, lambda s: s.add("slow", 0.1, delay=0), 0.5)
+    assert scheduler.stats()["overruns"] == 1
+    # 超时后不立即重新执行，而是从完成时间起等待一个间隔
+    assert len(starts) >= 2
+    assert starts[1] - ends[0] >= 0.09
+
+
+def test_offline_backoff_and_skip():
+    calls = {"dead": 0, "skip": 0}
+
+    def run(key):
+        calls[key] += 1
+        return False if key == "dead" else None
+
+    def setup(scheduler):
+        scheduler.add("dead", 0.05, delay=0)
+        scheduler.add("skip", 0.05, delay=0)
+
+    scheduler = run_scheduler(run, setup, 0.7)
+    # 退避间隔 0.1, 0.2, 0.4, 0.4 ...
+    assert 3 <= calls["dead"] <= 5
+    assert calls["skip"] >= 10
+    assert scheduler.stats()["backoff"] == 1
+
+
+def test_stagger_spreads_first_runs():
+    started = {}
+
+    def run(key):
+        started.setdefault(key, time.monotonic())
+        return True
+
+    def setup(scheduler):
+        for i in range(4):
+            scheduler.add(str(i), 0.4)
+        scheduler.stagger()
+
+    begin = time.monotonic()
+    run_scheduler(run, setup, 0.45)
+    offsets = [started[str(i)] - begin for i in range(4)]
+    assert offsets == sorted(offsets)
+    assert offsets[0] < 0.05 and offsets[3] > 0.25
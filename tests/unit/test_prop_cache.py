@@ -0,0 +1,60 @@
+"""
+属性缓存测试
+"""
+import time
+from types import SimpleNamespace
+
+from mijiaAPI.cache import PropertyCache
+
+
+KEY = ("1", 2, 1)
+
+
+def test_ttl_from_spec_access():
+    cache = PropertyCache(sensor_ttl=1, setting_ttl=100)
+    assert cache.ttl_for(SimpleNamespace(rw="rw")) == 100
+    assert cache.ttl_for(SimpleNamespace(rw="r")) == 1
+
+
+def test_read_through_and_hit_ratio():
+    cache = PropertyCache()
+    loads = []
+
+    def loader():
+        loads.append(1)
+        return 42
+
+    assert cache.get(KEY, loader) == 42
+    assert cache.get(KEY, loader) == 42
+    assert len(loads) == 1
+    assert cache.stats()["hits"] == 1 and cache.stats()["misses"] == 1
+    assert cache.hit_ratio == 0.5
+
+
+def test_stale_while_revalidate():
+    cache = PropertyCache(stale_window=60)
+    cache.put(KEY, "old", ttl=0)
+    assert cache.get(KEY, lambda: "new") == "old"
+    deadline = time.time() + 2
+    while cache.peek(KEY).value != "new" and time.time() < deadline:
+        time.sleep(0.01)
+    assert cache.peek(KEY).value == "new"
+    assert cache.stale_hits == 1
+
+
+def test_max_age_forces_reload():
+    cache = PropertyCache()
+    cache.put(KEY, "old", ttl=100)
+    time.sleep(0.01)
+    assert cache.get(KEY, lambda: "new", max_age=0) == "new"
+
+
+def test_write_through():
+    cache = PropertyCache()
+    cache.put(("1", 2, 2), 10)
+    cache.write_through(
+        [{"did": "1", "siid": 2, "piid": 1, "value": True}, {"did": "1", "siid": 2, "piid": 2, "value": 20}],
+        [{"code": 0}, {"code": 1}],
+    )
+    assert cache.peek(KEY).value is True
+    assert cache.peek(("1", 2, 2)) is None
@@ -0,0 +1,111 @@
+"""
+名称索引测试
+"""
+import threading
+
+import pytest
+
+from mijiaAPI.errors import DeviceNotFoundError, MultipleDevicesFoundError
+from mijiaAPI.resolve import ResolutionIndex, resolve_device, resolve_room, resolve_scene
+
+
+class FakeAPI:
+    def __init__(self, path):
+        self.resolution_index = ResolutionIndex(path / "resolution_index.json")
+        self.calls = []
+        self.devices = [{"did": "1", "name": "lamp", "model": "a.light", "home_id": "h1"},
+                        {"did": "2", "name": "plug", "model": "b.plug", "home_id": "h1"},
+                        {"did": "3", "name": "plug", "model": "b.plug", "home_id": "h1"}]
+
+    def get_devices_list(self):
+        self.calls.append("devices")
+        self.resolution_index.update_devices(self.devices, "own")
+        return self.devices
+
+    def get_shared_devices_list(self):
+        self.calls.append("shared")
+        self.resolution_index.update_devices([], "shared")
+        return []
+
+    def get_scenes_list(self):
+        self.calls.append("scenes")
+        scenes = [{"scene_id": "s1", "name": "home", "home_id": "h1"}]
+        self.resolution_index.update_scenes(scenes)
+        return scenes
+
+    def get_homes_list(self):
+        self.calls.append("homes")
+        homes = [{"id": "h1", "name": "Home", "uid": 42,
+                  "roomlist": [{"id": "r1", "name": "bedroom", "dids": ["1", "2"]}]}]
+        self.resolution_index.update_homes(homes)
+        return homes
+
+
+def test_live_fetch_once_then_persisted(tmp_path):
+    api = FakeAPI(tmp_path)
+    assert resolve_device(api, dev_name="lamp")["did"] == "1"
+    assert api.calls == ["devices", "shared"]
+
+    # 新进程：从磁盘加载索引，不再请求设备列表
+    api = FakeAPI(tmp_path)
+    assert resolve_device(api, dev_name="lamp") == {
+        "did": "1", "name": "lamp", "model": "a.light", "home_id": "h1", "source": "own"}
+    assert resolve_device(api, did="2")["model"] == "b.plug"
+    assert api.calls == []
+
+
+def test_miss_and_ambiguity_fall_back_to_live(tmp_path):
+    api = FakeAPI(tmp_path)
+    api.get_devices_list()
+    api.calls.clear()
+    with pytest.raises(MultipleDevicesFoundError):
+        resolve_device(api, dev_name="plug")
+    with pytest.raises(DeviceNotFoundError):
+        resolve_device(api, dev_name="fan")
+    assert api.calls == ["devices", "shared", "devices", "shared"]
+
+
+def test_scenes_rooms_and_home_owner(tmp_path):
+    api = FakeAPI(tmp_path)
+    assert resolve_scene(api, "home")["scene_id"] == "s1"
+    assert resolve_scene(api, "nope") is None
+    assert resolve_room(api, "bedroom") == ["1", "2"]
+    api.calls.clear()
+    assert resolve_scene(api, "s1")["home_id"] == "h1"
+    assert resolve_room(api, "r1") == ["1", "2"]
+    assert api.resolution_index.home_owner("h1") == 42
+    assert api.calls == []
+
+
+def test_stale_sections_refresh(tmp_path):
+    api = FakeAPI(tmp_path)
+    api.resolution_index.ttl = 0
+    api.get_devices_list()
+    api.calls.clear()
+    resolve_device(api, did="1")
+    # 找到唯一匹配时直接返回，设备列表在后台刷新
+    for thread in threading.enumerate():
+        if thread.name == "mijiaAPI-index-refresh":
+            thread.join()
+    assert api.calls == ["devices", "shared"]
+
+
+def test_unchanged_listing_does_not_rewrite(tmp_path, monkeypatch):
+    api = FakeAPI(tmp_path)
+    api.get_devices_list()
+    index = api.resolution_index
+    saves = []
+    save = index._save
+    monkeypatch.setattr(index, "_save", lambda: saves.append(1) or save())
+
+    api.get_devices_list()
+    api.get_devices_list()
+    assert saves == []
+    api.devices[0] = {**api.devices[0], "name": "desk lamp"}
+    api.get_devices_list()
+    assert saves == [1]
+    # 磁盘上的更新时间超过半个 ttl 时即使内容不变也会写入
+    index._saved_at["devices"] -= index.ttl
+    api.get_devices_list()
+    assert saves == [1, 1]
+    assert not index.is_stale("devices")
@@ -0,0 +1,72 @@
+"""
+设备规格包测试
+"""
+import gzip
+import json
+
+import pytest
+
+from mijiaAPI import __main__ as cli
+from mijiaAPI import specbundle
+from mijiaAPI.devices import get_device_info
+from mijiaAPI.specbundle import BUNDLE_FILENAME, BUNDLE_FORMAT, SpecBundle, export_spec_bundle
+
+
+def spec(model: str) -> dict:
+    return {
+        "name": model,
+        "model": model,
+        "type": f"urn:{model}:1",
+        "properties": [{"name": "on", "description": "", "type": "bool", "rw": "rw", "unit": None,
+                        "range": None, "value-list": None, "method": {"siid": 2, "piid": 1}}],
+        "actions": [],
+    }
+
+
+@pytest.fixture(autouse=True)
+def isolated_bundles(monkeypatch):
+    monkeypatch.delenv(specbundle.BUNDLE_ENV, raising=False)
+    monkeypatch.setattr(specbundle, "_bundles", {})
+
+
+def test_export_and_load_round_trip(tmp_path):
+    cache = tmp_path / "cache"
+    cache.mkdir()
+    for model in ("a.light.x", "b.plug.y"):
+        (cache / f"{model}.json").write_text(json.dumps(spec(model)), encoding="utf-8")
+    # 不是设备规格的 JSON 文件不会被打包
+    (cache / "auth.json").write_text(json.dumps({"userId": 1}), encoding="utf-8")
+
+    path = export_spec_bundle(tmp_path / "out" / BUNDLE_FILENAME, cache_path=cache)
+    bundle = SpecBundle(path)
+    assert bundle.models == ["a.light.x", "b.plug.y"]
+    assert bundle.get("a.light.x") == spec("a.light.x")
+    assert bundle.meta["format"] == BUNDLE_FORMAT
+    # 返回副本，修改不影响规格包
+    bundle.get("a.light.x")["properties"].clear()
+    assert bundle.get("a.light.x") == spec("a.light.x")
+
+
+def test_unknown_version_is_rejected(tmp_path):
+    path = tmp_path / BUNDLE_FILENAME
+    with gzip.open(path, "wt", encoding="utf-8") as f:
+        json.dump({"format": BUNDLE_FORMAT, "version": 99, "models": {"a.light.x": spec("a.light.x")}}, f)
+    bundle = SpecBundle(path)
+    assert bundle.models == []
+    assert "a.light.x" not in bundle
+
+
+def test_get_device_info_falls_back_to_bundle(tmp_path, monkeypatch, capsys):
+    with gzip.open(tmp_path / BUNDLE_FILENAME, "wt", encoding="utf-8") as f:
+        json.dump({"format": BUNDLE_FORMAT, "version": 1, "models": {"a.light.x": spec("a.light.x")}}, f)
+
+    assert get_device_info("a.light.x", cache_path=tmp_path) == spec("a.light.x")
+
+    # 环境变量指定的规格包不需要 cache_path
+    monkeypatch.setenv(specbundle.BUNDLE_ENV, str(tmp_path / BUNDLE_FILENAME))
+    assert get_device_info("a.light.x")["model"] == "a.light.x"
+    monkeypatch.delenv(specbundle.BUNDLE_ENV)
+
+    # 命令行使用认证文件所在目录中的规格包
+    cli.main(["-p", str(tmp_path / "auth.json"), "--get_device_info", "a.light.x"])
+    assert json.loads(capsys.readouterr().out)["model"] == "a.light.x"
@@ -0,0 +1,85 @@
+"""
+设备规格页面解析测试
+"""
+import html
+import json
+
+from mijiaAPI import specparse
+from mijiaAPI.specparse import extract_page_data, parse_spec_page, parse_spec_pages
+
+
+CONTENT = {
+    "props": {
+        "product": None,
+        "spec": {
+            "name": "Lamp & \"Co\"",
+            "services": {
+                "2": {
+                    "name": "light",
+                    "properties": {
+                        "1": {"name": "on", "format": "bool", "access": ["read", "write", "notify"],
+                              "description": "Switch Status", "desc_zh_cn": "开关"},
+                        "2": {"name": "brightness", "format": "uint8", "access": ["read", "write"],
+                              "unit": "percentage", "value-range": [1, 100, 1]},
+                    },
+                    "actions": {"1": {"name": "toggle", "description": "Toggle"}},
+                },
+                "3": {
+                    "name": "night-light",
+                    "properties": {
+                        "1": {"name": "on", "format": "bool", "access": ["read"], "unit": "none"},
+                    },
+                    "actions": {"1": {"name": "toggle"}},
+                },
+            },
+        },
+    }
+}
+
+
+def make_page(content: dict) -> str:
+    attr = html.escape(json.dumps(content, ensure_ascii=False), quote=True)
+    return f'<html><body><div id="app" data-page="{attr}"></div></body></html>'
+
+
+def test_extract_unescapes_all_entities():
+    page = make_page(CONTENT)
+    assert "&amp;" in page
+    assert extract_page_data(page)["props"]["spec"]["name"] == 'Lamp & "Co"'
+
+
+def test_compiled_properties_and_actions():
+    info = parse_spec_page(make_page(CONTENT), "test.light.lamp")
+    assert info["model"] == "test.light.lamp"
+    names = [p["name"] for p in info["properties"]]
+    assert names == ["on", "brightness", "night-light-on"]
+    assert info["properties"][1]["type"] == "uint"
+    assert info["properties"][1]["range"] == [1, 100, 1]
+    assert info["properties"][2]["rw"] == "r"
+    assert info["properties"][2]["unit"] is None
+    assert [a["name"] for a in info["actions"]] == ["toggle", "night-light-toggle"]
+    assert info["actions"][1]["method"] == {"siid": 3, "aiid": 1}
+
+
+def test_parse_many_reports_errors_per_page():
+    pages = {"good": make_page(CONTENT), "bad": "<html></html>"}
+    result = parse_spec_pages(pages, processes=1)
+    assert result["good"]["name"] == 'Lamp & "Co"'
+    assert isinstance(result["bad"], ValueError)
+
+
+def test_parse_many_in_process_by_default(monkeypatch):
+    def no_pool(*args, **kwargs):
+        raise AssertionError("默认不应启动进程池")
+
+    monkeypatch.setattr(specparse, "ProcessPoolExecutor", no_pool)
+    pages = {f"m{i}": make_page(CONTENT) for i in range(3)}
+    assert all(isinstance(info, dict) for info in parse_spec_pages(pages).values())
+
+
+def test_unescape_does_not_decode_twice():
+    content = {"props": {"product": None, "spec": {"name": "&lt; &copy; é", "services": {}}}}
+    page = make_page(content)
+    assert extract_page_data(page)["props"]["spec"]["name"] == "&lt; &copy; é"
+    page = page.replace("é", "&eacute;")
+    assert extract_page_data(page)["props"]["spec"]["name"] == "&lt; &copy; é"
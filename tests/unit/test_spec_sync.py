@@ -0,0 +1,112 @@
+"""
+设备规格版本检测测试
+"""
+import json
+
+from mijiaAPI import devices, specsync
+from mijiaAPI.devices import mijiaDevice
+
+
+def spec(model: str, urn, prop: str = "on", siid: int = 2) -> dict:
+    return {
+        "name": model,
+        "model": model,
+        "type": urn,
+        "properties": [{"name": prop, "description": "", "type": "bool", "rw": "rw", "unit": None,
+                        "range": None, "value-list": None, "method": {"siid": siid, "piid": 1}}],
+        "actions": [],
+    }
+
+
+def write_cache(path, info: dict):
+    (path / f"{info['model']}.json").write_text(json.dumps(info), encoding="utf-8")
+
+
+class FakeAPI:
+    prop_cache = None
+
+    def __init__(self, path):
+        self.auth_data_path = path / "auth.json"
+
+    def get_devices_list(self):
+        return [{"did": "1", "name": "lamp", "model": "a.light.x"}]
+
+    def get_shared_devices_list(self):
+        return []
+
+
+def test_find_changed_specs(tmp_path):
+    write_cache(tmp_path, spec("a.light.x", "urn:a:1"))
+    write_cache(tmp_path, spec("b.plug.y", "urn:b:1"))
+    write_cache(tmp_path, spec("c.old.z", None))
+    index = {"a.light.x": "urn:a:2", "b.plug.y": "urn:b:1", "c.old.z": "urn:c:3"}
+    # 旧缓存没有记录 URN，无法判断是否变化，不会被重新获取
+    assert specsync.find_changed_specs(tmp_path, index) == ["a.light.x"]
+    # 不在索引中的型号不会被重新获取
+    assert specsync.find_changed_specs(tmp_path, {}) == []
+
+
+def test_revalidate_verifies_old_cache_once(tmp_path, monkeypatch):
+    # 旧缓存没有 URN: a.light.x 的映射已经过期，c.old.z 的映射仍然正确
+    write_cache(tmp_path, spec("a.light.x", None, siid=2))
+    write_cache(tmp_path, spec("c.old.z", None))
+    device = mijiaDevice(FakeAPI(tmp_path), did="1")
+    assert device.prop_list["on"].method == {"siid": 2, "piid": 1}
+
+    fetched = []
+    latest = {"a.light.x": spec("a.light.x", "urn:a:2", siid=3), "c.old.z": spec("c.old.z", "urn:c:3")}
+
+    def fake_get_device_info(model, cache_path=None, refresh=False):
+        assert refresh
+        fetched.append(model)
+        info = dict(latest[model])
+        devices._save_device_info(cache_path, model, info)
+        return info
+
+    monkeypatch.setattr(devices, "get_device_info", fake_get_device_info)
+    index = {"a.light.x": "urn:a:2", "c.old.z": "urn:c:3"}
+    assert specsync.revalidate_specs(tmp_path, index=index) == ["a.light.x"]
+    assert sorted(fetched) == ["a.light.x", "c.old.z"]
+    assert device.prop_list["on"].method == {"siid": 3, "piid": 1}
+    cached = json.loads((tmp_path / "c.old.z.json").read_text(encoding="utf-8"))
+    assert cached["type"] == "urn:c:3"
+
+    # 核对之后只在 URN 变化时重新获取
+    fetched.clear()
+    assert specsync.revalidate_specs(tmp_path, index=index) == []
+    assert fetched == []
+    assert specsync.find_changed_specs(tmp_path, {"c.old.z": "urn:c:4"}) == ["c.old.z"]
+
+
+def test_revalidate_refetches_only_changed_and_rebinds(tmp_path, monkeypatch):
+    write_cache(tmp_path, spec("a.light.x", "urn:a:1"))
+    write_cache(tmp_path, spec("b.plug.y", "urn:b:1"))
+    device = mijiaDevice(FakeAPI(tmp_path), did="1")
+    assert device.prop_list["on"].method == {"siid": 2, "piid": 1}
+
+    fetched = []
+
+    def fake_get_device_info(model, cache_path=None, refresh=False):
+        assert refresh
+        fetched.append(model)
+        info = spec(model, "urn:a:2", siid=3)
+        devices._save_device_info(cache_path, model, info)
+        return info
+
+    monkeypatch.setattr(devices, "get_device_info", fake_get_device_info)
+    index = {"a.light.x": "urn:a:2", "b.plug.y": "urn:b:1"}
+    assert specsync.revalidate_specs(tmp_path, index=index) == ["a.light.x"]
+    assert fetched == ["a.light.x"]
+    assert device.spec_type == "urn:a:2"
+    assert device.prop_list["on"].method == {"siid": 3, "piid": 1}
+    cached = json.loads((tmp_path / "a.light.x.json").read_text(encoding="utf-8"))
+    assert cached["type"] == "urn:a:2" and cached["fetch_time"] > 0
+    # 更新后再次检查没有变化
+    assert specsync.revalidate_specs(tmp_path, index=index) == []
+
+
+def test_revalidator_schedule(tmp_path):
+    revalidator = specsync.SpecRevalidator(tmp_path, interval=1000, initial_delay=5)
+    assert revalidator.next_delay() == 5
+    revalidator._save_check(specsync.time.time(), [])
+    assert 990 < revalidator.next_delay() <= 1000
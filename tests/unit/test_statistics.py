@@ -0,0 +1,65 @@
+"""
+统计数据本地存储测试
+"""
+import math
+
+from mijiaAPI import statistics
+from mijiaAPI.statistics import StatisticsStore, parse_stat_value, split_windows
+
+
+DAY = 86400
+NOW = 100 * DAY + 3600
+
+
+class FakeAPI:
+    def __init__(self):
+        self.requests = []
+
+    def get_statistics(self, data):
+        self.requests.append((data["time_start"], data["time_end"]))
+        return [{"time": t, "value": f"[{t // DAY}]"}
+                for t in range(0, NOW, DAY) if data["time_start"] <= t <= data["time_end"]]
+
+
+def test_parse_stat_value():
+    assert parse_stat_value("[12.5]") == 12.5
+    assert parse_stat_value("[3, 4]") == 3
+    assert parse_stat_value("7") == 7
+    assert math.isnan(parse_stat_value("[]")) and math.isnan(parse_stat_value("__import__('os')"))
+
+
+def test_split_windows():
+    assert split_windows(0, 25 * 3600, "stat_hour_v3", 10) == [(0, 36000), (36000, 72000), (72000, 90000)]
+
+
+def test_fetch_only_missing_windows(tmp_path, monkeypatch):
+    monkeypatch.setattr(statistics.time, "time", lambda: NOW)
+    api = FakeAPI()
+    store = StatisticsStore(tmp_path, limit=30)
+    times, values = store.fetch(api, "1", "7.1", "stat_day_v3", 10 * DAY, 40 * DAY)
+    assert list(times) == [d * DAY for d in range(10, 40)] and values[0] == 10
+    assert len(api.requests) == 1
+
+    # 已获取的范围不再请求，只请求新的部分
+    store.fetch(api, "1", "7.1", "stat_day_v3", 20 * DAY, 40 * DAY)
+    assert len(api.requests) == 1
+    times, _ = store.fetch(api, "1", "7.1", "stat_day_v3", 0, 70 * DAY)
+    assert api.requests[1:] == [(0, 10 * DAY - 1), (40 * DAY, 70 * DAY - 1)]
+    assert len(times) == 70
+
+    # 重新打开后从文件读取
+    reopened = StatisticsStore(tmp_path, limit=30)
+    assert reopened.missing_windows("1", "7.1", "stat_day_v3", 0, 70 * DAY) == []
+    times, values = reopened.query("1", "7.1", "stat_day_v3", 5 * DAY, 8 * DAY)
+    assert list(values) == [5, 6, 7]
+
+
+def test_current_bucket_is_refetched(tmp_path, monkeypatch):
+    monkeypatch.setattr(statistics.time, "time", lambda: NOW)
+    api = FakeAPI()
+    store = StatisticsStore(tmp_path)
+    store.fetch(api, "1", "7.1", "stat_day_v3", 90 * DAY)
+    store.fetch(api, "1", "7.1", "stat_day_v3", 90 * DAY)
+    assert api.requests[1][0] == NOW - DAY
+    totals = store.total(api, ["1"], "7.1", "stat_day_v3", 90 * DAY, 100 * DAY)
+    assert totals == {"1": sum(range(90, 100))}
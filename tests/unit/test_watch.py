@@ -0,0 +1,100 @@
+"""
+共享属性订阅测试
+"""
+import threading
+import time
+from pathlib import Path
+
+from mijiaAPI.watch import PropertyWatcher
+
+
+class FakeAPI:
+    auth_data_path = Path("/nonexistent/auth.json")
+
+    def __init__(self):
+        self.calls = []
+        self.values = {}
+
+    def get_devices_prop(self, params):
+        self.calls.append(params)
+        ret = []
+        for p in params:
+            value, update_time = self.values.get((p["did"], p["siid"], p["piid"]), (None, 0))
+            ret.append({**p, "code": 0, "value": value, "updateTime": update_time})
+        return ret
+
+
+def test_batches_across_subscriptions_and_delivers_changes_only():
+    api = FakeAPI()
+    api.values = {("1", 2, 1): (True, 100), ("2", 2, 1): (False, 100)}
+    watcher = PropertyWatcher(api)
+    got_a, got_b = [], []
+    sub_a = watcher.subscribe([("1", 2, 1), ("2", 2, 1)], 60, got_a.append)
+    sub_b = watcher.subscribe([("2", 2, 1)], 60, got_b.append)
+    try:
+        watcher.poll([sub_a, sub_b])
+        assert len(api.calls[-1]) == 2
+        assert [c.value for c in got_a[0]] == [True, False]
+        assert got_b[0][0].previous is None
+
+        api.values[("2", 2, 1)] = (True, 200)
+        watcher.poll([sub_a, sub_b])
+        assert [(c.did, c.previous, c.value) for c in got_a[1]] == [("2", False, True)]
+        assert len(got_b) == 2
+
+        # 未变化时不回调
+        watcher.poll([sub_a, sub_b])
+        assert len(got_a) == 2 and len(got_b) == 2
+    finally:
+        watcher.close()
+
+
+def test_single_thread_and_exit_after_last_cancel():
+    api = FakeAPI()
+    watcher = PropertyWatcher(api)
+    delivered = threading.Event()
+    sub_a = watcher.subscribe([("1", 2, 1)], 0.01, lambda changes: delivered.set())
+    thread = watcher._thread
+    sub_b = watcher.subscribe([("1", 2, 2)], 0.01, lambda changes: None)
+    assert watcher._thread is thread
+    assert delivered.wait(2)
+    sub_a.cancel()
+    sub_b.cancel()
+    thread.join(2)
+    assert not thread.is_alive()
+    assert watcher._thread is None
+
+
+def test_poll_error_does_not_stop_the_thread():
+    api = FakeAPI()
+    api.values = {("1", 2, 1): (True, 100)}
+    read = api.get_devices_prop
+    failures = [ConnectionError("network down")]
+
+    def flaky(params):
+        if failures:
+            raise failures.pop()
+        return read(params)
+
+    api.get_devices_prop = flaky
+    watcher = PropertyWatcher(api)
+    got = []
+    changed = threading.Event()
+
+    def callback(changes):
+        got.append(changes)
+        if len(got) == 2:
+            changed.set()
+
+    sub = watcher.subscribe([("1", 2, 1)], 0.01, callback)
+    try:
+        deadline = time.monotonic() + 2
+        while not got and time.monotonic() < deadline:
+            time.sleep(0.01)
+        api.values[("1", 2, 1)] = (False, 200)
+        assert changed.wait(2)
+        assert not failures
+        assert got[1][0].value is False
+        assert watcher._thread.is_alive()
+    finally:
+        sub.cancel()
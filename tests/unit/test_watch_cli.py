@@ -0,0 +1,81 @@
+"""
+watch 命令测试
+"""
+import csv
+import io
+import json
+import threading
+from pathlib import Path
+
+from mijiaAPI import __main__ as cli
+from mijiaAPI import devices
+from mijiaAPI.watch import PropertyWatcher
+
+
+LAMP_INFO = {
+    "name": "Lamp",
+    "model": "test.light.lamp",
+    "properties": [
+        {"name": "on", "description": "", "type": "bool", "rw": "rw", "unit": None,
+         "range": None, "value-list": None, "method": {"siid": 2, "piid": 1}},
+        {"name": "brightness", "description": "", "type": "uint", "rw": "rw", "unit": "percentage",
+         "range": [1, 100, 1], "value-list": None, "method": {"siid": 2, "piid": 2}},
+    ],
+    "actions": [],
+}
+
+
+class FakeAPI:
+    auth_data_path = Path("/nonexistent/auth.json")
+
+    def __init__(self):
+        self.reads = []
+        self.values = {("1", 2, 1): True, ("1", 2, 2): 40, ("2", 2, 1): False, ("2", 2, 2): 80}
+        self.polled = threading.Event()
+        self.property_watcher = PropertyWatcher(self)
+
+    def get_devices_list(self):
+        return [{"did": "1", "name": "lamp", "model": "test.light.lamp"}]
+
+    def get_shared_devices_list(self):
+        return [{"did": "2", "name": "desk", "model": "test.light.lamp"}]
+
+    def get_devices_prop(self, params):
+        self.reads.append(len(params))
+        result = [{**p, "code": 0, "value": self.values[(p["did"], p["siid"], p["piid"])],
+                   "updateTime": len(self.reads)} for p in params]
+        # 第二次读取后亮度变化
+        self.values[("1", 2, 2)] = 60
+        if len(self.reads) >= 3:
+            self.polled.set()
+        return result
+
+
+def run(monkeypatch, fmt):
+    monkeypatch.setattr(devices, "get_device_info", lambda model, cache_path=None: LAMP_INFO)
+    api = FakeAPI()
+    out = io.StringIO()
+    thread = threading.Thread(target=cli.watch_devices, args=(api, ["lamp", "2"], ["on", "brightness", "nope"], 0.01),
+                              kwargs={"output": out, "fmt": fmt, "duration": 0.5})
+    thread.start()
+    assert api.polled.wait(2)
+    thread.join()
+    return api, out.getvalue()
+
+
+def test_watch_emits_changes_only(monkeypatch, capsys):
+    api, output = run(monkeypatch, "jsonl")
+    rows = [json.loads(line) for line in output.splitlines()]
+    # 所有设备的属性合并为一次请求
+    assert set(api.reads) == {4}
+    assert len(rows) == 5
+    assert {(r["did"], r["prop"]) for r in rows[:4]} == {("1", "on"), ("1", "brightness"), ("2", "on"), ("2", "brightness")}
+    assert rows[4]["device"] == "lamp" and rows[4]["value"] == 60 and rows[4]["previous"] == 40
+    assert "nope" in capsys.readouterr().err
+
+
+def test_watch_csv(monkeypatch):
+    _, output = run(monkeypatch, "csv")
+    rows = list(csv.DictReader(io.StringIO(output)))
+    assert list(rows[0]) == cli.WATCH_FIELDS
+    assert rows[-1]["value"] == "60"
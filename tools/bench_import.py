@@ -0,0 +1,97 @@
+"""
+导入耗时基准测试
+
+使用 python -X importtime 测量 `import mijiaAPI` 和简短命令行调用的冷启动耗时，
+并检查重量级依赖 (qrcode、pycryptodome、requests 等) 是否在首次使用前就被加载。
+
+用法:
+    python -m tools.bench_import                      # 测量并输出耗时最多的模块
+    python -m tools.bench_import --repeat 10 --top 5
+    python -m tools.bench_import --budget_ms 150      # 任一场景超出预算时退出码为 1，可用于 CI
+"""
+import argparse
+import os
+import re
+import subprocess
+import sys
+from typing import Dict, List, Set, Tuple
+
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+SCENARIOS = {
+    "import mijiaAPI": ["-c", "import mijiaAPI"],
+    "mijiaAPI --version": ["-m", "mijiaAPI", "--version"],
+}
+
+# 这些依赖只应在登录、首次请求或规格缺失时加载
+HEAVY_MODULES = ["qrcode", "Crypto", "requests", "tzlocal", "urllib3"]
+
+IMPORTTIME_LINE = re.compile(r"^import time:\s+(\d+)\s*\|\s*(\d+)\s*\|(\s*)(\S+)\s*$")
+
+
+def run_importtime(argv: List[str]) -> List[Tuple[str, int, int, int]]:
+    """运行一次解释器，返回 (模块, 自身耗时 us, 累计耗时 us, 嵌套深度) 列表"""
+    env = dict(os.environ, PYTHONPATH=os.pathsep.join(filter(None, [PROJECT_ROOT, os.getenv("PYTHONPATH")])))
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", *argv],
+        capture_output=True, text=True, env=env, cwd=PROJECT_ROOT,
+    )
+    if proc.returncode != 0:
+        raise RuntimeError(f"{' '.join(argv)} 运行失败:\n{proc.stderr}")
+    modules = []
+    for line in proc.stderr.splitlines():
+        match = IMPORTTIME_LINE.match(line)
+        if match:
+            self_us, cumulative_us, indent, name = match.groups()
+            modules.append((name, int(self_us), int(cumulative_us), len(indent) // 2))
+    return modules
+
+
+def measure(argv: List[str], repeat: int, baseline: Set[str]) -> Tuple[float, List[Tuple[str, int, int, int]]]:
+    """
+    重复 repeat 次取最快一次，返回 (毫秒, 该次的模块列表)
+
+    耗时为顶层导入的累计耗时之和，不计解释器启动本身就会导入的模块 (baseline)。
+    """
+    best_ms, best = float("inf"), []
+    for _ in range(repeat):
+        modules = [m for m in run_importtime(argv) if m[0] not in baseline]
+        ms = sum(cumulative for _, _, cumulative, depth in modules if depth == 0) / 1000
+        if ms < best_ms:
+            best_ms, best = ms, modules
+    return best_ms, best
+
+
+def loaded_heavy(modules: List[Tuple[str, int, int, int]]) -> Dict[str, bool]:
+    names = {name.split(".")[0] for name, _, _, _ in modules}
+    return {heavy: heavy in names for heavy in HEAVY_MODULES}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="导入耗时基准测试")
+    parser.add_argument("--repeat", type=int, default=5, help="重复次数，取最快一次 (默认: 5)")
+    parser.add_argument("--top", type=int, default=10, help="输出累计耗时最多的模块数量 (默认: 10)")
+    parser.add_argument("--budget_ms", type=float, default=None, help="耗时预算 (毫秒)，超出或加载了重量级依赖时退出码为 1")
+    args = parser.parse_args()
+
+    baseline = {name for name, _, _, _ in run_importtime(["-c", "pass"])}
+    failed = False
+    for title, argv in SCENARIOS.items():
+        ms, modules = measure(argv, args.repeat, baseline)
+        print(f"{title}: {ms:.1f} ms")
+        for name, self_us, cumulative_us, _ in sorted(modules, key=lambda m: -m[2])[:args.top]:
+            print(f"  {cumulative_us / 1000:8.2f} ms  (自身 {self_us / 1000:6.2f} ms)  {name}")
+        heavy = [name for name, loaded in loaded_heavy(modules).items() if loaded]
+        if heavy:
+            print(f"  注意: 已加载重量级依赖 {', '.join(heavy)}")
+            failed = True
+        if args.budget_ms is not None and ms > args.budget_ms:
+            print(f"  超出预算 {args.budget_ms:.0f} ms")
+            failed = True
+    if args.budget_ms is not None and failed:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,149 @@
+"""
+设备规格页面解析基准测试
+
+对比 get_device_info() 旧的正则解析方式与 mijiaAPI.specparse 的解析耗时。
+
+用法:
+    python -m tools.bench_spec_parse --fetch yeelink.light.lamp4 huca.switch.dh3   # 下载页面到 --pages 目录
+    python -m tools.bench_spec_parse                                              # 对 --pages 目录中的页面做基准测试
+    python -m tools.bench_spec_parse --processes 4                                # 同时测试进程池批量解析
+"""
+import argparse
+import json
+import os
+import re
+import sys
+import time
+from pathlib import Path
+
+
+# Add project root to path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from mijiaAPI.specparse import parse_spec_page, parse_spec_pages
+
+
+DEFAULT_PAGES_DIR = Path(".mijia-api-data") / "spec_pages"
+
+
+def legacy_parse(page: str, device_model: str) -> dict:
+    """get_device_info() 原有的解析实现，仅用于对比"""
+    content = re.search(r"data-page=\"(.*?)\">", page)
+    content = json.loads(content.group(1).replace("&quot;", "\""))
+    if content["props"]["product"]:
+        name = content["props"]["product"]["name"]
+        model = content["props"]["product"]["model"]
+    else:
+        name = content["props"]["spec"]["name"]
+        model = device_model
+    result = {"name": name, "model": model, "properties": [], "actions": []}
+    services = content["props"]["spec"]["services"]
+    properties_name = []
+    actions_name = []
+    for siid in services:
+        if "properties" in services[siid]:
+            for piid in services[siid]["properties"]:
+                prop = services[siid]["properties"][piid]
+                if prop["format"].startswith("int"):
+                    prop_type = "int"
+                elif prop["format"].startswith("uint"):
+                    prop_type = "uint"
+                else:
+                    prop_type = prop["format"]
+                item = {
+                    "name": prop["name"],
+                    "description": f"{prop.get('description', '')} / {prop.get('desc_zh_cn', '')}",
+                    "type": prop_type,
+                    "rw": "".join([
+                        "r" if "read" in prop["access"] else "",
+                        "w" if "write" in prop["access"] else ""
+                    ]),
+                    "unit": prop.get("unit", None),
+                    "range": prop.get("value-range", None),
+                    "value-list": prop.get("value-list", None),
+                    "method": {"siid": int(siid), "piid": int(piid)}
+                }
+                if item["name"] in properties_name:
+                    item["name"] = f"{services[siid]['name']}-{item['name']}"
+                properties_name.append(item["name"])
+                result["properties"].append({k: None if v == "none" else v for k, v in item.items()})
+        if "actions" in services[siid]:
+            for aiid in services[siid]["actions"]:
+                act = services[siid]["actions"][aiid]
+                if act["name"] in actions_name:
+                    act["name"] = f"{services[siid]['name']}-{act['name']}"
+                actions_name.append(act["name"])
+                result["actions"].append({
+                    "name": act["name"],
+                    "description": f"{act.get('description', '')} / {act.get('desc_zh_cn', '')}",
+                    "method": {"siid": int(siid), "aiid": int(aiid)}
+                })
+    return result
+
+
+def fetch_pages(models: list, pages_dir: Path):
+    import requests
+
+    from mijiaAPI.devices import device_url
+
+    pages_dir.mkdir(parents=True, exist_ok=True)
+    for model in models:
+        response = requests.get(device_url + model, timeout=30)
+        if response.status_code != 200:
+            print(f"下载失败 {model}: HTTP {response.status_code}")
+            continue
+        (pages_dir / f"{model}.html").write_text(response.text, encoding="utf-8")
+        print(f"已保存 {model} ({len(response.text)} 字节)")
+
+
+def bench(func, pages: dict, repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for model, page in pages.items():
+            func(page, model)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description="设备规格页面解析基准测试")
+    parser.add_argument("--pages", type=Path, default=DEFAULT_PAGES_DIR, help="已保存的规格页面目录 ({model}.html)")
+    parser.add_argument("--fetch", nargs="+", metavar="MODEL", help="下载指定型号的规格页面到 --pages 目录")
+    parser.add_argument("--repeat", type=int, default=5, help="重复次数，取最快一次 (默认: 5)")
+    parser.add_argument("--processes", type=int, default=None, help="同时测试进程池批量解析的进程数")
+    args = parser.parse_args()
+
+    if args.fetch:
+        fetch_pages(args.fetch, args.pages)
+        return
+
+    pages = {p.stem: p.read_text(encoding="utf-8") for p in sorted(args.pages.glob("*.html"))}
+    if not pages:
+        print(f"{args.pages} 中没有页面，请先使用 --fetch 下载")
+        return
+    total_bytes = sum(len(p) for p in pages.values())
+    print(f"{len(pages)} 个页面, 共 {total_bytes / 1024:.0f} KiB")
+
+    def comparable(info: dict) -> dict:
+        # 旧实现不记录规格版本
+        return {k: v for k, v in info.items() if k != "type"}
+
+    mismatched = [m for m, p in pages.items() if legacy_parse(p, m) != comparable(parse_spec_page(p, m))]
+    if mismatched:
+        print(f"注意: 以下页面解析结果与旧实现不同 (通常是旧实现未处理的 HTML 实体): {', '.join(mismatched)}")
+
+    legacy = bench(legacy_parse, pages, args.repeat)
+    fast = bench(parse_spec_page, pages, args.repeat)
+    print(f"旧实现 (正则):   {legacy * 1000:8.2f} ms  ({legacy / len(pages) * 1000:.3f} ms/页)")
+    print(f"specparse:      {fast * 1000:8.2f} ms  ({fast / len(pages) * 1000:.3f} ms/页)  x{legacy / fast:.2f}")
+
+    if args.processes:
+        start = time.perf_counter()
+        parse_spec_pages(pages, processes=args.processes)
+        pooled = time.perf_counter() - start
+        print(f"进程池 ({args.processes}):    {pooled * 1000:8.2f} ms  (含进程启动开销)")
+
+
+if __name__ == "__main__":
+    main()
@@ -63,20 +63,21 @@ def diagnose_device(adapter, device):
             print(f"  检查设备时出错: {e}")
 
 
-def diagnose(device_type: str = "all", auth_path: str = None):
+def diagnose(device_type: str = "all", auth_path: str = None, gateway: str = None):
     """
     诊断米家设备
 
     Args:
         device_type: 设备类型 ("mijia", "purifier", "all")
         auth_path: 认证文件路径
+        gateway: 常驻网关地址 (mijiaAPI serve)，默认读取环境变量 MIJIA_GATEWAY
     """
     if auth_path is None:
         auth_path = get_default_auth_path()
 
     print(f"正在初始化米家适配器...")
     print(f"认证文件: {auth_path}")
-    adapter = MijiaAdapter(auth_path=auth_path)
+    adapter = MijiaAdapter(auth_path=auth_path, gateway=gateway)
 
     if not adapter.is_available:
         print("米家 API 不可用。")
@@ -128,9 +129,14 @@ def main():
         default=None,
         help="认证文件路径"
     )
+    parser.add_argument(
+        "--gateway", "-g",
+        default=None,
+        help="常驻网关地址，例如 http://127.0.0.1:8751 (默认读取环境变量 MIJIA_GATEWAY)"
+    )
 
     args = parser.parse_args()
-    diagnose(device_type=args.type, auth_path=args.auth)
+    diagnose(device_type=args.type, auth_path=args.auth, gateway=args.gateway)
 
 
 if __name__ == "__main__":
@@ -26,7 +26,8 @@ DEFAULT_CONFIG = {
     },
     "mijia": {
         "enabled": False,
-        "auth_path": ".mijia-api-data/auth.json"
+        "auth_path": ".mijia-api-data/auth.json",
+        "revalidate_specs": False
     }
 }
 
@@ -295,6 +296,10 @@ class ConfigManager:
             self.config["mijia"] = {}
         self.config["mijia"]["auth_path"] = auth_path
     
+    def is_spec_revalidation_enabled(self) -> bool:
+        """是否在后台定期检查设备规格更新"""
+        return self.get_mijia_config().get("revalidate_specs", False)
+    
     # ============ 通知相关 ============
     
     def get_notification_config(self) -> dict:
@@ -6,7 +6,7 @@ AquaGuard 韩家家庭智能系统 - 设备模型模块
 
 from enum import Enum
 from dataclasses import dataclass, field
-from typing import Optional, Dict, Any
+from typing import Optional, Dict, Any, FrozenSet
 from datetime import datetime
 import uuid
 
@@ -23,6 +23,16 @@ class DeviceType(Enum):
     MIJIA_SENSOR = "mijia_sensor"  # 米家传感器
 
 
+# 米家设备类型
+MIJIA_TYPES = (
+    DeviceType.MIJIA,
+    DeviceType.MIJIA_LIGHT,
+    DeviceType.MIJIA_SWITCH,
+    DeviceType.MIJIA_FAN,
+    DeviceType.MIJIA_SENSOR,
+)
+
+
 # 设备类型对应的图标和颜色
 DEVICE_TYPE_INFO = {
     DeviceType.LIGHT: {
@@ -68,6 +78,38 @@ DEVICE_TYPE_INFO = {
 }
 
 
+@dataclass(frozen=True)
+class StateChange:
+    """
+    一次状态更新的差异
+    
+    Attributes:
+        device_id: 设备 ID
+        version: 更新后的状态版本
+        changed: 值发生变化的 data 键 (新增、修改或删除)
+        online_changed: 在线状态是否变化
+    """
+    device_id: str
+    version: int
+    changed: FrozenSet[str] = frozenset()
+    online_changed: bool = False
+    
+    def __bool__(self) -> bool:
+        return bool(self.changed) or self.online_changed
+    
+    def merge(self, other: "StateChange") -> "StateChange":
+        """合并同一设备的两次更新"""
+        return StateChange(
+            device_id=self.device_id,
+            version=max(self.version, other.version),
+            changed=self.changed | other.changed,
+            online_changed=self.online_changed or other.online_changed,
+        )
+
+
+_MISSING = object()
+
+
 @dataclass
 class Device:
     """
@@ -81,6 +123,7 @@ class Device:
         online: 是否在线
         last_seen: 最后一次检测到在线的时间
         data: 设备特定的状态数据 (如灯的颜色、传感器的温度等)
+        state_version: 状态版本，online 或 data 实际变化时递增
     """
     id: str = field(default_factory=lambda: str(uuid.uuid4()))
     name: str = "未命名设备"
@@ -96,6 +139,10 @@ class Device:
     # 连接失败计数 (用于离线检测)
     _fail_count: int = field(default=0, repr=False)
     
+    state_version: int = field(default=0, repr=False, compare=False)
+    # 状态文本缓存: (缓存键, 文本)
+    _status_text_cache: Optional[tuple] = field(default=None, repr=False, compare=False)
+    
     def to_dict(self) -> dict:
         """
         序列化为字典 (用于保存到 config.json)
@@ -165,13 +212,42 @@ class Device:
         """获取设备类型名称"""
         return DEVICE_TYPE_INFO.get(self.type, {}).get("name", "未知设备")
     
-    def mark_online(self) -> None:
+    def apply_state(self, data: Optional[Dict[str, Any]] = None, online: Optional[bool] = None) -> StateChange:
+        """
+        更新设备状态并返回差异
+        
+        data 整体替换 (不原地修改原字典)，值没有变化时保留原字典，版本号不变。
+        
+        Args:
+            data: 新的状态数据，None 表示不修改
+            online: 新的在线状态，None 表示不修改
+            
+        Returns:
+            本次更新的差异，没有变化时为假值
+        """
+        changed: FrozenSet[str] = frozenset()
+        if data is not None:
+            old = self.data
+            changed = frozenset(
+                key for key in old.keys() | data.keys()
+                if old.get(key, _MISSING) != data.get(key, _MISSING)
+            )
+            if changed:
+                self.data = dict(data)
+        online_changed = online is not None and online != self.online
+        if online_changed:
+            self.online = online
+        if changed or online_changed:
+            self.state_version += 1
+        return StateChange(self.id, self.state_version, changed, online_changed)
+    
+    def mark_online(self) -> StateChange:
         """标记设备在线"""
-        self.online = True
         self.last_seen = datetime.now()
         self._fail_count = 0
+        return self.apply_state(online=True)
     
-    def mark_failed(self, max_fails: int = 3) -> None:
+    def mark_failed(self, max_fails: int = 3) -> StateChange:
         """
         标记一次连接失败
         
@@ -179,16 +255,24 @@ class Device:
             max_fails: 连续失败多少次后标记为离线
         """
         self._fail_count += 1
-        if self._fail_count >= max_fails:
-            self.online = False
+        return self.apply_state(online=False if self._fail_count >= max_fails else None)
     
     def get_status_text(self) -> str:
         """
         获取状态文本 (用于 UI 显示)
         
+        按状态版本缓存，状态没有变化时不重新计算
+        
         Returns:
             状态描述字符串
         """
+        # data 和 online 也可能被直接赋值，缓存键同时包含它们的标识
+        key = (self.state_version, self.online, self.type, id(self.data))
+        if self._status_text_cache is None or self._status_text_cache[0] != key:
+            self._status_text_cache = (key, self._compute_status_text())
+        return self._status_text_cache[1]
+    
+    def _compute_status_text(self) -> str:
         if not self.online:
             return "离线"
         
@@ -268,10 +352,14 @@ class Device:
     @property
     def is_mijia(self) -> bool:
         """是否为米家设备"""
-        return self.type in (
-            DeviceType.MIJIA,
-            DeviceType.MIJIA_LIGHT,
-            DeviceType.MIJIA_SWITCH,
-            DeviceType.MIJIA_FAN,
-            DeviceType.MIJIA_SENSOR
-        )
+        return self.type in MIJIA_TYPES
+    
+    @property
+    def real_did(self) -> str:
+        """物理设备 ID (多键开关通道的 real_did.sN 去掉通道后缀)"""
+        return self.did.split(".")[0] if self.did else ""
+    
+    @property
+    def is_switch_channel(self) -> bool:
+        """是否为多键开关的一个通道 (虚拟设备 real_did.sN)"""
+        return bool(self.did) and "." in self.did and ".s" in self.did
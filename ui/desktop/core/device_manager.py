@@ -7,12 +7,47 @@ AquaGuard 小韩智能家庭管理系统 - 设备管理器模块
 import threading
 import time
 from typing import List, Optional, Callable, Dict, Any
-from concurrent.futures import ThreadPoolExecutor, as_completed
 
-from .device import Device, DeviceType
+from .device import Device, DeviceType, MIJIA_TYPES, StateChange
+from .device_registry import DeviceRegistry
+from .event_bus import (
+    DeviceEvent, DeviceStateChanged, EventBus, OnlineChanged, PowerChanged, SensorReading, Subscription,
+)
 from .api_client import SensorClient, LightClient
-from .mijia_adapter import MijiaAdapter, MijiaDeviceInfo, MIJIA_AVAILABLE
+from .mijia_adapter import MijiaAdapter, MijiaDeviceInfo, MIJIA_AVAILABLE, DEVICE_OFFLINE_CODE
 from .notification import NotificationService
+from .poll_scheduler import PollScheduler
+
+
+# 米家在线状态刷新任务的调度标识
+MIJIA_STATUS_JOB = "__mijia_status__"
+
+# 米家设备批量轮询任务的调度标识 (所有米家设备共用一个任务，每轮合并为批量请求)
+MIJIA_POLL_JOB = "__mijia_poll__"
+
+# 米家离线退避的最长间隔 (秒)
+MIJIA_MAX_BACKOFF = 60.0
+
+# 米家在线状态刷新间隔 (秒)：有设备上下线时回到最短间隔，连续无变化时逐步加倍
+MIJIA_STATUS_MIN_INTERVAL = 15.0
+MIJIA_STATUS_MAX_INTERVAL = 120.0
+
+# 设备类型 -> 米家状态读取类别
+MIJIA_CATEGORIES = {
+    DeviceType.MIJIA_LIGHT: "light",
+    DeviceType.MIJIA_SWITCH: "switch",
+    DeviceType.MIJIA_FAN: "fan",
+    DeviceType.MIJIA_SENSOR: "sensor",
+}
+
+# 表示开关状态的 data 键
+POWER_KEYS = frozenset({"power", "is_on"})
+
+# 发布为 SensorReading 的 data 键
+SENSOR_KEYS = frozenset({"temperature", "humidity", "tds_value", "water_level", "pm25", "air_quality"})
+
+# 轮询线程池大小 (米家 API 较慢，需要一定并发)
+POLL_WORKERS = 8
 
 
 class DeviceManager:
@@ -34,18 +69,31 @@ class DeviceManager:
             config_manager: ConfigManager 实例，用于持久化设备列表
         """
         self._config = config_manager
-        self._devices: Dict[str, Device] = {}
+        self._registry = DeviceRegistry()  # 线程安全的设备集合，读取使用快照
         self._clients: Dict[str, Any] = {}  # 缓存客户端实例
         
         # 轮询相关
         self._polling = False
-        self._poll_thread: Optional[threading.Thread] = None
+        self._scheduler: Optional[PollScheduler] = None
         self._poll_interval_ms = 3000
-        self._on_status_update: Optional[Callable[[Device], None]] = None
-        
-        # 状态追踪 (用于通知)
-        self._last_power_state: Dict[str, bool] = {}  # {did: is_on}
+        self._device_intervals: Dict[str, int] = {}  # 单独设置的轮询间隔 {device_id: ms}
+        self._mijia_due: Dict[str, float] = {}  # 米家设备下一次轮询时间 {device_id: monotonic}
+        self._mijia_fails: Dict[str, int] = {}  # 米家设备连续失败次数，用于退避
+        self._mijia_lock = threading.Lock()  # 保护 _mijia_due 和 _mijia_fails (批量轮询和在线状态任务并发修改)
+        self._status_interval = MIJIA_STATUS_MIN_INTERVAL  # 当前在线状态刷新间隔 (秒)
+        self._first_poll_done = False
+        self._poll_start_time = time.time()
+        self._status_subscription: Optional[Subscription] = None
+        
+        # 设备事件总线：轮询线程只发布事件，通知、状态记录和 UI 各自订阅
+        self._events = EventBus()
+        self._last_power_state: Dict[str, bool] = {}  # {device_id: is_on}
+        self._power_lock = threading.Lock()  # 保护 _last_power_state 的读取和更新
         self._notification_service = NotificationService()
+        self._events.subscribe(self._log_power_change, topics=(PowerChanged,),
+                               where=_is_power_transition, coalesce=False, name="status_log")
+        self._events.subscribe(self._push_power_change, topics=(PowerChanged,),
+                               where=_is_power_transition, name="notification")
         
         # 初始化通知配置
         notify_config = self._config.get_notification_config()
@@ -58,27 +106,27 @@ class DeviceManager:
         self._mijia_adapter: Optional[MijiaAdapter] = None
         if MIJIA_AVAILABLE:
             auth_path = self._config.get_mijia_auth_path()
-            self._mijia_adapter = MijiaAdapter(auth_path)
+            self._mijia_adapter = MijiaAdapter(
+                auth_path, revalidate_specs=self._config.is_spec_revalidation_enabled()
+            )
         
         # 加载设备
         self._load_devices()
-        
-        # 初始化上一轮状态，避免启动时误报
-        # 注意：这里还没有实际状态，需要等第一次轮询后填充
-        self._initial_poll_done = False
     
     def _load_devices(self) -> None:
         """从配置加载设备列表"""
         devices_data = self._config.get_devices()
+        devices = []
         for d in devices_data:
             device = Device.from_dict(d)
-            self._devices[device.id] = device
+            devices.append(device)
             print(f"[设备管理] 已加载设备: {device.name} ({device.ip})")
+        self._registry = DeviceRegistry(devices)
     
     
     def save_devices(self) -> None:
         """保存设备列表到配置"""
-        devices_list = [d.to_dict() for d in self._devices.values()]
+        devices_list = [d.to_dict() for d in self._registry.all()]
         self._config.set_devices(devices_list)
         self._config.save()
         
@@ -102,8 +150,9 @@ class DeviceManager:
             新创建的 Device 实例
         """
         device = Device(name=name, type=device_type, ip=ip)
-        self._devices[device.id] = device
+        self._registry.add(device)
         self._save_devices()
+        self._schedule_device(device)
         print(f"[设备管理] 已添加设备: {device.name} ({device.ip})")
         return device
     
@@ -117,11 +166,17 @@ class DeviceManager:
         Returns:
             是否删除成功
         """
-        if device_id in self._devices:
-            device = self._devices.pop(device_id)
+        device = self._registry.remove(device_id)
+        if device is not None:
             # 清理客户端缓存
             if device_id in self._clients:
                 del self._clients[device_id]
+            self._device_intervals.pop(device_id, None)
+            with self._mijia_lock:
+                self._mijia_due.pop(device_id, None)
+                self._mijia_fails.pop(device_id, None)
+            if self._scheduler:
+                self._scheduler.remove(device_id)
             self._save_devices()
             print(f"[设备管理] 已删除设备: {device.name}")
             return True
@@ -139,14 +194,17 @@ class DeviceManager:
         Returns:
             是否更新成功
         """
-        if device_id not in self._devices:
+        device = self._registry.get(device_id)
+        if device is None:
             return False
         
-        device = self._devices[device_id]
+        changes = {}
         if name is not None:
-            device.name = name
+            changes["name"] = name
+        if ip is not None:
+            changes["ip"] = ip
+        self._registry.update(device, **changes)
         if ip is not None:
-            device.ip = ip
             # IP 变化需要清除客户端缓存
             if device_id in self._clients:
                 del self._clients[device_id]
@@ -156,19 +214,45 @@ class DeviceManager:
     
     def get_device(self, device_id: str) -> Optional[Device]:
         """获取指定设备"""
-        return self._devices.get(device_id)
+        return self._registry.get(device_id)
+    
+    def get_device_by_did(self, did: str) -> Optional[Device]:
+        """按米家 did 获取设备"""
+        return self._registry.get_by_did(did)
     
     def get_all_devices(self) -> List[Device]:
         """获取所有设备列表"""
-        return list(self._devices.values())
+        return self._registry.all()
     
     def get_devices_by_type(self, device_type: DeviceType) -> List[Device]:
         """按类型获取设备列表"""
-        return [d for d in self._devices.values() if d.type == device_type]
+        return self._registry.get_by_type(device_type)
     
     def get_mijia_devices(self) -> List[Device]:
         """获取所有米家设备"""
-        return [d for d in self._devices.values() if d.is_mijia]
+        return [d for t in MIJIA_TYPES for d in self._registry.get_by_type(t)]
+    
+    @property
+    def devices_version(self) -> int:
+        """设备集合或任一设备状态变化时递增，用于跳过没有变化的刷新"""
+        return self._registry.version
+    
+    def update_device_state(self, device_id: str, **data: Any) -> Optional[Device]:
+        """
+        合并更新设备状态数据 (如控制成功后的本地状态)
+        
+        Args:
+            device_id: 设备 ID
+            **data: 要更新的状态键值
+            
+        Returns:
+            设备实例，不存在时返回 None
+        """
+        device = self._registry.get(device_id)
+        if device is not None:
+            change = self._registry.replace_state(device, data={**device.data, **data})
+            self._publish_change(device, change)
+        return device
     
     # ============ 米家设备管理 ============
     
@@ -212,8 +296,9 @@ class DeviceManager:
             did=info.did,
             model=info.model
         )
-        self._devices[device.id] = device
+        self._registry.add(device)
         self._save_devices()
+        self._schedule_device(device)
         print(f"[设备管理] 已添加米家设备: {device.name} (did={info.did})")
         return device
     
@@ -233,7 +318,7 @@ class DeviceManager:
         mijia_devices = self._mijia_adapter.get_devices()
         
         # 获取已存在的 did 集合
-        existing_dids = {d.did for d in self._devices.values() if d.did}
+        existing_dids = self._registry.snapshot().by_did
         
         added_count = 0
         for info in mijia_devices:
@@ -279,17 +364,54 @@ class DeviceManager:
     # ============ 状态轮询 ============
     
     def set_poll_interval(self, interval_ms: int) -> None:
-        """设置轮询间隔"""
+        """设置轮询间隔 (未单独设置间隔的设备)"""
         self._poll_interval_ms = max(1000, interval_ms)
+        if self._scheduler:
+            for key in self._scheduler.keys():
+                self._scheduler.set_interval(key, self._job_interval(key))
+    
+    def set_device_poll_interval(self, device_id: str, interval_ms: Optional[int]) -> None:
+        """
+        设置单个设备的轮询间隔
+        
+        Args:
+            device_id: 设备 ID
+            interval_ms: 轮询间隔 (毫秒)，None 表示使用全局间隔
+        """
+        if interval_ms is None:
+            self._device_intervals.pop(device_id, None)
+        else:
+            self._device_intervals[device_id] = max(1000, interval_ms)
+        if self._scheduler:
+            self._scheduler.set_interval(device_id, self._job_interval(device_id))
+            self._scheduler.set_interval(MIJIA_POLL_JOB, self._job_interval(MIJIA_POLL_JOB))
+    
+    def get_poll_stats(self) -> Dict[str, int]:
+        """轮询调度统计 (任务数、执行次数、超时次数、退避中的设备数)"""
+        if self._scheduler:
+            return self._scheduler.stats()
+        return {}
+    
+    @property
+    def events(self) -> EventBus:
+        """设备事件总线，订阅 DeviceStateChanged/OnlineChanged/PowerChanged/SensorReading"""
+        return self._events
     
     def set_status_callback(self, callback: Callable[[Device], None]) -> None:
         """
-        设置状态更新回调
+        设置状态更新回调 (兼容旧接口)
+        
+        等价于在发布事件的线程中同步订阅 DeviceStateChanged，新代码应使用 events.subscribe()
         
         Args:
             callback: 回调函数，参数为更新后的 Device
         """
-        self._on_status_update = callback
+        if self._status_subscription is not None:
+            self._events.unsubscribe(self._status_subscription)
+        self._status_subscription = self._events.subscribe(
+            lambda event: callback(event.device), topics=(DeviceStateChanged,),
+            dispatch=_call_now, name="status_callback",
+        )
     
     def start_polling(self) -> None:
         """启动状态轮询"""
@@ -300,128 +422,234 @@ class DeviceManager:
         self._first_poll_done = False  # 标记首次轮询是否完成
         self._poll_start_time = time.time()  # 记录启动时间
         print(f"[设备管理] 状态轮询已启动 (T+0.0s)")
-        self._poll_thread = threading.Thread(target=self._poll_loop, daemon=True)
-        self._poll_thread.start()
+        
+        # 常驻线程池 + 截止时间调度：每个设备按自己的间隔轮询，首次轮询在一个间隔内错开
+        # 米家设备不单独调度，由批量任务每轮合并读取
+        self._scheduler = PollScheduler(self._run_poll_job, max_workers=POLL_WORKERS)
+        if self.is_mijia_available():
+            # 米家在线状态先于设备轮询执行
+            self._scheduler.add(MIJIA_STATUS_JOB, self._job_interval(MIJIA_STATUS_JOB), delay=0)
+            self._scheduler.add(MIJIA_POLL_JOB, self._job_interval(MIJIA_POLL_JOB), delay=0)
+        device_ids = [d.id for d in self._registry.all() if not d.is_mijia]
+        for device_id in device_ids:
+            self._scheduler.add(device_id, self._job_interval(device_id))
+        self._scheduler.stagger(device_ids)
+        self._scheduler.start()
     
     def stop_polling(self) -> None:
         """停止状态轮询"""
         self._polling = False
-        if self._poll_thread:
-            self._poll_thread.join(timeout=2.0)
-            self._poll_thread = None
+        if self._scheduler:
+            self._scheduler.stop()
+            self._scheduler = None
         print("[设备管理] 状态轮询已停止")
     
-    def _poll_loop(self) -> None:
-        """轮询循环"""
-        # 启动时立即执行一次轮询，不等待
-        elapsed = time.time() - self._poll_start_time
-        print(f"[设备管理] 开始首次轮询 (T+{elapsed:.1f}s)")
-        self._poll_all_devices()
-        elapsed = time.time() - self._poll_start_time
-        print(f"[设备管理] 首次轮询完成 (T+{elapsed:.1f}s)")
-        self._first_poll_done = True
-        
-        while self._polling:
-            time.sleep(self._poll_interval_ms / 1000.0)
-            if self._polling:  # 检查是否仍在运行
-                self._poll_all_devices()
-    
-    def _poll_all_devices(self) -> None:
-        """并发轮询所有设备"""
-        devices = list(self._devices.values())
-        if not devices:
+    def _job_interval(self, key: str) -> float:
+        """轮询任务的间隔 (秒)"""
+        if key == MIJIA_STATUS_JOB:
+            return self._status_interval
+        if key == MIJIA_POLL_JOB:
+            # 批量任务按米家设备中最短的间隔运行，每轮只读取到期的设备
+            intervals = []
+            for device_id, ms in list(self._device_intervals.items()):
+                device = self._registry.get(device_id)
+                if device is not None and device.is_mijia:
+                    intervals.append(ms)
+            return min([self._poll_interval_ms] + intervals) / 1000.0
+        return self._device_intervals.get(key, self._poll_interval_ms) / 1000.0
+    
+    def _schedule_device(self, device: Device) -> None:
+        """轮询运行中添加的设备立即加入调度"""
+        if not self._scheduler:
             return
-            
-        # 1. 快速批量更新米家设备在线状态
-        if self.is_mijia_logged_in():
-            try:
-                # 这一步很快，一次请求获取所有设备在线状态
-                ts = time.time()
-                mijia_list = self._mijia_adapter.get_devices()
-                te = time.time()
-                print(f"[设备管理] get_devices() 耗时: {te-ts:.3f}s")
-                mijia_list = mijia_list or [] # 防止 None
-                mijia_status_map = {d.did: d.is_online for d in mijia_list}
-                
-                # 更新本地状态
-                for d in devices:
-                    if d.did and d.did in mijia_status_map:
-                        d.online = mijia_status_map[d.did]
-                        # 如果是在线状态且没有 power 属性，可以先标记为在线
-                        if d.online and "power" not in d.data:
-                             # 触发一次简单回调，让 UI 显示在线（即使还没获取到详细属性）
-                             # 仅当设备可见时才触发回调
-                             if self._on_status_update and d.visible:
-                                 self._on_status_update(d)
-                
-                # 初始化状态监控 (仅一次)
-                if not self._initial_poll_done:
-                    # 记录初始状态，避免启动时误报
-                    for d in devices:
-                        is_on = d.data.get("is_on", False)
-                        self._last_power_state[d.id] = is_on
-                    self._initial_poll_done = True
+        if device.is_mijia:
+            # 下一轮批量任务中读取
+            with self._mijia_lock:
+                self._mijia_due.pop(device.id, None)
+        else:
+            self._scheduler.add(device.id, self._job_interval(device.id))
+    
+    def _run_poll_job(self, key: str) -> Optional[bool]:
+        """
+        执行一次轮询任务 (由调度器在线程池中调用)
+        
+        Returns:
+            True 成功, False 失败 (调度器退避), None 本次跳过
+        """
+        if key == MIJIA_STATUS_JOB:
+            return self._refresh_mijia_status()
+        if key == MIJIA_POLL_JOB:
+            return self._poll_mijia_batch()
+        
+        device = self._registry.get(key)
+        if device is None:
+            # 设备已删除
+            if self._scheduler:
+                self._scheduler.remove(key)
+            return None
+        if not device.visible:
+            return None
+        ok = self._poll_device(device)
+        if not self._first_poll_done:
+            self._first_poll_done = True
+            elapsed = time.time() - self._poll_start_time
+            print(f"[设备管理] 首个设备轮询完成 (T+{elapsed:.1f}s)")
+        return ok
+    
+    def _should_poll_mijia(self, device: Device) -> bool:
+        """可见的米家设备中，在线或从未获取过数据的设备需要轮询详细属性"""
+        if not device.is_mijia or not device.visible or not device.did:
+            return False
+        # 离线的米家设备由在线状态任务跟踪，恢复在线后再轮询详细属性
+        return device.online or not device.last_seen
+    
+    def _poll_mijia_batch(self) -> Optional[bool]:
+        """
+        批量轮询到期的米家设备
+        
+        汇总所有到期设备 (包括虚拟开关) 需要读取的属性，通过适配器合并为尽量少的
+        get_devices_prop 请求，再把结果分发到各个 Device。
+        读取失败的设备按 2 的幂退避，不影响其他设备。
+        """
+        if not self._mijia_adapter or not self._mijia_adapter.is_logged_in:
+            return None
+        now = time.monotonic()
+        # 留出少量余量，避免调度抖动导致到期设备错过本轮
+        horizon = now + self._job_interval(MIJIA_POLL_JOB) * 0.25
+        with self._mijia_lock:
+            due = [
+                d for d in self._registry.all()
+                if self._should_poll_mijia(d) and self._mijia_due.get(d.id, 0.0) <= horizon
+            ]
+        if due:
+            self._poll_mijia_devices(self._with_switch_channels(due), now)
+        return True if due else None
+    
+    def _with_switch_channels(self, devices: List[Device]) -> List[Device]:
+        """
+        补充多键开关的其他通道
+        
+        多键开关的每个通道是一个虚拟设备 (real_did.sN)，任一通道需要读取时，
+        同一物理设备的所有通道在同一次请求中读取并一起更新，之后按相同的时间轮询
+        """
+        parents = {d.real_did for d in devices if d.is_switch_channel}
+        if not parents:
+            return devices
+        ids = {d.id for d in devices}
+        channels = [
+            d for real_did in parents for d in self._registry.get_by_real_did(real_did)
+            if d.id not in ids and d.is_switch_channel and self._should_poll_mijia(d)
+        ]
+        return devices + channels
+    
+    def _poll_mijia_devices(self, due: List[Device], now: float) -> None:
+        """批量读取米家设备状态，并安排各设备的下一次轮询时间"""
+        statuses = self._mijia_adapter.get_devices_status(
+            {d.did: MIJIA_CATEGORIES.get(d.type, "other") for d in due}
+        )
+        offline = []
+        for d in due:
+            status = statuses.get(d.did)
+            if status and status.get("code") == DEVICE_OFFLINE_CODE and d.online:
+                offline.append(d)
+            ok = self._apply_mijia_status(d, status)
+            interval = self._job_interval(d.id)
+            with self._mijia_lock:
+                if ok:
+                    self._mijia_fails.pop(d.id, None)
                 else:
-                    # 检查状态变化并通知
-                    self._check_power_change_and_notify(devices)
-
-
-            except Exception as e:
-                print(f"[设备管理] 批量获取在线状态失败: {e}")
-
-        # 2. 筛选需要详细轮询的设备
-        # - ESP 设备 (无 DID)
-        # - 可见且在线的米家设备 (visible=True, online=True)
-        # - 从未获取过数据的可见米家设备
-        targets = []
+                    fails = self._mijia_fails.get(d.id, 0) + 1
+                    self._mijia_fails[d.id] = fails
+                    interval = min(MIJIA_MAX_BACKOFF, interval * 2 ** fails)
+                self._mijia_due[d.id] = now + interval
+        
+        if offline:
+            # 读取属性时发现设备离线，尽快刷新在线状态以便及时发现恢复
+            print(f"[设备管理] 米家设备离线: {', '.join(d.name for d in offline)}")
+            self._set_status_interval(MIJIA_STATUS_MIN_INTERVAL)
+        
+        if not self._first_poll_done:
+            self._first_poll_done = True
+            elapsed = time.time() - self._poll_start_time
+            print(f"[设备管理] 首轮米家设备批量轮询完成: {len(due)} 台 (T+{elapsed:.1f}s)")
+    
+    def _refresh_mijia_status(self) -> Optional[bool]:
+        """
+        刷新米家设备在线状态
+        
+        独立于属性轮询的慢速任务。设备列表与当前状态比较，只更新并通知上下线的设备；
+        有变化时回到最短刷新间隔，连续无变化时间隔逐步加倍，最长 MIJIA_STATUS_MAX_INTERVAL 秒。
+        """
+        if not self.is_mijia_logged_in():
+            return None
+        devices = self._registry.all()
+        states = self._mijia_adapter.get_online_states()
+        if states is None:
+            return False
+        
+        changed = []
         for d in devices:
-            if not d.visible:
+            if not d.is_mijia or not d.did:
                 continue
-                
-            if not d.did: # ESP 设备
-                targets.append(d)
-            elif d.online: # 在线的米家设备
-                targets.append(d)
-            elif not d.last_seen: # 从未见过的设备
-                targets.append(d)
-        
-        if not targets:
-            return
-            
-        # 使用更大的线程池以加快并发获取（米家 API 较慢，需要更多并发）
-        max_workers = min(20, len(targets))
-        with ThreadPoolExecutor(max_workers=max_workers) as executor:
-            futures = {executor.submit(self._poll_device, d): d for d in targets}
-            for future in as_completed(futures):
-                try:
-                    future.result()
-                except Exception as e:
-                    print(f"[设备管理] 轮询出错: {e}")
-    
-    def _poll_device(self, device: Device) -> None:
+            # 虚拟开关跟随真实设备的在线状态
+            online = states.get(d.real_did)
+            if online is None:
+                continue
+            change = self._registry.replace_state(d, online=online)
+            if not change:
+                continue
+            if online:
+                # 恢复在线的设备在下一轮批量轮询中读取详细属性
+                with self._mijia_lock:
+                    self._mijia_due.pop(d.id, None)
+                    self._mijia_fails.pop(d.id, None)
+            changed.append((d, change))
+        
+        if changed:
+            summary = ", ".join(f"{d.name}: {'在线' if d.online else '离线'}" for d, _ in changed)
+            print(f"[设备管理] 米家设备在线状态变化: {summary}")
+            self._set_status_interval(MIJIA_STATUS_MIN_INTERVAL)
+            for d, change in changed:
+                self._publish_change(d, change)
+        else:
+            self._set_status_interval(min(MIJIA_STATUS_MAX_INTERVAL, self._status_interval * 2))
+        return True
+    
+    def _set_status_interval(self, interval: float) -> None:
+        """修改在线状态刷新间隔，从下一次刷新开始生效"""
+        self._status_interval = interval
+        if self._scheduler:
+            self._scheduler.set_interval(MIJIA_STATUS_JOB, interval)
+    
+    def _poll_device(self, device: Device, freshness: Optional[str] = None) -> Optional[bool]:
         """
         轮询单个设备
         
         Args:
             device: 设备实例
+            freshness: 米家设备的读取策略 (None 使用云端缓存, "device" 实时读取)
+            
+        Returns:
+            本次是否读取成功，无法轮询的设备返回 None
         """
         # 米家设备使用专门的轮询方法
         if device.is_mijia:
-            self._poll_mijia_device(device)
-            return
+            return self._poll_mijia_device(device, freshness)
         
         # ESP 设备使用 HTTP 客户端
         client = self.get_client(device)
         if client is None:
-            return
+            return None
         
+        ok = False
         try:
             status = client.get_status()
             if status:
-                device.mark_online()
-                # 更新设备数据
+                ok = True
+                # 更新设备数据 (整体替换，读取方不会看到修改了一半的状态)
+                data = None
                 if device.type == DeviceType.LIGHT:
-                    device.data = {
+                    data = {
                         "power": status.power,
                         "mode": status.mode,
                         "color_r": status.color_r,
@@ -430,164 +658,171 @@ class DeviceManager:
                         "wifi_signal": status.wifi_signal
                     }
                 elif device.type == DeviceType.SENSOR:
-                    device.data = {
+                    data = {
                         "temperature": status.temperature,
                         "tds_value": status.tds_value,
                         "water_level": status.water_level,
                         "wifi_signal": status.wifi_signal
                     }
+                change = self._registry.mark_online(device, data)
             else:
-                device.mark_failed()
+                change = self._registry.mark_failed(device)
         except Exception as e:
-            device.mark_failed()
+            change = self._registry.mark_failed(device)
             print(f"[设备管理] 轮询 {device.name} 失败: {e}")
         
-        # 触发回调
-        if self._on_status_update:
-            try:
-                self._on_status_update(device)
-            except Exception as e:
-                print(f"[设备管理] 状态回调出错: {e}")
-
-    def _check_power_change_and_notify(self, devices: List[Device]) -> None:
-        """检查设备开关状态变化并发送通知"""
-        # 获取基础配置
-        notify_config = self._config.get_notification_config()
-        # print(f"[DEBUG] Check notify: enabled={notify_config.get('enabled')}") 
+        self._publish_change(device, change)
+        return ok
+    
+    # ============ 设备事件 ============
+    
+    def _publish_change(self, device: Device, change: StateChange) -> None:
+        """
+        将一次状态更新发布为设备事件，没有变化的轮询不产生事件
         
-        if not notify_config.get("enabled"):
+        Args:
+            device: 设备实例
+            change: 状态更新的差异
+        """
+        if not change:
             return
-            
-        # 获取规则配置
-        rules = self._config.get_notification_rules()
-        # print(f"[DEBUG] Rules: {rules}")
-
-        for d in devices:
-            if not d.visible:
-                continue
-                
-            # 获取当前开关状态
-            # 兼容 is_on (bool) 和 power (str)
-            current_is_on = d.data.get("is_on")
-            if current_is_on is None:
-                current_is_on = (d.data.get("power") == "on")
-                
-            last_is_on = self._last_power_state.get(d.id)
-            
-            # 如果是首次记录，直接保存并不通知
-            if last_is_on is None:
-                self._last_power_state[d.id] = current_is_on
-                continue
-
-            # 如果状态发生变化
-            if current_is_on != last_is_on:
-                # 更新记录
-                self._last_power_state[d.id] = current_is_on
-                
-                # 状态描述
-                action = "开启" if current_is_on else "关闭"
-                action_key = "on" if current_is_on else "off"
-                
-                # ===== 记录状态变更日志（记录所有设备变更，不论是否推送）=====
-                if self._config.is_status_log_enabled():
-                    import uuid
-                    log_entry = {
-                        "id": str(uuid.uuid4()),
-                        "device_id": d.id,
-                        "device_name": d.name,
-                        "action": action,
-                        "timestamp": time.strftime('%Y-%m-%d %H:%M:%S'),
-                        "read": False
-                    }
-                    self._config.add_status_log(log_entry)
-                    print(f"[状态记录] 已记录: {d.name} -> {action}")
-                
-                # ===== 检查是否需要推送通知 =====
-                # 只有明确配置了规则并且该动作设为 True 的设备才推送
-                # 没有配置规则的设备默认不推送
-                device_rule = rules.get(d.id)
-                
-                # 默认不推送，除非明确配置了该动作为 True
-                should_notify = False
-                if device_rule:
-                    should_notify = device_rule.get(action_key, False)
-                
-                if not should_notify:
-                   print(f"[DEBUG] 忽略推送: {d.name} -> {action_key} (未启用该设备推送)")
-                   continue
+        events: List[DeviceEvent] = [DeviceStateChanged(device, change)]
+        if change.online_changed:
+            events.append(OnlineChanged(device, device.online))
+        if change.changed & POWER_KEYS:
+            is_on = device.data.get("is_on")
+            if is_on is None:
+                is_on = device.data.get("power") == "on"
+            with self._power_lock:
+                previous = self._last_power_state.get(device.id)
+                self._last_power_state[device.id] = is_on
+            if is_on != previous:
+                events.append(PowerChanged(device, is_on, previous))
+        readings = {key: device.data[key] for key in change.changed & SENSOR_KEYS if key in device.data}
+        if readings:
+            events.append(SensorReading(device, readings))
+        self._events.publish(*events)
+    
+    def _log_power_change(self, event: PowerChanged) -> None:
+        """记录开关状态变更日志 (所有可见设备，不论是否推送)"""
+        if not self._config.is_status_log_enabled():
+            return
+        import uuid
+        d = event.device
+        action = "开启" if event.is_on else "关闭"
+        log_entry = {
+            "id": str(uuid.uuid4()),
+            "device_id": d.id,
+            "device_name": d.name,
+            "action": action,
+            "timestamp": time.strftime('%Y-%m-%d %H:%M:%S'),
+            "read": False
+        }
+        self._config.add_status_log(log_entry)
+        print(f"[状态记录] 已记录: {d.name} -> {action}")
 
-                # 准备通知内容
-                title = f"请注意,{d.name}已{action}!"
-                content = ""  # 内容留空,主要信息在标题中
-                
-                print(f"[通知] 检测到状态变化: {d.name} -> {action}, 准备发送推送...")
-                
-                # 发送通知
-                success = self._notification_service.send_push(title, content)
-                print(f"[通知] 推送请求已提交")
-    
-    def _poll_mijia_device(self, device: Device) -> None:
+    def _push_power_change(self, event: PowerChanged) -> None:
+        """按通知规则推送开关状态变化"""
+        # 合并后的事件可能开了又关，状态没有变化
+        if event.is_on == event.previous:
+            return
+        if not self._config.get_notification_config().get("enabled"):
+            return
+        d = event.device
+        action = "开启" if event.is_on else "关闭"
+        action_key = "on" if event.is_on else "off"
+        
+        # 只有明确配置了规则并且该动作设为 True 的设备才推送
+        # 没有配置规则的设备默认不推送
+        device_rule = self._config.get_notification_rules().get(d.id)
+        if not device_rule or not device_rule.get(action_key, False):
+            print(f"[DEBUG] 忽略推送: {d.name} -> {action_key} (未启用该设备推送)")
+            return
+        
+        # 准备通知内容
+        title = f"请注意,{d.name}已{action}!"
+        content = ""  # 内容留空,主要信息在标题中
+        
+        print(f"[通知] 检测到状态变化: {d.name} -> {action}, 准备发送推送...")
+        self._notification_service.send_push(title, content)
+        print(f"[通知] 推送请求已提交")
+    
+    def _poll_mijia_device(self, device: Device, freshness: Optional[str] = None) -> bool:
         """
         轮询米家设备
         
         Args:
             device: 设备实例
+            freshness: 读取策略 (None 使用云端缓存, "device" 实时读取)
+            
+        Returns:
+            本次是否读取成功
         """
         if not self._mijia_adapter:
             print(f"[设备管理] 米家设备 {device.name}: adapter 不可用")
-            device.mark_failed()
-            return
+            return self._apply_mijia_status(device, None)
         
         if not device.did:
             print(f"[设备管理] 米家设备 {device.name}: 缺少 did")
-            device.mark_failed()
-            return
+            return self._apply_mijia_status(device, None)
         
         if not self._mijia_adapter.is_logged_in:
             # 静默失败，不输出日志（避免刷屏）
-            device.mark_failed()
-            return
+            return self._apply_mijia_status(device, None)
         
+        # 多键开关的其他通道一起读取并更新
+        group = self._with_switch_channels([device])
         try:
-            # 从设备类型推断类别
-            category_map = {
-                DeviceType.MIJIA_LIGHT: "light",
-                DeviceType.MIJIA_SWITCH: "switch",
-                DeviceType.MIJIA_FAN: "fan",
-                DeviceType.MIJIA_SENSOR: "sensor",
-            }
-            category = category_map.get(device.type, "other")
-            
-            status = self._mijia_adapter.get_device_status(device.did, category)
-            if status.get("online", False):
-                device.mark_online()
-                device.data = status
-            else:
-                device.mark_failed()
+            statuses = self._mijia_adapter.get_devices_status(
+                {d.did: MIJIA_CATEGORIES.get(d.type, "other") for d in group}, freshness=freshness
+            )
         except Exception as e:
-            device.mark_failed()
             print(f"[设备管理] 轮询米家设备 {device.name} 失败: {e}")
+            statuses = {}
+        for d in group[1:]:
+            if d.did in statuses:
+                self._apply_mijia_status(d, statuses[d.did])
+        return self._apply_mijia_status(device, statuses.get(device.did))
+    
+    def _apply_mijia_status(self, device: Device, status: Optional[Dict[str, Any]]) -> bool:
+        """
+        将米家设备状态写入 Device，状态实际变化时发布事件
         
-        # 触发回调
-        if self._on_status_update:
-            try:
-                self._on_status_update(device)
-            except Exception as e:
-                print(f"[设备管理] 状态回调出错: {e}")
+        Args:
+            device: 设备实例
+            status: get_device_status() 格式的状态，None 表示本次读取失败
+            
+        Returns:
+            是否在线并读取成功
+        """
+        ok = bool(status and status.get("online", False))
+        if ok:
+            change = self._registry.mark_online(device, status)
+        elif status and status.get("code") == DEVICE_OFFLINE_CODE:
+            # 云端明确返回离线，不需要等待连续失败
+            change = self._registry.replace_state(device, online=False)
+        else:
+            change = self._registry.mark_failed(device)
+        
+        self._publish_change(device, change)
+        return ok
     
-    def poll_device_now(self, device_id: str) -> Optional[Device]:
+    def poll_device_now(self, device_id: str, freshness: Optional[str] = "device") -> Optional[Device]:
         """
         立即轮询指定设备 (同步)
         
+        用于控制操作后或打开详情时，默认直接从设备读取最新状态
+        
         Args:
             device_id: 设备 ID
+            freshness: 米家设备的读取策略
             
         Returns:
             更新后的设备实例
         """
         device = self.get_device(device_id)
         if device:
-            self._poll_device(device)
+            self._poll_device(device, freshness)
             return device
         return None
     
@@ -627,3 +862,13 @@ class DeviceManager:
             return self._mijia_adapter.set_device_prop(device.did, "on", power_on)
             
         return False
+
+
+def _call_now(drain: Callable[[], None]) -> None:
+    """在发布事件的线程中直接投递"""
+    drain()
+
+
+def _is_power_transition(event: PowerChanged) -> bool:
+    """可见设备的开关变化，首次读取到的状态不算变化 (避免启动时误报)"""
+    return event.device.visible and event.previous is not None
@@ -0,0 +1,173 @@
+"""
+AquaGuard 韩家家庭智能系统 - 设备注册表模块
+
+线程安全的设备集合：读取使用不可变快照，写入复制后整体替换，
+并维护按 did、物理设备 ID、类型和型号的二级索引
+"""
+
+import threading
+from dataclasses import dataclass, field
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from .device import Device, DeviceType, StateChange
+
+
+@dataclass(frozen=True)
+class RegistrySnapshot:
+    """
+    设备集合的不可变快照
+
+    快照创建后不再修改，读取线程可以不加锁地遍历和查找。
+    设备增删或 did/类型/型号变化时由注册表生成新的快照。
+
+    Attributes:
+        devices: {device_id: Device}，按添加顺序
+        by_did: {did: Device}
+        by_real_did: {物理设备 ID: 该设备的所有通道}
+        by_type: {DeviceType: 设备列表}
+        by_model: {型号: 设备列表}
+    """
+    devices: Dict[str, Device] = field(default_factory=dict)
+    by_did: Dict[str, Device] = field(default_factory=dict)
+    by_real_did: Dict[str, Tuple[Device, ...]] = field(default_factory=dict)
+    by_type: Dict[DeviceType, Tuple[Device, ...]] = field(default_factory=dict)
+    by_model: Dict[str, Tuple[Device, ...]] = field(default_factory=dict)
+
+    @classmethod
+    def build(cls, devices: Iterable[Device]) -> "RegistrySnapshot":
+        by_id: Dict[str, Device] = {}
+        by_did: Dict[str, Device] = {}
+        by_real_did: Dict[str, List[Device]] = {}
+        by_type: Dict[DeviceType, List[Device]] = {}
+        by_model: Dict[str, List[Device]] = {}
+        for device in devices:
+            by_id[device.id] = device
+            if device.did:
+                by_did[device.did] = device
+                by_real_did.setdefault(device.real_did, []).append(device)
+            by_type.setdefault(device.type, []).append(device)
+            if device.model:
+                by_model.setdefault(device.model, []).append(device)
+        return cls(
+            devices=by_id,
+            by_did=by_did,
+            by_real_did={k: tuple(v) for k, v in by_real_did.items()},
+            by_type={k: tuple(v) for k, v in by_type.items()},
+            by_model={k: tuple(v) for k, v in by_model.items()},
+        )
+
+
+class DeviceRegistry:
+    """
+    线程安全的设备注册表
+
+    - 读取: snapshot() 返回当前不可变快照，查找方法都基于快照，不需要加锁
+    - 增删和索引字段变化: 加锁后生成新快照并整体替换 (copy-on-write)
+    - 设备状态: replace_state() 在锁内整体替换 data 字典和在线状态，
+      读取方拿到的总是完整的旧状态或新状态，不会看到修改了一半的字典
+    - version: 任何增删或状态实际变化都会递增，消费方可以据此跳过没有变化的刷新
+    """
+
+    def __init__(self, devices: Iterable[Device] = ()):
+        self._lock = threading.RLock()
+        self._snapshot = RegistrySnapshot.build(devices)
+        self._version = 0
+
+    # ============ 读取 ============
+
+    @property
+    def version(self) -> int:
+        return self._version
+
+    def snapshot(self) -> RegistrySnapshot:
+        return self._snapshot
+
+    def __len__(self) -> int:
+        return len(self._snapshot.devices)
+
+    def __contains__(self, device_id: str) -> bool:
+        return device_id in self._snapshot.devices
+
+    def get(self, device_id: str) -> Optional[Device]:
+        return self._snapshot.devices.get(device_id)
+
+    def all(self) -> List[Device]:
+        return list(self._snapshot.devices.values())
+
+    def get_by_did(self, did: str) -> Optional[Device]:
+        return self._snapshot.by_did.get(did)
+
+    def get_by_real_did(self, real_did: str) -> List[Device]:
+        """物理设备对应的所有设备 (多键开关的各通道)"""
+        return list(self._snapshot.by_real_did.get(real_did, ()))
+
+    def get_by_type(self, device_type: DeviceType) -> List[Device]:
+        return list(self._snapshot.by_type.get(device_type, ()))
+
+    def get_by_model(self, model: str) -> List[Device]:
+        return list(self._snapshot.by_model.get(model, ()))
+
+    # ============ 写入 ============
+
+    def add(self, device: Device) -> None:
+        with self._lock:
+            devices = dict(self._snapshot.devices)
+            devices[device.id] = device
+            self._replace(devices.values())
+
+    def remove(self, device_id: str) -> Optional[Device]:
+        with self._lock:
+            devices = dict(self._snapshot.devices)
+            device = devices.pop(device_id, None)
+            if device is not None:
+                self._replace(devices.values())
+            return device
+
+    def update(self, device: Device, **fields: Any) -> None:
+        """修改设备信息 (名称、did、类型等)，影响索引的字段变化时重建快照"""
+        with self._lock:
+            for name, value in fields.items():
+                setattr(device, name, value)
+            self._replace(self._snapshot.devices.values())
+
+    def replace_state(
+        self,
+        device: Device,
+        data: Optional[Dict[str, Any]] = None,
+        online: Optional[bool] = None,
+    ) -> StateChange:
+        """
+        整体替换设备状态
+
+        Args:
+            device: 设备实例
+            data: 新的状态数据，复制后替换原字典 (不原地修改)
+            online: 在线状态
+
+        Returns:
+            本次更新的差异，没有变化时为假值
+        """
+        with self._lock:
+            return self._count(device.apply_state(data=data, online=online))
+
+    def mark_online(self, device: Device, data: Optional[Dict[str, Any]] = None) -> StateChange:
+        """一次读取成功：标记在线并替换状态数据"""
+        with self._lock:
+            change = device.mark_online()
+            if data is not None:
+                change = change.merge(device.apply_state(data=data))
+            return self._count(change)
+
+    def mark_failed(self, device: Device) -> StateChange:
+        """一次读取失败，连续失败后标记离线"""
+        with self._lock:
+            return self._count(device.mark_failed())
+
+    def _count(self, change: StateChange) -> StateChange:
+        if change:
+            self._version += 1
+        return change
+
+    def _replace(self, devices: Iterable[Device]) -> None:
+        self._snapshot = RegistrySnapshot.build(devices)
+        self._version += 1
@@ -0,0 +1,289 @@
+"""
+AquaGuard 韩家家庭智能系统 - 设备事件总线模块
+
+进程内发布/订阅：轮询线程发布类型化的设备事件，通知、状态记录、告警和 UI
+各自订阅，按事件类型和条件过滤，在独立的工作线程或批量投递到 Tk 主线程处理，
+订阅者处理慢不会拖慢轮询线程
+"""
+
+import itertools
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, Hashable, Iterable, List, Optional, Tuple, Type
+
+from .device import Device, StateChange
+
+
+# 每个订阅默认最多积压的事件数
+DEFAULT_MAX_PENDING = 256
+
+
+# ============ 事件 ============
+
+@dataclass(frozen=True, eq=False)
+class DeviceEvent:
+    """
+    设备事件基类
+
+    Attributes:
+        device: 发生事件的设备
+    """
+    device: Device
+
+    @property
+    def device_id(self) -> str:
+        return self.device.id
+
+    @property
+    def key(self) -> Hashable:
+        """合并键：同一设备的同类事件，新事件取代还未投递的旧事件"""
+        return type(self), self.device.id
+
+    def merge(self, older: "DeviceEvent") -> "DeviceEvent":
+        """取代还未投递的旧事件，默认只保留新事件"""
+        return self
+
+
+@dataclass(frozen=True, eq=False)
+class DeviceStateChanged(DeviceEvent):
+    """设备状态变化 (任何 data 键或在线状态)"""
+    change: StateChange
+
+    def merge(self, older: "DeviceStateChanged") -> "DeviceStateChanged":
+        # 合并变化的键，订阅方不会漏掉被取代的事件中变化的字段
+        return DeviceStateChanged(self.device, older.change.merge(self.change))
+
+
+@dataclass(frozen=True, eq=False)
+class OnlineChanged(DeviceEvent):
+    """设备上线或离线"""
+    online: bool
+
+
+@dataclass(frozen=True, eq=False)
+class PowerChanged(DeviceEvent):
+    """
+    设备开关状态变化
+
+    Attributes:
+        is_on: 当前是否开启
+        previous: 上一次的开关状态，首次读取时为 None
+    """
+    is_on: bool
+    previous: Optional[bool] = None
+
+    def merge(self, older: "PowerChanged") -> "PowerChanged":
+        # 保留最早的 previous，开了又关的事件合并后 is_on == previous
+        return PowerChanged(self.device, self.is_on, older.previous)
+
+
+@dataclass(frozen=True, eq=False)
+class SensorReading(DeviceEvent):
+    """
+    传感器读数变化
+
+    Attributes:
+        readings: 变化的读数 {Device.data 键: 值}
+    """
+    readings: Dict[str, Any] = field(default_factory=dict)
+
+    def merge(self, older: "SensorReading") -> "SensorReading":
+        return SensorReading(self.device, {**older.readings, **self.readings})
+
+
+# ============ 订阅 ============
+
+class Subscription:
+    """
+    一个订阅者
+
+    - 事件先进入有界的待投递队列，队列满时丢弃最旧的事件
+    - coalesce 为 True 时，同一设备的同类事件在队列中只保留一个 (新事件取代旧事件)
+    - dispatch 为 None 时在独立的工作线程中投递；否则每批事件调用一次
+      dispatch(drain)，由调用方决定在哪里执行 drain，例如 Tk 的 after(0, drain)
+    """
+
+    def __init__(
+        self,
+        handler: Callable[[DeviceEvent], None],
+        topics: Tuple[Type[DeviceEvent], ...] = (),
+        where: Optional[Callable[[DeviceEvent], bool]] = None,
+        dispatch: Optional[Callable[[Callable[[], None]], Any]] = None,
+        max_pending: int = DEFAULT_MAX_PENDING,
+        coalesce: bool = True,
+        name: str = "",
+    ):
+        self.handler = handler
+        self.topics = topics
+        self.where = where
+        self.name = name or getattr(handler, "__name__", "subscriber")
+        self._dispatch = dispatch
+        self._max_pending = max_pending
+        self._coalesce = coalesce
+        self._pending: "OrderedDict[Hashable, DeviceEvent]" = OrderedDict()
+        self._seq = itertools.count()
+        self._cond = threading.Condition()
+        self._scheduled = False
+        self._closed = False
+        self._thread: Optional[threading.Thread] = None
+        self.delivered = 0
+        self.coalesced = 0
+        self.dropped = 0
+
+    def matches(self, event: DeviceEvent) -> bool:
+        if self.topics and not isinstance(event, self.topics):
+            return False
+        return self.where is None or self.where(event)
+
+    def offer(self, event: DeviceEvent) -> None:
+        """加入待投递队列"""
+        with self._cond:
+            if self._closed:
+                return
+            key = event.key if self._coalesce else next(self._seq)
+            older = self._pending.get(key)
+            if older is not None:
+                self._pending[key] = event.merge(older)
+                self.coalesced += 1
+            else:
+                if len(self._pending) >= self._max_pending:
+                    self._pending.popitem(last=False)
+                    self.dropped += 1
+                self._pending[key] = event
+            if self._dispatch is None:
+                self._ensure_worker()
+                self._cond.notify()
+                return
+            if self._scheduled:
+                return
+            self._scheduled = True
+        try:
+            self._dispatch(self._drain)
+        except Exception as e:
+            with self._cond:
+                self._scheduled = False
+            print(f"[事件总线] 订阅 {self.name} 投递失败: {e}")
+
+    def close(self, timeout: float = 1.0) -> None:
+        """停止投递，丢弃未投递的事件"""
+        with self._cond:
+            self._closed = True
+            self._pending.clear()
+            self._cond.notify()
+        if self._thread and self._thread is not threading.current_thread():
+            self._thread.join(timeout=timeout)
+
+    def stats(self) -> Dict[str, int]:
+        with self._cond:
+            pending = len(self._pending)
+        return {
+            "pending": pending,
+            "delivered": self.delivered,
+            "coalesced": self.coalesced,
+            "dropped": self.dropped,
+        }
+
+    # ============ 内部实现 ============
+
+    def _take(self) -> List[DeviceEvent]:
+        events = list(self._pending.values())
+        self._pending.clear()
+        return events
+
+    def _drain(self) -> None:
+        with self._cond:
+            self._scheduled = False
+            events = self._take()
+        self._deliver(events)
+
+    def _deliver(self, events: Iterable[DeviceEvent]) -> None:
+        for event in events:
+            try:
+                self.handler(event)
+            except Exception as e:
+                print(f"[事件总线] 订阅 {self.name} 处理 {type(event).__name__} 出错: {e}")
+            self.delivered += 1
+
+    def _ensure_worker(self) -> None:
+        if self._thread is None:
+            self._thread = threading.Thread(
+                target=self._worker_loop, name=f"events-{self.name}", daemon=True
+            )
+            self._thread.start()
+
+    def _worker_loop(self) -> None:
+        while True:
+            with self._cond:
+                while not self._pending and not self._closed:
+                    self._cond.wait()
+                if self._closed:
+                    return
+                events = self._take()
+            self._deliver(events)
+
+
+class EventBus:
+    """
+    设备事件总线
+
+    publish() 只做过滤和入队，不执行订阅者的处理函数，可以在轮询线程中直接调用
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._subscriptions: Tuple[Subscription, ...] = ()
+
+    def subscribe(
+        self,
+        handler: Callable[[DeviceEvent], None],
+        topics: Iterable[Type[DeviceEvent]] = (),
+        where: Optional[Callable[[DeviceEvent], bool]] = None,
+        dispatch: Optional[Callable[[Callable[[], None]], Any]] = None,
+        max_pending: int = DEFAULT_MAX_PENDING,
+        coalesce: bool = True,
+        name: str = "",
+    ) -> Subscription:
+        """
+        订阅设备事件
+
+        Args:
+            handler: 处理函数，参数为事件
+            topics: 订阅的事件类型，为空时订阅全部
+            where: 额外的过滤条件，例如只处理可见设备
+            dispatch: 批量投递方式，None 表示在独立的工作线程中处理
+            max_pending: 最多积压的事件数
+            coalesce: 是否合并同一设备的同类事件 (需要每次变化都处理时设为 False)
+            name: 订阅名称 (用于日志)
+
+        Returns:
+            订阅对象，可传给 unsubscribe()
+        """
+        subscription = Subscription(handler, tuple(topics), where, dispatch, max_pending, coalesce, name)
+        with self._lock:
+            self._subscriptions += (subscription,)
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription) -> None:
+        with self._lock:
+            self._subscriptions = tuple(s for s in self._subscriptions if s is not subscription)
+        subscription.close()
+
+    def publish(self, *events: DeviceEvent) -> None:
+        """发布事件"""
+        subscriptions = self._subscriptions
+        for event in events:
+            for subscription in subscriptions:
+                if subscription.matches(event):
+                    subscription.offer(event)
+
+    def close(self) -> None:
+        """取消所有订阅"""
+        with self._lock:
+            subscriptions, self._subscriptions = self._subscriptions, ()
+        for subscription in subscriptions:
+            subscription.close()
+
+    def stats(self) -> Dict[str, Dict[str, int]]:
+        """各订阅的投递统计"""
+        return {s.name: s.stats() for s in self._subscriptions}
@@ -4,14 +4,18 @@ AquaGuard 韩家家庭智能系统 - 米家 API 适配层
 封装 mijiaAPI 库，提供与设备管理器兼容的接口
 """
 
+import os
 import threading
+import time
 import io
 from typing import Optional, List, Dict, Any, Callable
 from pathlib import Path
 from dataclasses import dataclass
 
+from .status_profile import StatusPlan, StatusPlanCache, StatusRead
+
 try:
-    from mijiaAPI import mijiaAPI, mijiaDevice
+    from mijiaAPI import SpecRevalidator, get_device_info, mijiaAPI, mijiaDevice
     from mijiaAPI.errors import (
         LoginError,
         DeviceNotFoundError,
@@ -19,6 +23,7 @@ try:
         DeviceSetError,
         APIError,
     )
+    from mijiaAPI.gateway import GATEWAY_ENV, RemoteAPI
     MIJIA_AVAILABLE = True
 except ImportError:
     MIJIA_AVAILABLE = False
@@ -48,6 +53,19 @@ class MijiaDeviceInfo:
     category: str = "other"     # 设备类别 (light, switch, sensor, other)
 
 
+# 轮询读取状态时允许的最大缓存时间 (秒)
+STATUS_MAX_AGE = 5
+
+# 批量读取状态时每次请求包含的最大属性数量
+STATUS_BATCH_SIZE = 100
+
+# 设备离线时读取属性返回的错误码
+DEVICE_OFFLINE_CODE = -704042011
+
+# 家庭列表缓存时间 (秒)，刷新在线状态时只重新获取各家庭的设备列表
+HOME_LIST_TTL = 600
+
+
 class MijiaAdapter:
     """
     米家 API 适配器
@@ -55,19 +73,30 @@ class MijiaAdapter:
     负责管理米家账户登录状态和设备操作
     """
     
-    def __init__(self, auth_path: Optional[str] = None):
+    def __init__(self, auth_path: Optional[str] = None, gateway: Optional[str] = None,
+                 revalidate_specs: bool = False):
         """
         初始化适配器
         
         Args:
             auth_path: 认证文件路径，默认使用 .mijia-api-data/auth.json
+            gateway: 常驻网关地址 (mijiaAPI serve)，默认读取环境变量 MIJIA_GATEWAY；
+                     网关可用时通过网关访问米家，共享其登录状态和缓存
+            revalidate_specs: 是否在后台定期检查设备规格更新，默认关闭
         """
         self._auth_path = auth_path or ".mijia-api-data/auth.json"
+        self._gateway = gateway or (os.getenv(GATEWAY_ENV) if MIJIA_AVAILABLE else None)
+        self._revalidate_specs = revalidate_specs
         self._api: Optional['mijiaAPI'] = None
         self._devices: Dict[str, 'mijiaDevice'] = {}  # did -> mijiaDevice
         self._device_info_cache: Dict[str, MijiaDeviceInfo] = {}
+        self._home_ids: List[str] = []
+        self._status_plans = StatusPlanCache()  # 按型号编译的状态读取计划
+        self._seen_spec_updates: Optional[List[str]] = None
+        self._home_ids_time = 0.0
         self._login_callback: Optional[Callable[[bool, str], None]] = None
         self._lock = threading.Lock()
+        self._spec_revalidator: Optional['SpecRevalidator'] = None
         
         # 检查是否可用
         if not MIJIA_AVAILABLE:
@@ -76,6 +105,16 @@ class MijiaAdapter:
             # 尝试从已保存的认证文件恢复登录状态
             self._try_restore_auth()
     
+    def _new_api(self) -> 'mijiaAPI':
+        """创建 mijiaAPI 实例并启用库内置的属性缓存"""
+        api = mijiaAPI(self._auth_path)
+        api.enable_prop_cache()
+        if self._revalidate_specs and self._spec_revalidator is None:
+            # 后台定期检查设备规格更新，只重新获取规格变化的型号
+            self._spec_revalidator = SpecRevalidator(api.auth_data_path.parent)
+            self._spec_revalidator.start()
+        return api
+    
     @property
     def is_available(self) -> bool:
         """检查 mijiaAPI 是否可用"""
@@ -85,13 +124,20 @@ class MijiaAdapter:
         """
         尝试从已保存的认证文件恢复登录状态
         """
+        if self._gateway:
+            api = RemoteAPI(self._gateway)
+            if api.available:
+                self._api = api
+                print(f"[MijiaAdapter] 已连接米家网关 {self._gateway}")
+                return
+            print(f"[MijiaAdapter] 米家网关 {self._gateway} 不可用，使用本地登录状态")
         try:
             from pathlib import Path
             auth_file = Path(self._auth_path)
             
             if auth_file.exists():
                 # 初始化 API 并检查是否有效
-                self._api = mijiaAPI(self._auth_path)
+                self._api = self._new_api()
                 if self._api.available:
                     print(f"[MijiaAdapter] 已恢复米家登录状态")
                 else:
@@ -108,6 +154,9 @@ class MijiaAdapter:
         """检查是否已登录（使用缓存，不触发网络请求）"""
         if not self._api:
             return False
+        if isinstance(self._api, RemoteAPI):
+            # 登录状态由网关维护
+            return True
         # 只检查 auth_data 是否存在关键字段，不调用 available（会触发网络请求）
         try:
             auth_data = self._api.auth_data
@@ -141,7 +190,7 @@ class MijiaAdapter:
             import time as time_module
             
             # 初始化 API
-            self._api = mijiaAPI(self._auth_path)
+            self._api = self._new_api()
             
             # 如果已经登录，直接返回 None
             if self._api.available:
@@ -289,7 +338,7 @@ class MijiaAdapter:
             return False
         
         try:
-            self._api = mijiaAPI(self._auth_path)
+            self._api = self._new_api()
             self._api.login()
             return self._api.available
         except Exception as e:
@@ -349,6 +398,35 @@ class MijiaAdapter:
             print(f"[MijiaAdapter] 获取设备列表失败: {e}")
             return []
     
+    def get_online_states(self) -> Optional[Dict[str, bool]]:
+        """
+        获取所有设备的在线状态
+        
+        只用于在线状态刷新：家庭列表缓存 HOME_LIST_TTL 秒，不重复获取，
+        也不构建 MijiaDeviceInfo。
+        
+        Returns:
+            {did: 是否在线}，获取失败返回 None
+        """
+        if not self.is_logged_in:
+            return None
+        
+        try:
+            now = time.monotonic()
+            if not self._home_ids or now - self._home_ids_time > HOME_LIST_TTL:
+                self._home_ids = [home["id"] for home in self._api.get_homes_list()]
+                self._home_ids_time = now
+            states = {}
+            for home_id in self._home_ids:
+                for d in self._api.get_devices_list(home_id):
+                    states[d.get("did", "")] = d.get("isOnline", True)
+            return states
+        except Exception as e:
+            # 家庭可能已变化，下次重新获取家庭列表
+            self._home_ids = []
+            print(f"[MijiaAdapter] 获取在线状态失败: {e}")
+            return None
+    
     def _infer_device_category(self, model: str, name: str) -> tuple:
         """
         根据型号和名称推断设备类别
@@ -414,7 +492,11 @@ class MijiaAdapter:
                 real_did = did.split(".")[0]
             
             try:
-                device = mijiaDevice(self._api, did=real_did)
+                # 多键开关的各通道共用父设备的实例
+                device = self._devices.get(real_did)
+                if device is None:
+                    device = mijiaDevice(self._api, did=real_did)
+                    self._devices[real_did] = device
                 self._devices[did] = device
                 return device
             except Exception as e:
@@ -438,24 +520,27 @@ class MijiaAdapter:
         except:
             return did, 2
             
-    def get_device_prop(self, did: str, prop_name: str) -> Any:
+    def get_device_prop(self, did: str, prop_name: str, freshness: Optional[str] = None) -> Any:
         """
         获取设备属性
+        
+        Args:
+            freshness: 读取策略 ("cloud" 读取云端缓存 / "device" 实时读取设备)
         """
         if self._is_virtual_did(did):
-            return self._get_virtual_prop(did, prop_name)
+            return self._get_virtual_prop(did, prop_name, freshness)
             
         device = self.get_mijia_device(did)
         if not device:
             return None
         
         try:
-            return device.get(prop_name)
+            return device.get(prop_name, freshness=freshness)
         except Exception as e:
             print(f"[MijiaAdapter] 获取属性失败 ({did}.{prop_name}): {e}")
             return None
             
-    def _get_virtual_prop(self, did: str, prop_name: str) -> Any:
+    def _get_virtual_prop(self, did: str, prop_name: str, freshness: Optional[str] = None) -> Any:
         """获取虚拟设备属性"""
         # 目前主要支持 switch/light 的 on 属性
         if prop_name not in ["on", "power", "switch-on"]:
@@ -465,13 +550,18 @@ class MijiaAdapter:
         # 假设开关属性 piid 总是 1
         piid = 1
         
-        try:
-            result = self._api.get_devices_prop({
+        def load():
+            return self._api.get_devices_prop({
                 "did": real_did,
                 "siid": siid,
                 "piid": piid
-            })
-            return result.get("value")
+            }, freshness=freshness).get("value")
+        
+        try:
+            if self._api.prop_cache is not None:
+                max_age = 0 if freshness == "device" else STATUS_MAX_AGE
+                return self._api.prop_cache.get((real_did, siid, piid), load, max_age=max_age)
+            return load()
         except Exception as e:
             print(f"[MijiaAdapter] 获取虚拟属性失败 ({did}): {e}")
             return None
@@ -544,6 +634,12 @@ class MijiaAdapter:
             print(f"[MijiaAdapter] 设置虚拟属性失败 ({did}): {e}")
             return False
     
+    def get_freshness_stats(self) -> Dict[str, dict]:
+        """获取各读取策略的使用次数及结果陈旧程度"""
+        if not self._api:
+            return {}
+        return self._api.freshness_stats.snapshot()
+    
     def run_device_action(self, did: str, action_name: str, params: Any = None) -> bool:
         """
         执行设备动作
@@ -560,142 +656,151 @@ class MijiaAdapter:
             print(f"[MijiaAdapter] 执行动作失败 ({did}.{action_name}): {e}")
             return False
     
-    def get_device_status(self, did: str, category: str = "other") -> Dict[str, Any]:
+    def get_device_status(self, did: str, category: str = "other", freshness: Optional[str] = None) -> Dict[str, Any]:
         """
         获取设备状态 (统一接口)
+        
+        Args:
+            did: 设备 ID
+            category: 设备类别
+            freshness: 读取策略，后台轮询使用默认的 "cloud"，打开详情页或控制前可传入 "device"
+        """
+        return self.get_devices_status({did: category}, freshness).get(did, {"online": False})
+    
+    def get_devices_status(self, targets: Dict[str, str], freshness: Optional[str] = None) -> Dict[str, Dict[str, Any]]:
         """
-        import time
+        批量获取多个设备的状态
         
-        # 状态缓存 (降低 API 调用频率)
-        cache_key = f"status_{did}"
-        if hasattr(self, '_status_cache') and cache_key in self._status_cache:
-            cached_time, cached_status = self._status_cache[cache_key]
-            # 缓存有效期 5 秒
-            if time.time() - cached_time < 5:
-                return cached_status
+        先汇总所有设备需要读取的 (did, siid, piid)，包括虚拟开关 (.sN)，
+        再用尽量少的 get_devices_prop 请求读取，最后按设备拆分为状态字典。
         
-        # 尝试从缓存获取类别信息
-        info = self._device_info_cache.get(did)
-        if info:
-            category = info.category
+        Args:
+            targets: {did: 设备类别}
+            freshness: 读取策略 (None 使用云端缓存, "device" 实时读取)
             
-        if self._is_virtual_did(did):
-            result = self._get_virtual_status(did)
-            self._cache_status(cache_key, result)
-            return result
+        Returns:
+            {did: 状态字典}，与 get_device_status() 的结果格式相同；
+            云端返回离线的设备为 {"online": False, "code": DEVICE_OFFLINE_CODE}，请求失败的设备不在结果中
+        """
+        if not self.is_logged_in:
+            return {did: {"online": False} for did in targets}
+        
+        results: Dict[str, Dict[str, Any]] = {}
+        plans: Dict[str, tuple] = {}
+        for did, category in targets.items():
+            # 尝试从缓存获取类别信息
+            info = self._device_info_cache.get(did)
+            if info:
+                category = info.category
+            target = self._status_plan(did, category)
+            if target is None:
+                results[did] = {"online": False}
+            else:
+                plans[did] = target
+        
+        values = self._read_props(
+            [(real_did, read.siid, read.piid) for real_did, plan in plans.values() for read in plan.reads],
+            freshness,
+        )
+        for did, (real_did, plan) in plans.items():
+            keys = [(real_did, read.siid, read.piid) for read in plan.reads]
+            if any(key not in values for key in keys):
+                # 所在的请求失败，本轮没有结果
+                continue
+            if any(values[key][0] == DEVICE_OFFLINE_CODE for key in keys):
+                # 云端明确返回设备离线
+                results[did] = {"online": False, "code": DEVICE_OFFLINE_CODE}
+                continue
+            read_values = {}
+            for key in keys:
+                code, value = values[key]
+                if code == 0:
+                    read_values[key[1:]] = value
+            status = plan.decode(read_values)
+            if self._is_virtual_did(did) and "power" not in status:
+                status = {"online": False}
+            results[did] = status
+        return results
+    
+    def _status_plan(self, did: str, category: str) -> Optional[tuple]:
+        """
+        设备的状态读取计划
         
-        device = self.get_mijia_device(did)
-        if not device:
-            return {"online": False}
+        计划按型号从规格编译并缓存，同型号的设备不会重复推断属性。
         
-        result = {"online": True}
+        Returns:
+            (real_did, StatusPlan)，无法获取型号或规格时返回 None
+        """
+        if self._is_virtual_did(did):
+            real_did, siid = self._parse_virtual_did(did)
+            # 假设开关属性 piid 总是 1
+            return real_did, StatusPlan(model="", category="switch", reads=(StatusRead("power", siid, 1),))
         
+        model = self._device_model(did)
+        if not model:
+            return None
+        self._sync_spec_updates()
         try:
-            # 智能推断开关属性
-            power_prop = "on"
-            if "on" not in device.prop_list:
-                # 尝试查找其他可能的开关属性
-                candidates = ["power", "switch", "switch-on", "status", "state"]
-                for c in candidates:
-                    if c in device.prop_list:
-                        power_prop = c
-                        break
-            
-            # 无论是否找到开关属性，设备都在线
-            # 不同的设备类别获取不同的额外属性
-            
-            # 尝试获取电源状态 (如果存在对应的属性)
-            if power_prop in device.prop_list:
-                try:
-                    on_state = device.get(power_prop)
-                    # 某些设备返回 None，视为离线或获取失败
-                    if on_state is None:
-                         # 这里的策略可以调整，如果主要属性都获取不到，可能确实离线
-                         pass 
-                    else:
-                        result["power"] = "on" if on_state else "off"
-                except Exception as e:
-                    pass
-            
-            if category == "light":
-                try:
-                    result["brightness"] = device.get("brightness")
-                except:
-                    pass
-                try:
-                    result["color_temperature"] = device.get("color-temperature")
-                except:
-                    pass
-                    
-            elif category == "fan":
-                try:
-                    result["fan_level"] = device.get("fan-level")
-                except:
-                    pass
-
-            elif category == "purifier":
-                # 净化器特有属性
-                try:
-                    # 尝试获取常用属性，支持短横线和下划线命名
-                    result["temperature"] = device.get("temperature")
-                    
-                    # 湿度
-                    hum = device.get("relative-humidity")
-                    if hum is None:
-                        hum = device.get("relative_humidity")
-                    result["humidity"] = hum
-                    
-                    # PM2.5
-                    pm25 = device.get("pm2.5-density")
-                    if pm25 is None:
-                        pm25 = device.get("pm2.5_density")
-                    result["pm25"] = pm25
-                    
-                    # 空气质量
-                    val = device.get("air-quality")
-                    if val is None:
-                        val = device.get("air_quality")
-                    result["air_quality"] = val
-                    
-                    # 模式
-                    result["mode"] = device.get("mode")
-                    
-                    # 滤芯剩余
-                    life = device.get("filter-life-level")
-                    if life is None:
-                        life = device.get("filter_life_level")
-                    result["filter_life"] = life
-                    
-                except Exception as e:
-                    print(f"[MijiaAdapter] 获取净化器属性失败: {e}")
-                    pass
-            
-            # 红外设备特殊处理
-            if "ir" in device.model:
-                # 红外设备通常无法获取真实状态，默认认为在线
-                pass
-                    
+            return did, self._status_plans.get(model, category, self._load_spec)
         except Exception as e:
-            print(f"[MijiaAdapter] 获取设备状态失败 ({did}): {e}")
-            result["online"] = False
-        
-        self._cache_status(cache_key, result)
-        return result
+            print(f"[MijiaAdapter] 编译状态读取计划失败 ({model}): {e}")
+            return None
     
-    def _cache_status(self, key: str, status: Dict):
-        """缓存设备状态"""
-        import time
-        if not hasattr(self, '_status_cache'):
-            self._status_cache = {}
-        self._status_cache[key] = (time.time(), status)
-
-    def _get_virtual_status(self, did: str) -> Dict[str, Any]:
-        """获取虚拟设备状态"""
-        # 获取 'on' 属性作为状态
-        val = self._get_virtual_prop(did, "on")
-        if val is not None:
-            return {
-                "online": True,
-                "power": "on" if val else "off"
-            }
-        return {"online": False}
+    def _device_model(self, did: str) -> Optional[str]:
+        """设备型号，优先使用本地已有的信息，都没有时才创建 mijiaDevice"""
+        info = self._device_info_cache.get(did)
+        if info:
+            return info.model
+        device = self._devices.get(did)
+        if device:
+            return device.model
+        index = getattr(self._api, "resolution_index", None)
+        entry = index.device(did) if index is not None else None
+        if entry and entry.get("model"):
+            return entry["model"]
+        device = self.get_mijia_device(did)
+        return device.model if device else None
+    
+    def _load_spec(self, model: str) -> dict:
+        return get_device_info(model, cache_path=self._api.auth_data_path.parent)
+    
+    def _sync_spec_updates(self) -> None:
+        """规格重新验证后丢弃已更新型号的读取计划"""
+        updated = self._spec_revalidator.last_updated if self._spec_revalidator else None
+        if updated and updated is not self._seen_spec_updates:
+            self._seen_spec_updates = updated
+            self._status_plans.invalidate(updated)
+    
+    def _read_props(self, keys: List[tuple], freshness: Optional[str] = None) -> Dict[tuple, Any]:
+        """
+        批量读取属性值，优先使用足够新的缓存
+        
+        Returns:
+            {(did, siid, piid): (code, 值)}，所在请求出错的属性不在结果中
+        """
+        values: Dict[tuple, tuple] = {}
+        cache = self._api.prop_cache
+        missing = []
+        for key in dict.fromkeys(keys):
+            entry = None
+            if cache is not None and freshness != "device":
+                entry = cache.lookup(key, max_age=STATUS_MAX_AGE)
+            if entry is not None:
+                values[key] = (0, entry.value)
+            else:
+                missing.append(key)
+        
+        for start in range(0, len(missing), STATUS_BATCH_SIZE):
+            chunk = missing[start:start + STATUS_BATCH_SIZE]
+            try:
+                ret = self._api.get_devices_prop(
+                    [{"did": did, "siid": siid, "piid": piid} for did, siid, piid in chunk],
+                    freshness=freshness,
+                )
+            except Exception as e:
+                print(f"[MijiaAdapter] 批量获取属性失败 ({len(chunk)} 个): {e}")
+                continue
+            for item in ret:
+                key = (str(item.get("did")), int(item.get("siid")), int(item.get("piid")))
+                values[key] = (item.get("code", -1), item.get("value"))
+        return values
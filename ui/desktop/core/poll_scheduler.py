@@ -0,0 +1,236 @@
+"""
+AquaGuard 韩家家庭智能系统 - 轮询调度模块
+
+按截止时间调度各设备的轮询任务，使用常驻线程池执行
+"""
+
+import heapq
+import itertools
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from typing import Callable, Dict, List, Optional
+
+
+@dataclass
+class PollJob:
+    """
+    轮询任务
+
+    Attributes:
+        key: 任务标识 (通常为设备 ID)
+        interval: 轮询间隔 (秒)
+        due: 下一次截止时间 (time.monotonic)
+        fails: 连续失败次数，用于离线退避
+        running: 是否正在执行
+    """
+    key: str
+    interval: float
+    due: float = 0.0
+    fails: int = 0
+    running: bool = False
+    generation: int = 0
+    runs: int = field(default=0, repr=False)
+    overruns: int = field(default=0, repr=False)
+
+
+class PollScheduler:
+    """
+    截止时间轮询调度器
+
+    - 常驻线程池 + 按下一次截止时间排序的优先队列
+    - 每个任务有独立的轮询间隔，新任务的首次执行在一个间隔内错开
+    - 截止时间按间隔递推，不受执行耗时影响；执行超过下一个截止时间时记为超时 (overrun)
+      下一次在完成后再等待一个间隔 (失败时为退避间隔)，不连续补发
+    - 任务执行失败 (离线) 时按 2 的幂退避，最长 max_backoff 秒，成功后恢复原间隔
+    - 正在执行的任务不会被重复派发，一个慢设备不会拖慢其他设备
+
+    任务函数 run(key) 的返回值: True 成功, False 失败 (触发退避), None 跳过本次 (不计失败)
+    """
+
+    def __init__(self, run: Callable[[str], Optional[bool]], max_workers: int = 8,
+                 max_backoff: float = 60.0):
+        """
+        初始化调度器
+
+        Args:
+            run: 任务函数，参数为任务标识
+            max_workers: 常驻线程池大小
+            max_backoff: 离线退避的最长间隔 (秒)
+        """
+        self._run = run
+        self._max_workers = max_workers
+        self._max_backoff = max_backoff
+        self._jobs: Dict[str, PollJob] = {}
+        self._heap: List[tuple] = []
+        self._seq = itertools.count()
+        self._cond = threading.Condition()
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._thread: Optional[threading.Thread] = None
+        self._running = False
+
+    # ============ 任务管理 ============
+
+    def add(self, key: str, interval: float, delay: Optional[float] = None) -> None:
+        """
+        添加或更新任务
+
+        Args:
+            key: 任务标识
+            interval: 轮询间隔 (秒)
+            delay: 首次执行延迟 (秒)，默认由 stagger() 统一错开
+        """
+        with self._cond:
+            job = self._jobs.get(key)
+            if job is None:
+                job = PollJob(key=key, interval=interval)
+                self._jobs[key] = job
+                self._push(job, time.monotonic() + (delay or 0.0))
+            else:
+                job.interval = interval
+            self._cond.notify()
+
+    def remove(self, key: str) -> None:
+        """移除任务 (正在执行的任务完成后不再调度)"""
+        with self._cond:
+            job = self._jobs.pop(key, None)
+            if job is not None:
+                job.generation += 1
+
+    def keys(self) -> List[str]:
+        with self._cond:
+            return list(self._jobs)
+
+    def set_interval(self, key: str, interval: float) -> None:
+        """修改任务的轮询间隔，从下一次执行开始生效"""
+        with self._cond:
+            job = self._jobs.get(key)
+            if job is not None:
+                job.interval = interval
+
+    def stagger(self, keys: Optional[List[str]] = None) -> None:
+        """将任务的下一次执行时间在各自的间隔内均匀错开，避免同时发起请求"""
+        with self._cond:
+            jobs = [self._jobs[k] for k in (keys if keys is not None else list(self._jobs)) if k in self._jobs]
+            now = time.monotonic()
+            for i, job in enumerate(jobs):
+                if not job.running:
+                    self._push(job, now + job.interval * i / len(jobs))
+            self._cond.notify()
+
+    def trigger(self, key: str) -> None:
+        """尽快执行一次任务，之后从本次执行开始按间隔继续"""
+        with self._cond:
+            job = self._jobs.get(key)
+            if job is not None and not job.running:
+                self._push(job, time.monotonic())
+                self._cond.notify()
+
+    def stats(self) -> Dict[str, int]:
+        """运行统计: 任务数、正在执行数、累计执行次数、超时次数、退避中的任务数"""
+        with self._cond:
+            jobs = list(self._jobs.values())
+        return {
+            "jobs": len(jobs),
+            "running": sum(job.running for job in jobs),
+            "runs": sum(job.runs for job in jobs),
+            "overruns": sum(job.overruns for job in jobs),
+            "backoff": sum(job.fails > 0 for job in jobs),
+        }
+
+    # ============ 启动/停止 ============
+
+    def start(self) -> None:
+        """启动调度线程"""
+        with self._cond:
+            if self._running:
+                return
+            self._running = True
+            self._executor = ThreadPoolExecutor(max_workers=self._max_workers,
+                                                thread_name_prefix="poll")
+        self._thread = threading.Thread(target=self._dispatch_loop, daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout: float = 2.0) -> None:
+        """停止调度，等待调度线程退出，不等待正在执行的任务"""
+        with self._cond:
+            self._running = False
+            self._cond.notify()
+        if self._thread:
+            self._thread.join(timeout=timeout)
+            self._thread = None
+        if self._executor:
+            self._executor.shutdown(wait=False)
+            self._executor = None
+
+    # ============ 内部实现 ============
+
+    def _push(self, job: PollJob, due: float) -> None:
+        # 旧的堆条目通过 generation 失效，不需要从堆中删除
+        job.generation += 1
+        job.due = due
+        heapq.heappush(self._heap, (due, next(self._seq), job.key, job.generation))
+
+    def _pop_due(self, now: float) -> List[PollJob]:
+        due_jobs = []
+        while self._heap and self._heap[0][0] <= now:
+            _, _, key, generation = heapq.heappop(self._heap)
+            job = self._jobs.get(key)
+            if job is None or job.generation != generation or job.running:
+                continue
+            job.running = True
+            due_jobs.append(job)
+        return due_jobs
+
+    def _dispatch_loop(self) -> None:
+        while True:
+            with self._cond:
+                if not self._running:
+                    return
+                now = time.monotonic()
+                due_jobs = self._pop_due(now)
+                if not due_jobs:
+                    timeout = self._heap[0][0] - now if self._heap else None
+                    self._cond.wait(timeout)
+                    continue
+                executor = self._executor
+            for job in due_jobs:
+                try:
+                    executor.submit(self._execute, job)
+                except RuntimeError:
+                    # 线程池已关闭
+                    return
+
+    def _execute(self, job: PollJob) -> None:
+        result = None
+        try:
+            result = self._run(job.key)
+        except Exception as e:
+            print(f"[轮询调度] 任务 {job.key} 出错: {e}")
+            result = False
+        self._complete(job, result)
+
+    def _complete(self, job: PollJob, result: Optional[bool]) -> None:
+        with self._cond:
+            job.running = False
+            job.runs += 1
+            if self._jobs.get(job.key) is not job:
+                return
+            if result is False:
+                job.fails += 1
+                interval = min(self._max_backoff, job.interval * 2 ** job.fails)
+            else:
+                job.fails = 0
+                interval = job.interval
+            now = time.monotonic()
+            next_due = job.due + interval
+            if next_due <= now:
+                job.overruns += 1
+                if job.overruns == 1 or job.overruns % 10 == 0:
+                    print(f"[轮询调度] 任务 {job.key} 执行超时，已超出截止时间 {now - next_due:.1f}s "
+                          f"(累计 {job.overruns} 次)")
+                # 从完成时间起再等一个间隔，让慢设备和其他任务都有喘息时间
+                next_due = now + interval
+            self._push(job, next_due)
+            self._cond.notify()
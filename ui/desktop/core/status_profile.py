@@ -0,0 +1,181 @@
+"""
+AquaGuard 韩家家庭智能系统 - 状态读取计划模块
+
+按设备型号从规格编译状态读取计划 (需要读取的 siid/piid 及其对应的 Device.data 键)，
+编译结果按型号缓存，轮询时只执行计划
+"""
+
+import threading
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, Iterable, Optional, Tuple
+
+
+# 开关属性候选 (按优先级)
+POWER_PROPS = ("on", "power", "switch", "switch-on", "status", "state")
+
+# 各类别额外读取的状态: (Device.data 键, 候选属性名)
+CATEGORY_FIELDS = {
+    "light": (
+        ("brightness", ("brightness",)),
+        ("color_temperature", ("color-temperature",)),
+    ),
+    "fan": (
+        ("fan_level", ("fan-level",)),
+    ),
+    "purifier": (
+        ("temperature", ("temperature",)),
+        ("humidity", ("relative-humidity",)),
+        ("pm25", ("pm2.5-density",)),
+        ("air_quality", ("air-quality",)),
+        ("mode", ("mode",)),
+        ("filter_life", ("filter-life-level",)),
+    ),
+}
+
+# 规格 URN 中的设备类型 -> 类别
+SPEC_CATEGORIES = {
+    "light": "light",
+    "switch": "switch",
+    "outlet": "switch",
+    "fan": "fan",
+    "air-fresh": "purifier",
+    "air-purifier": "purifier",
+    "temperature-humidity-sensor": "sensor",
+}
+
+
+@dataclass(frozen=True)
+class StatusRead:
+    """
+    一个状态属性的读取
+
+    Attributes:
+        key: Device.data 中的键
+        siid: 服务 ID
+        piid: 属性 ID
+    """
+    key: str
+    siid: int
+    piid: int
+
+
+@dataclass(frozen=True)
+class StatusPlan:
+    """
+    一个型号的状态读取计划
+
+    Attributes:
+        model: 设备型号
+        category: 设备类别，规格能识别时以规格为准
+        reads: 需要读取的属性，同一属性只出现一次
+    """
+    model: str
+    category: str
+    reads: Tuple[StatusRead, ...]
+
+    @property
+    def has_power(self) -> bool:
+        return any(read.key == "power" for read in self.reads)
+
+    def decode(self, values: Dict[Tuple[int, int], Any]) -> Dict[str, Any]:
+        """
+        将读取结果转换为 Device.data 格式
+
+        Args:
+            values: {(siid, piid): 值}，读取失败的属性值为 None 或不在其中
+
+        Returns:
+            状态字典，开关状态转换为 "on"/"off"
+        """
+        status: Dict[str, Any] = {"online": True}
+        for read in self.reads:
+            value = values.get((read.siid, read.piid))
+            if value is None:
+                continue
+            status[read.key] = ("on" if value else "off") if read.key == "power" else value
+        return status
+
+
+def spec_category(spec_type: Optional[str]) -> Optional[str]:
+    """
+    从规格 URN 识别设备类别
+
+    例如 urn:miot-spec-v2:device:light:0000A001:yeelink-lamp4:1 -> light
+    """
+    parts = (spec_type or "").split(":")
+    if len(parts) < 4:
+        return None
+    return SPEC_CATEGORIES.get(parts[3])
+
+
+def compile_status_plan(model: str, spec: dict, category: str) -> StatusPlan:
+    """
+    从设备规格编译状态读取计划
+
+    Args:
+        model: 设备型号
+        spec: get_device_info() 返回的规格信息
+        category: 规格无法识别类别时使用的类别
+
+    Returns:
+        状态读取计划
+    """
+    category = spec_category(spec.get("type")) or category
+    # 规格中的属性名使用短横线，下划线写法指向同一属性
+    readable = {
+        prop["name"].replace("_", "-"): prop["method"]
+        for prop in spec.get("properties", [])
+        if "r" in prop.get("rw", "")
+    }
+
+    reads = []
+    seen = set()
+    for key, names in (("power", POWER_PROPS),) + CATEGORY_FIELDS.get(category, ()):
+        name = next((n for n in names if n in readable), None)
+        if name is None:
+            continue
+        method = readable[name]
+        read = StatusRead(key, int(method["siid"]), int(method["piid"]))
+        if (read.siid, read.piid) not in seen:
+            seen.add((read.siid, read.piid))
+            reads.append(read)
+    return StatusPlan(model=model, category=category, reads=tuple(reads))
+
+
+class StatusPlanCache:
+    """
+    状态读取计划缓存
+
+    按 (型号, 类别) 缓存编译结果，同型号的设备共用一个计划，规格更新后按型号失效
+    """
+
+    def __init__(self):
+        self._plans: Dict[Tuple[str, str], StatusPlan] = {}
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._plans)
+
+    def get(self, model: str, category: str, load_spec: Callable[[str], dict]) -> StatusPlan:
+        """
+        获取读取计划，未缓存时加载规格并编译
+
+        Args:
+            model: 设备型号
+            category: 设备类别
+            load_spec: 加载规格的函数，参数为型号
+        """
+        with self._lock:
+            plan = self._plans.get((model, category))
+        if plan is None:
+            plan = compile_status_plan(model, load_spec(model), category)
+            with self._lock:
+                self._plans[(model, category)] = plan
+        return plan
+
+    def invalidate(self, models: Iterable[str]) -> None:
+        """丢弃指定型号的计划"""
+        models = set(models)
+        with self._lock:
+            for key in [k for k in self._plans if k[0] in models]:
+                del self._plans[key]
@@ -20,6 +20,7 @@ from .mijia_device_panel import MijiaDevicePanel
 from .multi_switch_detail import MultiSwitchDetailPanel
 from .theme import Theme  # 引入主题
 from .settings_panel import SettingsPanel # 引入新版设置面板
+from .frame_scheduler import FrameScheduler
 
 import sys
 import os
@@ -30,6 +31,7 @@ from core.api_client import SensorClient, LightClient
 from core.scheduler import Scheduler, AlertManager
 from core.device import Device, DeviceType
 from core.device_manager import DeviceManager
+from core.event_bus import DeviceStateChanged
 
 
 class AquaGuardApp(ctk.CTk):
@@ -71,6 +73,9 @@ class AquaGuardApp(ctk.CTk):
         # 设备在线状态缓存 (用于检测状态变化)
         self._device_online_cache = {}
         
+        # 界面更新按帧合并：状态变化和网格刷新请求在下一帧统一渲染
+        self._frames = FrameScheduler(self.after, self._render_device_updates, self._render_device_grid)
+        
         # 创建 UI
         self._create_ui()
         
@@ -218,70 +223,56 @@ class AquaGuardApp(ctk.CTk):
         self._switch_page("devices")
     
     def _refresh_device_grid(self) -> None:
-        """刷新设备网格 (异步入口)"""
-        # 启动后台线程准备数据，避免阻塞 UI
-        threading.Thread(target=self._refresh_device_grid_async, daemon=True).start()
-
-    def _refresh_device_grid_async(self) -> None:
-        """后台线程：准备设备数据"""
-        import time
-        t_start = time.time()
-        try:
-            all_devices = self.device_manager.get_all_devices()
-            # 过滤：只显示 visible=True 的设备
-            devices = [d for d in all_devices if d.visible]
-            # 排序：在线设备优先 (online=True 对应 0, False 对应 1), 然后按名称排序
-            devices.sort(key=lambda x: (not x.online, x.name))
-            
-            device_data = []
-            # update cache
-            self._device_online_cache = {}
-            
-            for d in devices:
-                self._device_online_cache[d.id] = d.online
-                
-                is_on = False
-                # ESP 灯光设备
-                if d.online and d.type == DeviceType.LIGHT:
-                    if d.data.get("power") == "on":
-                        is_on = True
-                # 米家灯光/开关/风扇设备
-                elif d.online and d.type in (DeviceType.MIJIA_LIGHT, DeviceType.MIJIA_SWITCH, DeviceType.MIJIA_FAN):
-                    if d.data.get("power") == "on":
-                        is_on = True
-                
-                # 准备传给 UI 的纯数据字典
-                device_data.append({
-                    "id": d.id,
-                    "did": d.did,
-                    "name": d.name,
-                    "icon": d.icon,
-                    "color": d.color,
-                    "online": d.online,
-                    "is_on": is_on,
-                    "status_text": d.get_status_text()
-                })
-            
-            t_data = time.time()
-            print(f"[性能监控] 数据准备耗时: {(t_data - t_start)*1000:.1f}ms (设备数: {len(devices)})")
+        """请求刷新设备网格 (可在任意线程调用，同一帧内的多次请求合并为一次)"""
+        self._frames.request_grid_refresh()
+
+    def _render_device_grid(self) -> None:
+        """主线程：重建设备网格 (由帧调度器调用)"""
+        self._update_device_grid_ui(self._build_device_grid_data())
+
+    def _build_device_grid_data(self) -> list:
+        """准备设备网格数据"""
+        all_devices = self.device_manager.get_all_devices()
+        # 过滤：只显示 visible=True 的设备
+        devices = [d for d in all_devices if d.visible]
+        # 排序：在线设备优先 (online=True 对应 0, False 对应 1), 然后按名称排序
+        devices.sort(key=lambda x: (not x.online, x.name))
+        
+        device_data = []
+        # update cache
+        self._device_online_cache = {}
+        
+        for d in devices:
+            self._device_online_cache[d.id] = d.online
             
-            # 数据准备完毕，调度主线程更新 UI
-            self.after(0, lambda: self._update_device_grid_ui(device_data))
+            is_on = False
+            # ESP 灯光设备
+            if d.online and d.type == DeviceType.LIGHT:
+                if d.data.get("power") == "on":
+                    is_on = True
+            # 米家灯光/开关/风扇设备
+            elif d.online and d.type in (DeviceType.MIJIA_LIGHT, DeviceType.MIJIA_SWITCH, DeviceType.MIJIA_FAN):
+                if d.data.get("power") == "on":
+                    is_on = True
             
-        except Exception as e:
-            print(f"[UI] 异步刷新数据出错: {e}")
+            # 准备传给 UI 的纯数据字典
+            device_data.append({
+                "id": d.id,
+                "did": d.did,
+                "name": d.name,
+                "icon": d.icon,
+                "color": d.color,
+                "online": d.online,
+                "is_on": is_on,
+                "status_text": d.get_status_text()
+            })
+        return device_data
 
     def _update_device_grid_ui(self, device_data: list) -> None:
         """主线程：更新 UI 组件"""
-        import time
-        t_ui_start = time.time()
-        
         # 再次检查页面是否存在，防止关闭时报错
         if "devices" in self.pages:
             self.pages["devices"].set_devices(device_data, on_switch_click=self._on_multi_switch_click)
-            
-        t_ui_end = time.time()
-        print(f"[性能监控] UI渲染耗时: {(t_ui_end - t_ui_start)*1000:.1f}ms")
 
     def _switch_page(self, page_id: str) -> None:
         """切换页面"""
@@ -551,7 +542,7 @@ class AquaGuardApp(ctk.CTk):
             def update_ui():
                 if success:
                     # 更新本地状态
-                    device.data["power"] = "on" if power_on else "off"
+                    self.device_manager.update_device_state(device_id, power="on" if power_on else "off")
                     # 刷新界面
                     self._update_device_ui(device)
                     print(f"[App] 米家设备 {device.name} 开关: {'开' if power_on else '关'}")
@@ -618,7 +609,7 @@ class AquaGuardApp(ctk.CTk):
             
             def update_ui():
                 if success:
-                    device.data["power"] = "on" if new_state else "off"
+                    self.device_manager.update_device_state(switch_id, power="on" if new_state else "off")
                     # 更新详情页中的开关状态
                     if hasattr(self, '_current_multi_switch_detail') and self._current_multi_switch_detail:
                         self._current_multi_switch_detail.update_switch_state(switch_id, new_state)
@@ -690,12 +681,32 @@ class AquaGuardApp(ctk.CTk):
     def _start_device_polling(self) -> None:
         """启动设备状态轮询"""
         self.device_manager.set_poll_interval(self.config.get_refresh_interval())
-        self.device_manager.set_status_callback(self._on_device_status_update)
+        # 状态变化只标记设备，由帧调度器在下一帧统一更新界面
+        self.device_manager.events.subscribe(
+            self._on_device_state_changed,
+            topics=(DeviceStateChanged,),
+            where=lambda event: event.device.visible,
+            dispatch=lambda drain: drain(),
+            name="ui",
+        )
         self.device_manager.start_polling()
 
+    def _on_device_state_changed(self, event: DeviceStateChanged) -> None:
+        """设备状态变化事件 (在轮询线程中调用)"""
+        self._frames.mark_dirty((event.device_id,))
+
+    def _render_device_updates(self, device_ids: list) -> None:
+        """主线程：更新一帧内状态变化的设备 (由帧调度器调用)"""
+        for device_id in device_ids:
+            device = self.device_manager.get_device(device_id)
+            if device:
+                self._on_device_status_update(device)
+        
+        # 刷新未读消息数量（可能有新的状态变更记录），每帧一次
+        self._update_unread_count()
 
     def _on_device_status_update(self, device: Device) -> None:
-        """设备状态更新回调"""
+        """设备状态更新 (在主线程中调用)"""
         # 记录首次收到设备状态的时间
         if not hasattr(self, '_first_status_received'):
             self._first_status_received = set()
@@ -707,21 +718,14 @@ class AquaGuardApp(ctk.CTk):
                 elapsed = time.time() - self.device_manager._poll_start_time
                 print(f"[App] 首次收到设备状态: {device.name} (T+{elapsed:.1f}s) 在线={device.online}")
         
-        def update():
-            # 更新缓存
-            self._device_online_cache[device.id] = device.online
-            # 直接更新设备 UI，不重建整个网格（避免闪烁）
-            self._update_device_ui(device)
-            
-            # 如果当前正在查看该设备详情，也需要更新连接状态
-            if self._selected_device_id == device.id and self.pages["device_detail"]:
-               self._update_detail_panel(device)
-            
-            # 刷新未读消息数量（可能有新的状态变更记录）
-            self._update_unread_count()
-                
-        # 在主线程更新 UI
-        self.after(0, update)
+        # 更新缓存
+        self._device_online_cache[device.id] = device.online
+        # 直接更新设备 UI，不重建整个网格（避免闪烁）
+        self._update_device_ui(device)
+        
+        # 如果当前正在查看该设备详情，也需要更新连接状态
+        if self._selected_device_id == device.id and self.pages["device_detail"]:
+           self._update_detail_panel(device)
 
     def _update_detail_panel(self, device: Device) -> None:
         """更新详情页连接状态"""
@@ -113,6 +113,25 @@ class DeviceCard(ctk.CTkFrame):
             w.bind("<Enter>", self._on_enter)
             w.bind("<Leave>", self._on_leave)
 
+    def bind_device(self, device_id: str, device_name: str, device_icon: str, device_color: str):
+        """
+        将卡片切换为显示另一个设备 (卡片复用)
+        
+        Args:
+            device_id: 设备 ID
+            device_name: 设备名称
+            device_icon: 设备图标
+            device_color: 设备颜色
+        """
+        self.device_id = device_id
+        if device_name != self.device_name:
+            self.device_name = device_name
+            self.name_label.configure(text=device_name)
+        if device_icon != self.device_icon:
+            self.device_icon = device_icon
+            self.icon_label.configure(text=device_icon)
+        self.device_color = device_color
+
     def _handle_click(self, event=None):
         if self._on_click:
             self._on_click(self.device_id)
@@ -5,12 +5,19 @@ AquaGuard 韩家家庭智能系统 - 主仪表盘 (Dashboard Style)
 """
 
 import customtkinter as ctk
-from typing import Callable, Optional, Dict, List
+from typing import TYPE_CHECKING, Callable, Optional, Dict, List
 
 from .device_card import DeviceCard, AddDeviceCard
+from .grid_layout import (
+    GridSlot, WidgetPool, MAX_COLS, ROW_HEIGHT, SLOT_DEVICE, SLOT_MULTI,
+    group_multi_switches, layout_slots, multi_switch_card_data, visible_rows,
+)
 from .scene_button import SceneButton
 from .theme import Theme
 
+if TYPE_CHECKING:
+    from .multi_switch_card import MultiSwitchCard
+
 
 class DeviceGridPanel(ctk.CTkFrame):
     """
@@ -33,7 +40,19 @@ class DeviceGridPanel(ctk.CTkFrame):
         self._on_add_device = on_add_device
         self._on_notification_click = on_notification_click
         
-        self._device_cards: Dict[str, DeviceCard] = {}
+        # 设备数据按 ID 索引，卡片只为可见区域附近的设备创建
+        self._device_data: Dict[str, dict] = {}  # {device_id: 普通设备数据}
+        self._multi_data: Dict[str, dict] = {}  # {real_did: 多键开关卡片数据}
+        self._switch_parent: Dict[str, str] = {}  # {子开关 device_id: real_did}
+        self._slots: List[GridSlot] = []
+        self._rows = 0
+        self._device_cards: Dict[str, DeviceCard] = {}  # 已创建的普通设备卡片
+        self._multi_switch_cards: Dict[str, "MultiSwitchCard"] = {}  # 已创建的多键开关卡片
+        self._positions: Dict[str, tuple] = {}  # {key: (row, col)} 已放置卡片的位置
+        self._card_pool = WidgetPool()
+        self._add_device_card: Optional[AddDeviceCard] = None
+        self._on_switch_click = None
+        self._render_pending = False
         self._unread_count = 0
         
         # 使用透明背景，透出 app 的 BG_PRIMARY (Gray 300)
@@ -143,8 +162,17 @@ class DeviceGridPanel(ctk.CTkFrame):
         self.grid_frame.pack(fill="both", expand=True)
         
         # 配置网格列权重 (4列布局, 对应 CSS grid-cols-4)
-        for i in range(4):
+        for i in range(MAX_COLS):
             self.grid_frame.columnconfigure(i, weight=1, minsize=160) # 稍宽一点
+        
+        # 滚动时 (以及窗口大小变化时) 重新计算需要创建的卡片
+        self._canvas = getattr(self.scroll_frame, "_parent_canvas", None)
+        scrollbar = getattr(self.scroll_frame, "_scrollbar", None)
+        if self._canvas is not None and scrollbar is not None:
+            def on_yscroll(first, last):
+                scrollbar.set(first, last)
+                self._schedule_render()
+            self._canvas.configure(yscrollcommand=on_yscroll)
             
 
     
@@ -179,208 +207,204 @@ class DeviceGridPanel(ctk.CTkFrame):
             - grouped_switches: {real_did: [switch1, switch2, ...]}
             - regular_devices: 普通设备列表
         """
-        from .multi_switch_card import MultiSwitchCard
-        
-        grouped = {}  # real_did -> [sub_switches]
-        regular = []
-        
-        for device in devices:
-            did = device.get("did", "")
-            # 检查是否为虚拟开关 (包含 .s)
-            if ".s" in str(did):
-                parts = str(did).split(".")
-                real_did = parts[0]
-                if real_did not in grouped:
-                    grouped[real_did] = []
-                grouped[real_did].append(device)
-            else:
-                # 检查是否为多键开关主设备 (有子设备的)
-                # 如果已经在 grouped 中有子设备，则跳过主设备
-                # 否则作为普通设备
-                is_main_switch = any(str(d.get("did", "")).startswith(f"{did}.") for d in devices)
-                if not is_main_switch:
-                    regular.append(device)
-        
-        return grouped, regular
+        return group_multi_switches(devices)
     
     def set_devices(self, devices: List[dict], on_switch_click=None) -> None:
         import time
         t_start = time.time()
         
-        from .multi_switch_card import MultiSwitchCard
+        self._on_switch_click = on_switch_click
         
-        # 1. 数据准备与分组
+        # 1. 数据准备与分组 (按 ID 建立索引，之后的查找都是 O(1))
         grouped_switches, regular_devices = self._group_multi_switches(devices)
+        self._device_data = {d["id"]: d for d in regular_devices}
+        self._multi_data = {
+            real_did: multi_switch_card_data(sub_switches)
+            for real_did, sub_switches in grouped_switches.items()
+        }
+        self._switch_parent = {
+            sw["id"]: real_did
+            for real_did, data in self._multi_data.items()
+            for sw in data["switches"]
+        }
+        
+        # 2. 排布：所有行保持固定高度，未创建卡片的行也占位，滚动条反映完整长度
+        self._slots = layout_slots(list(self._multi_data), list(self._device_data))
+        rows = self._slots[-1].row + 1
+        for row in range(min(rows, self._rows), max(rows, self._rows)):
+            self.grid_frame.rowconfigure(row, minsize=ROW_HEIGHT if row < rows else 0)
+        self._rows = rows
+        
+        # 3. 只创建/更新可见区域附近的卡片
+        self._render_visible(refresh=True)
+        
+        t_end = time.time()
+        print(f"[UI Monitor] DeviceGrid SMART REFLOW: {(t_end - t_start)*1000:.1f}ms (Regular: {len(regular_devices)}, Multi: {len(grouped_switches)}, Cards: {len(self._device_cards)})")
+    
+    def update_device(self, device_id: str, is_online: bool, status_text: str, is_on: bool = False) -> None:
+        data = self._device_data.get(device_id)
+        if data is None:
+            return
+        data.update(online=is_online, status_text=status_text, is_on=is_on)
+        card = self._device_cards.get(device_id)
+        if card:
+            card.update_status(is_online, status_text, is_on)
+    
+    def update_switch_state(self, switch_id: str, is_on: bool, is_online: bool = True) -> None:
+        """更新多键开关中某个按键的状态"""
+        real_did = self._switch_parent.get(switch_id)
+        if real_did is None:
+            return
+        data = self._multi_data[real_did]
+        data["online"] = is_online
+        for sw in data["switches"]:
+            if sw["id"] == switch_id:
+                sw["is_on"] = is_on
+        card = self._multi_switch_cards.get(real_did)
+        if card:
+            # 同时更新在线状态和开关状态
+            card.update_online_status(is_online)
+            card.update_switch_state(switch_id, is_on)
+    
+    def get_device_ids(self) -> List[str]:
+        return list(self._device_data)
+    
+    # ============ 虚拟化渲染 ============
+    
+    def _schedule_render(self) -> None:
+        """滚动事件合并到空闲时处理"""
+        if not self._render_pending:
+            self._render_pending = True
+            self.after_idle(self._render_visible)
+    
+    def _visible_rows(self) -> range:
+        if self._canvas is None:
+            return range(self._rows)
+        top = self._canvas.yview()[0]
+        # 尚未显示时高度为 1，按窗口的默认高度估算
+        view_height = self._canvas.winfo_height()
+        if view_height <= 1:
+            view_height = self.winfo_toplevel().winfo_height()
+        return visible_rows(top, max(view_height, ROW_HEIGHT), self._rows)
+    
+    def _render_visible(self, refresh: bool = False) -> None:
+        """
+        创建可见区域附近的卡片，回收离开可见区域的卡片
         
-        # 2. Diff Regular Devices (普通设备)
-        current_ids = set(self._device_cards.keys())
-        target_ids = {d["id"] for d in regular_devices}
+        Args:
+            refresh: 数据已更新，已创建的卡片也需要刷新显示
+        """
+        self._render_pending = False
+        rows = self._visible_rows()
+        wanted = {
+            slot.key: slot
+            for slot in self._slots[rows.start * MAX_COLS:rows.stop * MAX_COLS]
+        }
+        
+        # 回收不再需要的卡片
+        for device_id in [k for k in self._device_cards if k not in wanted]:
+            self._release_device_card(device_id)
+        for real_did in [k for k in self._multi_switch_cards if k not in wanted]:
+            self._multi_switch_cards.pop(real_did).destroy()
+            self._positions.pop(real_did, None)
+        
+        for key, slot in wanted.items():
+            if slot.kind == SLOT_DEVICE:
+                card = self._device_cards.get(key)
+                if card is None:
+                    card = self._acquire_device_card(key)
+                elif refresh:
+                    self._bind_device_card(card, key)
+            elif slot.kind == SLOT_MULTI:
+                card = self._multi_switch_cards.get(key)
+                if card is None:
+                    card = self._create_multi_switch_card(key)
+                elif refresh:
+                    data = self._multi_data[key]
+                    card.update_online_status(data["online"])
+                    for sw in data["switches"]:
+                        card.update_switch_state(sw["id"], sw["is_on"])
+            else:
+                card = self._get_add_device_card()
+            self._place(card, slot)
         
-        # Remove
-        for did in current_ids - target_ids:
-            self._device_cards[did].destroy()
-            del self._device_cards[did]
-            
-        # Add
-        for did in target_ids - current_ids:
-            # 查找对应的数据对象
-            device_data = next(d for d in regular_devices if d["id"] == did)
+        # 添加按钮不在可见区域时移出网格
+        if self._add_device_card is not None and "" not in wanted and "" in self._positions:
+            self._add_device_card.grid_forget()
+            del self._positions[""]
+    
+    def _place(self, card, slot: GridSlot) -> None:
+        """放置卡片，位置没有变化时不重新布局"""
+        position = (slot.row, slot.col)
+        if self._positions.get(slot.key) == position:
+            return
+        card.grid(row=slot.row, column=slot.col, padx=10, pady=10, sticky="nsew")
+        card.tkraise()
+        self._positions[slot.key] = position
+    
+    def _acquire_device_card(self, device_id: str) -> DeviceCard:
+        card = self._card_pool.acquire(SLOT_DEVICE)
+        if card is None:
+            data = self._device_data[device_id]
             card = DeviceCard(
                 self.grid_frame,
-                device_id=device_data["id"],
-                device_name=device_data["name"],
-                device_icon=device_data["icon"],
-                device_color=device_data["color"],
-                is_online=device_data["online"],
-                status_text=device_data["status_text"],
-                is_on=device_data["is_on"],
+                device_id=device_id,
+                device_name=data["name"],
+                device_icon=data["icon"],
+                device_color=data["color"],
+                is_online=data["online"],
+                status_text=data["status_text"],
+                is_on=data["is_on"],
                 on_click=self._on_device_click,
                 on_long_press=self._on_device_menu
             )
-            self._device_cards[did] = card
-            
-        # 3. Diff Multi-Switch Cards (多键开关)
-        if not hasattr(self, '_multi_switch_cards'):
-            self._multi_switch_cards = {}
-            
-        current_multi_ids = set(self._multi_switch_cards.keys())
-        target_multi_ids = set(grouped_switches.keys())
+        else:
+            self._bind_device_card(card, device_id)
+        self._device_cards[device_id] = card
+        return card
+    
+    def _bind_device_card(self, card: DeviceCard, device_id: str) -> None:
+        data = self._device_data[device_id]
+        card.bind_device(device_id, data["name"], data["icon"], data["color"])
+        card.update_status(
+            is_online=data.get("online", False),
+            status_text=data.get("status_text", "离线"),
+            is_on=data.get("is_on", False)
+        )
+    
+    def _release_device_card(self, device_id: str) -> None:
+        card = self._device_cards.pop(device_id)
+        self._positions.pop(device_id, None)
+        card.grid_forget()
+        if not self._card_pool.release(SLOT_DEVICE, card):
+            card.destroy()
+    
+    def _create_multi_switch_card(self, real_did: str) -> "MultiSwitchCard":
+        from .multi_switch_card import MultiSwitchCard
         
-        # Remove
-        for did in current_multi_ids - target_multi_ids:
-            self._multi_switch_cards[did].destroy()
-            del self._multi_switch_cards[did]
-            
-        # Add & Update Data Structure
-        # 注意：多键开关需要先准备好 switches 数据
-        multi_card_data = {} # {real_did: {name, icon, color, switches, is_online}}
-        
-        for real_did in target_multi_ids:
-            sub_switches = grouped_switches[real_did]
-            # 排序子开关
-            sub_switches.sort(key=lambda d: int(str(d.get("did", "")).split(".s")[-1]) if ".s" in str(d.get("did", "")) else 0)
-            
-            # 使用第一个子设备的信息作为主卡片信息
-            main_device = sub_switches[0]
-            # 名字通常是 "X键开关"，提取公共部分
-            card_name = main_device["name"].split("-")[0] + "开关"
-            if "键" in main_device["name"]:
-                 # 尝试提取 "中键-H+单火三键开关" -> "H+单火三键开关"
-                 parts = main_device["name"].split("-")
-                 if len(parts) > 1:
-                     card_name = parts[-1] 
-            
-            switches_list = []
-            for sw in sub_switches:
-                name = sw.get("name", "开关")
-                # 简化名称
-                short_name = name.replace("-H+单火", "").replace("开关", "").strip()
-                if not short_name: short_name = name
-                switches_list.append({
-                    "id": sw.get("id"),
-                    "name": short_name,
-                    "is_on": sw.get("is_on", False)
-                })
-            
-            # 缓存构造数据，供创建使用
-            multi_card_data[real_did] = {
-                "name": card_name,
-                "icon": main_device.get("icon", "🔌"),
-                "color": main_device.get("color", "#4CAF50"),
-                "switches": switches_list,
-                "online": main_device.get("online", False)
-            }
-            
-            if real_did not in self._multi_switch_cards:
-                # Create
-                card = MultiSwitchCard(
-                    self.grid_frame,
-                    device_id=real_did,
-                    device_name=card_name,
-                    switches=switches_list,
-                    device_icon=multi_card_data[real_did]["icon"],
-                    device_color=multi_card_data[real_did]["color"],
-                    is_online=main_device.get("online", False),
-                    on_click=on_switch_click,
-                    on_long_press=self._on_device_menu
-                )
-                self._multi_switch_cards[real_did] = card
-
-        # 4. Update All Cards (数据更新)
-        # 普通设备
-        for device in regular_devices:
-            card = self._device_cards[device["id"]]
-            card.update_status(
-                is_online=device.get("online", False),
-                status_text=device.get("status_text", "离线"),
-                is_on=device.get("is_on", False)
-            )
-            
-        # 多键开关
-        for real_did in target_multi_ids:
-            card = self._multi_switch_cards[real_did]
-            data = multi_card_data[real_did]
-            # 更新在线状态
-            card.update_online_status(data["online"])
-            # 更新子开关状态
-            for sw in data["switches"]:
-                card.update_switch_state(sw["id"], sw["is_on"])
-
-        # 5. Grid Layout (重新布局)
-        row, col = 0, 0
-        MAX_COLS = 4
-        
-        # 布局多键开关
-        for real_did in target_multi_ids:
-            card = self._multi_switch_cards[real_did]
-            card.grid(row=row, column=col, padx=10, pady=10, sticky="nsew")
-            card.tkraise()
-            
-            col += 1
-            if col >= MAX_COLS:
-                col = 0
-                row += 1
-                
-        # 布局普通设备
-        for device in regular_devices:
-            card = self._device_cards[device["id"]]
-            card.grid(row=row, column=col, padx=10, pady=10, sticky="nsew")
-            card.tkraise()
-            
-            col += 1
-            if col >= MAX_COLS:
-                col = 0
-                row += 1
-                
-        # 布局添加按钮
-        if not hasattr(self, '_add_device_card') or not self._add_device_card.winfo_exists():
+        data = self._multi_data[real_did]
+        card = MultiSwitchCard(
+            self.grid_frame,
+            device_id=real_did,
+            device_name=data["name"],
+            switches=[dict(sw) for sw in data["switches"]],
+            device_icon=data["icon"],
+            device_color=data["color"],
+            is_online=data["online"],
+            on_click=self._on_switch_click,
+            on_long_press=self._on_device_menu
+        )
+        self._multi_switch_cards[real_did] = card
+        return card
+    
+    def _get_add_device_card(self) -> AddDeviceCard:
+        if self._add_device_card is None or not self._add_device_card.winfo_exists():
             self._add_device_card = AddDeviceCard(
                 self.grid_frame,
                 on_click=self._on_add_device
             )
-        
-        self._add_device_card.grid(row=row, column=col, padx=10, pady=10, sticky="nsew")
-        self._add_device_card.tkraise()
-        
-        t_end = time.time()
-        print(f"[UI Monitor] DeviceGrid SMART REFLOW: {(t_end - t_start)*1000:.1f}ms (Regular: {len(regular_devices)}, Multi: {len(grouped_switches)})")
-    
-    def update_device(self, device_id: str, is_online: bool, status_text: str, is_on: bool = False) -> None:
-        if device_id in self._device_cards:
-            self._device_cards[device_id].update_status(is_online, status_text, is_on)
-    
-    def update_switch_state(self, switch_id: str, is_on: bool, is_online: bool = True) -> None:
-        """更新多键开关中某个按键的状态"""
-        if hasattr(self, '_multi_switch_cards'):
-            for card in self._multi_switch_cards.values():
-                if switch_id in card.get_switch_ids():
-                    # 同时更新在线状态和开关状态
-                    card.update_online_status(is_online)
-                    card.update_switch_state(switch_id, is_on)
-                    break
-    
-    def get_device_ids(self) -> List[str]:
-        return list(self._device_cards.keys())
+            self._positions.pop("", None)
+        return self._add_device_card
 
     def _create_status_item(self, key, icon, text):
         container = ctk.CTkFrame(self.status_row, fg_color="transparent")
@@ -0,0 +1,126 @@
+"""
+AquaGuard 韩家家庭智能系统 - 界面帧调度模块
+
+收集需要更新的设备和网格刷新请求，按固定帧率在 Tk 主线程中一次性渲染，
+一轮轮询中大量设备的状态变化只产生一个主线程回调
+"""
+
+import threading
+import time
+from typing import Any, Callable, Dict, Iterable, List, Optional, Set
+
+
+# 默认帧间隔 (毫秒)，即最多每秒渲染 10 帧
+DEFAULT_FRAME_MS = 100
+
+
+class FrameScheduler:
+    """
+    帧合并的界面更新调度器
+
+    - mark_dirty() 和 request_grid_refresh() 可以在任意线程调用，只记录待更新的内容
+    - 待更新内容在下一帧统一渲染，两帧之间至少间隔 frame_ms 毫秒
+    - 同一帧内的多次网格刷新请求合并为一次，重复标记的设备只更新一次
+    - 记录每一帧的渲染耗时，超过帧间隔时输出日志
+    """
+
+    def __init__(
+        self,
+        after: Callable[[int, Callable[[], None]], Any],
+        render_devices: Callable[[List[str]], None],
+        render_grid: Callable[[], None],
+        frame_ms: int = DEFAULT_FRAME_MS,
+    ):
+        """
+        初始化调度器
+
+        Args:
+            after: 在主线程中延迟执行的函数，通常为 Tk 的 after(ms, func)
+            render_devices: 更新指定设备的界面，参数为设备 ID 列表
+            render_grid: 重建整个设备网格
+            frame_ms: 帧间隔 (毫秒)
+        """
+        self._after = after
+        self._render_devices = render_devices
+        self._render_grid = render_grid
+        self._frame_ms = frame_ms
+        self._lock = threading.Lock()
+        self._dirty: Set[str] = set()
+        self._grid = False
+        self._scheduled = False
+        self._last_frame = float("-inf")
+        self._frames = 0
+        self._devices = 0
+        self._grids = 0
+        self._total_ms = 0.0
+        self._last_ms = 0.0
+        self._max_ms = 0.0
+
+    def mark_dirty(self, device_ids: Iterable[str]) -> None:
+        """标记需要更新界面的设备"""
+        with self._lock:
+            self._dirty.update(device_ids)
+            delay = self._schedule()
+        self._request_frame(delay)
+
+    def request_grid_refresh(self) -> None:
+        """请求重建设备网格"""
+        with self._lock:
+            self._grid = True
+            delay = self._schedule()
+        self._request_frame(delay)
+
+    def stats(self) -> Dict[str, float]:
+        """渲染统计: 帧数、更新的设备数、网格重建次数、单帧耗时 (毫秒)"""
+        with self._lock:
+            return {
+                "frames": self._frames,
+                "devices": self._devices,
+                "grids": self._grids,
+                "last_ms": self._last_ms,
+                "avg_ms": self._total_ms / self._frames if self._frames else 0.0,
+                "max_ms": self._max_ms,
+            }
+
+    # ============ 内部实现 ============
+
+    def _schedule(self) -> Optional[int]:
+        """在锁内调用，返回下一帧的延迟 (毫秒)，已安排过下一帧时返回 None"""
+        if self._scheduled:
+            return None
+        self._scheduled = True
+        wait = self._last_frame + self._frame_ms / 1000 - time.monotonic()
+        return int(max(0.0, wait) * 1000)
+
+    def _request_frame(self, delay: Optional[int]) -> None:
+        # 在锁外调用 after()，避免与主线程中正在执行的 _flush 互相等待
+        if delay is not None:
+            self._after(delay, self._flush)
+
+    def _flush(self) -> None:
+        with self._lock:
+            dirty, self._dirty = sorted(self._dirty), set()
+            grid, self._grid = self._grid, False
+            self._scheduled = False
+            start = time.monotonic()
+            self._last_frame = start
+
+        # 网格重建不会更新详情页等网格以外的界面，脏设备仍然逐个更新
+        try:
+            if grid:
+                self._render_grid()
+            if dirty:
+                self._render_devices(dirty)
+        except Exception as e:
+            print(f"[界面调度] 渲染出错: {e}")
+
+        elapsed = (time.monotonic() - start) * 1000
+        with self._lock:
+            self._frames += 1
+            self._devices += len(dirty)
+            self._grids += grid
+            self._total_ms += elapsed
+            self._last_ms = elapsed
+            self._max_ms = max(self._max_ms, elapsed)
+        if elapsed > self._frame_ms:
+            print(f"[性能监控] 界面帧渲染耗时 {elapsed:.1f}ms (设备数: {len(dirty)}, 重建网格: {grid})")
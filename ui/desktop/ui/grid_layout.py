@@ -0,0 +1,198 @@
+"""
+AquaGuard 韩家家庭智能系统 - 设备网格布局模块
+
+设备网格的分组、排布和可见区域计算，以及卡片组件复用池。
+不依赖界面组件，设备网格面板只负责把计算结果放到界面上
+"""
+
+import math
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional, Tuple
+
+
+# 网格列数 (对应 CSS grid-cols-4)
+MAX_COLS = 4
+
+# 每行高度 (像素): 卡片高度 180 + 上下间距 10 + 10
+ROW_HEIGHT = 200
+
+# 可见区域上下额外创建的行数，滚动时新卡片在进入视野前已经创建好
+OVERSCAN_ROWS = 1
+
+# 卡片复用池的默认容量 (每种卡片)
+POOL_LIMIT = 64
+
+# 网格中的卡片类型
+SLOT_MULTI = "multi"
+SLOT_DEVICE = "device"
+SLOT_ADD = "add"
+
+
+@dataclass(frozen=True)
+class GridSlot:
+    """
+    网格中的一个位置
+
+    Attributes:
+        key: 设备 ID (普通设备) 或物理设备 ID (多键开关)，添加按钮为空字符串
+        kind: 卡片类型
+        row: 行
+        col: 列
+    """
+    key: str
+    kind: str
+    row: int
+    col: int
+
+
+def switch_parent(did: Optional[str]) -> Optional[str]:
+    """虚拟开关 (real_did.sN) 的物理设备 ID，其他设备返回 None"""
+    did = str(did or "")
+    if ".s" not in did:
+        return None
+    return did.split(".")[0]
+
+
+def group_multi_switches(devices: List[dict]) -> Tuple[Dict[str, List[dict]], List[dict]]:
+    """
+    将多键开关的子开关分组
+
+    Returns:
+        (grouped_switches, regular_devices)
+        - grouped_switches: {real_did: [switch1, switch2, ...]}，按首次出现的顺序
+        - regular_devices: 普通设备列表 (不包括有子开关的主设备)
+    """
+    # 所有 did 的点号前缀，主设备的 did 是某个子设备 did 的前缀
+    prefixes = set()
+    for device in devices:
+        parts = str(device.get("did", "")).split(".")
+        for i in range(1, len(parts)):
+            prefixes.add(".".join(parts[:i]))
+
+    grouped: Dict[str, List[dict]] = {}
+    regular = []
+    for device in devices:
+        real_did = switch_parent(device.get("did"))
+        if real_did is not None:
+            grouped.setdefault(real_did, []).append(device)
+        elif str(device.get("did", "")) not in prefixes:
+            regular.append(device)
+    return grouped, regular
+
+
+def _switch_index(device: dict) -> int:
+    did = str(device.get("did", ""))
+    return int(did.split(".s")[-1]) if ".s" in did else 0
+
+
+def multi_switch_card_data(sub_switches: List[dict]) -> dict:
+    """
+    多键开关卡片的显示数据
+
+    Args:
+        sub_switches: 同一物理设备的子开关数据
+
+    Returns:
+        {name, icon, color, switches: [{id, name, is_on}], online}
+    """
+    sub_switches = sorted(sub_switches, key=_switch_index)
+
+    # 使用第一个子设备的信息作为主卡片信息
+    main_device = sub_switches[0]
+    # 名字通常是 "X键开关"，提取公共部分
+    card_name = main_device["name"].split("-")[0] + "开关"
+    if "键" in main_device["name"]:
+        # 尝试提取 "中键-H+单火三键开关" -> "H+单火三键开关"
+        parts = main_device["name"].split("-")
+        if len(parts) > 1:
+            card_name = parts[-1]
+
+    switches = []
+    for sw in sub_switches:
+        name = sw.get("name", "开关")
+        # 简化名称
+        short_name = name.replace("-H+单火", "").replace("开关", "").strip() or name
+        switches.append({
+            "id": sw.get("id"),
+            "name": short_name,
+            "is_on": sw.get("is_on", False)
+        })
+
+    return {
+        "name": card_name,
+        "icon": main_device.get("icon", "🔌"),
+        "color": main_device.get("color", "#4CAF50"),
+        "switches": switches,
+        "online": main_device.get("online", False)
+    }
+
+
+def layout_slots(multi_keys: List[str], device_keys: List[str], cols: int = MAX_COLS) -> List[GridSlot]:
+    """
+    按顺序排布卡片：多键开关在前，普通设备在后，最后是添加按钮
+
+    Returns:
+        网格位置列表，按行优先排列
+    """
+    items = [(key, SLOT_MULTI) for key in multi_keys]
+    items += [(key, SLOT_DEVICE) for key in device_keys]
+    items.append(("", SLOT_ADD))
+    return [GridSlot(key, kind, i // cols, i % cols) for i, (key, kind) in enumerate(items)]
+
+
+def visible_rows(top: float, view_height: int, total_rows: int,
+                 row_height: int = ROW_HEIGHT, overscan: int = OVERSCAN_ROWS) -> range:
+    """
+    可见区域 (包括上下额外的行) 的行范围
+
+    Args:
+        top: 可见区域顶部在整个网格中的位置 (0~1，即 Canvas.yview()[0])
+        view_height: 可见区域高度 (像素)
+        total_rows: 总行数
+        row_height: 每行高度 (像素)
+        overscan: 可见区域上下额外的行数
+    """
+    if total_rows <= 0:
+        return range(0)
+    first = int(top * total_rows)
+    count = max(1, math.ceil(view_height / row_height))
+    return range(max(0, first - overscan), min(total_rows, first + count + overscan))
+
+
+class WidgetPool:
+    """
+    卡片组件复用池
+
+    离开可见区域的卡片放回池中，之后用于其他设备，避免反复创建和销毁组件
+    """
+
+    def __init__(self, limit: int = POOL_LIMIT):
+        self._limit = limit
+        self._free: Dict[str, List[Any]] = {}
+
+    def __len__(self) -> int:
+        return sum(len(widgets) for widgets in self._free.values())
+
+    def acquire(self, kind: str) -> Optional[Any]:
+        """取出一个空闲组件，没有时返回 None"""
+        widgets = self._free.get(kind)
+        return widgets.pop() if widgets else None
+
+    def release(self, kind: str, widget: Any) -> bool:
+        """
+        放回组件
+
+        Returns:
+            是否放入池中，池已满时返回 False，由调用方销毁
+        """
+        widgets = self._free.setdefault(kind, [])
+        if len(widgets) >= self._limit:
+            return False
+        widgets.append(widget)
+        return True
+
+    def drain(self) -> List[Any]:
+        """取出所有空闲组件 (用于销毁)"""
+        widgets = [w for ws in self._free.values() for w in ws]
+        self._free.clear()
+        return widgets